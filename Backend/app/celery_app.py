@@ -4,6 +4,8 @@ Handles background task processing with Redis broker
 """
 
 from celery import Celery
+from kombu import Queue
+from celery.signals import task_postrun, worker_process_init, worker_ready
 from app.config import settings
 import os
 import redis
@@ -56,6 +58,14 @@ celery_app = Celery(
     include=["app.tasks.unified_analysis_task"]
 )
 
+# Queues of the unified-analysis pipeline stages. Run separate workers per queue so a long
+# RAG extraction never holds a slot that could be scraping another company, e.g.:
+#   celery -A app.celery_app worker -Q io -n io@%h --concurrency 16
+#   celery -A app.celery_app worker -Q cpu,celery -n cpu@%h --concurrency 2
+# A worker started without -Q consumes every queue.
+IO_QUEUE = "io"
+CPU_QUEUE = "cpu"
+
 # Celery configuration
 celery_app.conf.update(
     task_serializer="json",
@@ -76,6 +86,15 @@ celery_app.conf.update(
     # Use threads pool instead of fork pool to avoid SIGSEGV with llama.cpp
     # llama.cpp doesn't handle fork() well - causes segmentation faults
     worker_pool='threads',  # Required for llama.cpp compatibility
+    task_queues=(Queue("celery"), Queue(IO_QUEUE), Queue(CPU_QUEUE)),
+    task_default_queue="celery",
+    task_routes={
+        "app.tasks.unified_analysis_task.scrape_articles": {"queue": IO_QUEUE},
+        "app.tasks.unified_analysis_task.classify_articles": {"queue": CPU_QUEUE},
+        "app.tasks.unified_analysis_task.store_articles": {"queue": IO_QUEUE},
+        "app.tasks.unified_analysis_task.embed_articles": {"queue": CPU_QUEUE},
+        "app.tasks.unified_analysis_task.extract_analysis": {"queue": CPU_QUEUE},
+    },
 )
 
 # Set CPU-only mode for PyTorch to avoid SIGSEGV crashes
@@ -84,3 +103,32 @@ os.environ.setdefault("PYTORCH_ENABLE_MPS_FALLBACK", "1")
 
 logger = celery_app.log.get_default_logger()
 
+
+def _consumes_model_queues() -> bool:
+    """False for workers that only serve the io queue (they never touch a model)"""
+    consume_from = celery_app.amqp.queues.consume_from
+    return not consume_from or any(queue != IO_QUEUE for queue in consume_from)
+
+
+# Models are loaded once per worker process and shared by its tasks (see app.services.model_registry).
+# worker_ready covers the threads/solo pools, worker_process_init each prefork child.
+@worker_ready.connect
+def preload_worker_models(**kwargs):
+    if settings.worker_preload_models and celery_app.conf.worker_pool in ('threads', 'solo') and _consumes_model_queues():
+        from app.services.model_registry import worker_models
+        worker_models.warm_up()
+
+
+@worker_process_init.connect
+def preload_child_models(**kwargs):
+    if settings.worker_preload_models and _consumes_model_queues():
+        from app.services.model_registry import worker_models
+        worker_models.warm_up()
+
+
+@task_postrun.connect
+def check_worker_memory(sender=None, **kwargs):
+    from app.services.model_registry import memory_watchdog
+    hostname = getattr(getattr(sender, 'request', None), 'hostname', None)
+    memory_watchdog.check(celery_app, hostname)
+
@@ -37,6 +37,12 @@ class Settings(BaseSettings):
     db_password: str = Field(default="password", env="DB_PASSWORD")
     db_host: str = Field(default="localhost", env="DB_HOST")
     db_port: int = Field(default=3306, env="DB_PORT")
+    db_remove_duplicate_articles: bool = Field(
+        default=False,
+        env="DB_REMOVE_DUPLICATE_ARTICLES",
+        description="At startup, delete articles stored twice for a company (same url, keeping the oldest) so the "
+                    "(company_id, url) unique key can be added; off by default, the duplicates are only reported"
+    )
     
     # API Configuration
     api_host: str = Field(default="0.0.0.0", env="API_HOST")
@@ -54,6 +60,28 @@ class Settings(BaseSettings):
         return self.serpapi_api_key
 
     redis_url: str = Field(default="redis://localhost:6379/0", env="REDIS_URL")
+    worker_preload_models: bool = Field(
+        default=True,
+        env="WORKER_PRELOAD_MODELS",
+        description="Load the classification and RAG models when a Celery worker starts (otherwise on its first task)"
+    )
+    worker_max_rss_mb: Optional[int] = Field(
+        default=6144,
+        env="WORKER_MAX_RSS_MB",
+        description="Gracefully shut a Celery worker down (for its supervisor to restart) once its RSS exceeds this; None disables the watchdog"
+    )
+    # Unified-analysis pipeline: stage outputs are passed between Celery stage tasks by key
+    pipeline_payload_backend: str = Field(
+        default="redis",
+        env="PIPELINE_PAYLOAD_BACKEND",
+        description="redis (shared by all workers) or disk; disk is also the fallback when Redis is unreachable"
+    )
+    pipeline_payload_dir: str = Field(
+        default=".cache/pipeline_payloads",
+        env="PIPELINE_PAYLOAD_DIR",
+        description="Directory of the disk backend (must be shared by the io and cpu workers)"
+    )
+    pipeline_payload_ttl_seconds: int = Field(default=86400, env="PIPELINE_PAYLOAD_TTL_SECONDS")
 
     rate_limit_requests: int = Field(default=100, env="RATE_LIMIT_REQUESTS")
     rate_limit_window: int = Field(default=3600, env="RATE_LIMIT_WINDOW")
@@ -69,6 +97,41 @@ class Settings(BaseSettings):
     # RAG / Milvus Configuration
     milvus_host: str = Field(default="localhost", env="MILVUS_HOST")
     milvus_port: str = Field(default="19530", env="MILVUS_PORT")
+    milvus_collection_name: str = Field(
+        default="company_rag_chunks",
+        env="MILVUS_COLLECTION_NAME",
+        description="Shared collection holding the chunk vectors of every company (partitioned by company)"
+    )
+    milvus_vector_ttl_hours: int = Field(
+        default=168,
+        env="MILVUS_VECTOR_TTL_HOURS",
+        description="Chunk vectors older than this are deleted by the background GC"
+    )
+    milvus_gc_interval_seconds: int = Field(
+        default=3600,
+        env="MILVUS_GC_INTERVAL_SECONDS",
+        description="How often the background GC sweeps expired vectors"
+    )
+    milvus_connect_timeout_seconds: float = Field(
+        default=3.0,
+        env="MILVUS_CONNECT_TIMEOUT_SECONDS",
+        description="Timeout for connecting to Milvus and for health probes"
+    )
+    milvus_breaker_failure_threshold: int = Field(
+        default=3,
+        env="MILVUS_BREAKER_FAILURE_THRESHOLD",
+        description="Consecutive Milvus failures that open the circuit breaker (calls then fail fast)"
+    )
+    milvus_breaker_reset_seconds: float = Field(
+        default=30.0,
+        env="MILVUS_BREAKER_RESET_SECONDS",
+        description="How long the breaker stays open before letting a trial call through"
+    )
+    milvus_health_probe_interval_seconds: float = Field(
+        default=15.0,
+        env="MILVUS_HEALTH_PROBE_INTERVAL_SECONDS",
+        description="How often the background health probe checks Milvus (it also closes an open breaker)"
+    )
     
     # LLM Configuration (llama.cpp with Phi-3.5 Mini)
     llm_model_path: str = Field(
@@ -91,10 +154,178 @@ class Settings(BaseSettings):
     ollama_base_url: Optional[str] = Field(default=None, env="OLLAMA_BASE_URL")
     ollama_model: Optional[str] = Field(default=None, env="OLLAMA_MODEL")
     
+    # LLM response cache (RAG and outreach prompts)
+    llm_cache_enabled: bool = Field(default=True, env="LLM_CACHE_ENABLED")
+    llm_cache_backend: str = Field(
+        default="redis",
+        env="LLM_CACHE_BACKEND",
+        description="redis (shared by all workers) or disk; disk is also the fallback when Redis is unreachable"
+    )
+    llm_cache_dir: str = Field(default=".cache/llm_responses", env="LLM_CACHE_DIR")
+    llm_cache_ttl_seconds: int = Field(default=604800, env="LLM_CACHE_TTL_SECONDS")
+    llm_cache_max_temperature: float = Field(
+        default=0.5,
+        env="LLM_CACHE_MAX_TEMPERATURE",
+        description="Requests with a higher temperature are treated as non-deterministic and never cached"
+    )
+    
     # RAG Hyperparameters
     rag_temperature: float = Field(default=0.3, env="RAG_TEMPERATURE")
     rag_top_k: int = Field(default=5, env="RAG_TOP_K")
     rag_chunk_size: int = Field(default=500, env="RAG_CHUNK_SIZE")
     rag_chunk_overlap: int = Field(default=100, env="RAG_CHUNK_OVERLAP")
+    rag_embedding_store_enabled: bool = Field(
+        default=True,
+        env="RAG_EMBEDDING_STORE_ENABLED",
+        description="Cache chunk embeddings on disk so unchanged chunks are never re-encoded"
+    )
+    rag_embedding_store_dir: str = Field(
+        default=".cache/embeddings",
+        env="RAG_EMBEDDING_STORE_DIR",
+        description="Directory of the shared embedding store (must be shared by API and Celery workers)"
+    )
+    rag_embedding_store_max_mb: int = Field(
+        default=1024,
+        env="RAG_EMBEDDING_STORE_MAX_MB",
+        description="Size of the float16 embedding matrix; least recently used vectors are evicted beyond it"
+    )
+    embedding_backend: str = Field(
+        default="torch",
+        env="EMBEDDING_BACKEND",
+        description="'torch' (sentence-transformers, fp32) or 'onnx' (int8-quantized bge-m3 on onnxruntime)"
+    )
+    onnx_model_dir: str = Field(default=".cache/onnx_models", env="ONNX_MODEL_DIR")
+    onnx_intra_op_threads: int = Field(
+        default=0,
+        env="ONNX_INTRA_OP_THREADS",
+        description="onnxruntime intra-op threads per worker process (0 = one per physical core)"
+    )
+    embedding_server_url: str = Field(
+        default="",
+        env="EMBEDDING_SERVER_URL",
+        description="Shared embedding server (e.g. http://127.0.0.1:8765); empty = load the model in every process"
+    )
+    embedding_server_host: str = Field(default="127.0.0.1", env="EMBEDDING_SERVER_HOST")
+    embedding_server_port: int = Field(default=8765, env="EMBEDDING_SERVER_PORT")
+    embedding_server_max_wait_ms: int = Field(
+        default=10,
+        env="EMBEDDING_SERVER_MAX_WAIT_MS",
+        description="How long the server waits for more requests to merge into one batch"
+    )
+    embedding_server_max_batch_texts: int = Field(default=256, env="EMBEDDING_SERVER_MAX_BATCH_TEXTS")
+    embedding_server_timeout_seconds: float = Field(default=60.0, env="EMBEDDING_SERVER_TIMEOUT_SECONDS")
+    embedding_server_retry_seconds: int = Field(
+        default=30,
+        env="EMBEDDING_SERVER_RETRY_SECONDS",
+        description="After a failed request, encode in-process for this long before trying the server again"
+    )
+    embedding_batch_max_tokens: int = Field(
+        default=16384,
+        env="EMBEDDING_BATCH_MAX_TOKENS",
+        description="Padded tokens (inputs x longest input) per encoding batch"
+    )
+    embedding_batch_max_size: int = Field(default=64, env="EMBEDDING_BATCH_MAX_SIZE")
+    rag_embedding_max_seq_length: int = Field(
+        default=512,
+        env="RAG_EMBEDDING_MAX_SEQ_LENGTH",
+        description="Token limit when embedding RAG chunks and queries (chunks are sized to fit it)"
+    )
+    classification_max_seq_length: Optional[int] = Field(
+        default=None,
+        env="CLASSIFICATION_MAX_SEQ_LENGTH",
+        description=(
+            "Token limit when embedding whole articles for classification. Unset: the model's own "
+            "max_seq_length, the input the classifier was trained on; lower it only once "
+            "benchmarks.embedding_batching_benchmark shows full classifier label agreement"
+        )
+    )
+    rag_memory_index_dtype: str = Field(
+        default="float16",
+        env="RAG_MEMORY_INDEX_DTYPE",
+        description="Storage dtype of the in-memory vector index (float32, float16, or int8 with a per-vector scale)"
+    )
+    rag_vector_cache_max_mb: float = Field(
+        default=256.0,
+        env="RAG_VECTOR_CACHE_MAX_MB",
+        description="Memory budget in MB for in-process vector stores kept for reuse across analyses (LRU eviction)"
+    )
+    rag_memory_index_hnsw_min_chunks: Optional[int] = Field(
+        default=None,
+        env="RAG_MEMORY_INDEX_HNSW_MIN_CHUNKS",
+        description="Vector planner: build an in-memory HNSW graph (requires hnswlib) instead of exact search from this many chunks; None disables it"
+    )
+    rag_milvus_min_chunks: Optional[int] = Field(
+        default=50000,
+        env="RAG_MILVUS_MIN_CHUNKS",
+        description="Vector planner: store an article set in Milvus (when reachable) from this many chunks; None keeps it in memory"
+    )
+    rag_persist_vectors: bool = Field(
+        default=False,
+        env="RAG_PERSIST_VECTORS",
+        description="Vector planner: always store vectors in Milvus (when reachable) so they outlive the process"
+    )
+    rag_analysis_cache_backend: str = Field(
+        default="redis",
+        env="RAG_ANALYSIS_CACHE_BACKEND",
+        description="Where finished analyses are cached: redis (shared by all workers) or memory"
+    )
+    rag_analysis_cache_ttl_seconds: int = Field(default=86400, env="RAG_ANALYSIS_CACHE_TTL_SECONDS")
+    rag_analysis_cache_max_entries: int = Field(default=1000, env="RAG_ANALYSIS_CACHE_MAX_ENTRIES")
+    rag_analysis_cache_memory_max_entries: int = Field(
+        default=10,
+        env="RAG_ANALYSIS_CACHE_MEMORY_MAX_ENTRIES",
+        description="Cap of the in-process analysis cache (memory backend, or fallback when Redis is down)"
+    )
+    rag_analysis_cache_max_payload_kb: int = Field(
+        default=1024,
+        env="RAG_ANALYSIS_CACHE_MAX_PAYLOAD_KB",
+        description="Compressed results larger than this are not cached"
+    )
+    rag_extraction_mode: str = Field(
+        default="separate",
+        env="RAG_EXTRACTION_MODE",
+        description="separate: one LLM call per category; packed: categories with overlapping context share one call"
+    )
+    rag_pack_overlap_threshold: float = Field(
+        default=0.5,
+        env="RAG_PACK_OVERLAP_THRESHOLD",
+        description="Minimum Jaccard overlap of retrieved chunks for two categories to share a packed prompt"
+    )
+    rag_pack_max_categories: int = Field(default=4, env="RAG_PACK_MAX_CATEGORIES")
+    rag_context_token_budget: int = Field(
+        default=1200,
+        env="RAG_CONTEXT_TOKEN_BUDGET",
+        description="Maximum prompt tokens of retrieved context per category"
+    )
+    rag_mmr_lambda: float = Field(
+        default=0.7,
+        env="RAG_MMR_LAMBDA",
+        description="MMR trade-off between relevance (1.0) and diversity (0.0) when selecting context chunks"
+    )
+    rag_mmr_fetch_k: int = Field(
+        default=8,
+        env="RAG_MMR_FETCH_K",
+        description="Candidate chunks retrieved per category before MMR selection"
+    )
+    rag_incremental_analysis: bool = Field(
+        default=True,
+        env="RAG_INCREMENTAL_ANALYSIS",
+        description="Reuse stored category results whose retrieved chunks are unchanged when a company is re-analyzed"
+    )
+    article_dedup_enabled: bool = Field(
+        default=True,
+        env="ARTICLE_DEDUP_ENABLED",
+        description="Collapse republished copies of the same article before classification and RAG analysis"
+    )
+    article_dedup_max_distance: int = Field(
+        default=6,
+        env="ARTICLE_DEDUP_MAX_DISTANCE",
+        description="Maximum SimHash Hamming distance (of 64 bits) for two articles to count as duplicates"
+    )
+    rag_max_concurrent_categories: int = Field(
+        default=5,
+        env="RAG_MAX_CONCURRENT_CATEGORIES",
+        description="Maximum number of category extractions (LLM calls) in flight per analysis"
+    )
 
 settings = Settings()
@@ -188,6 +188,7 @@ def create_all_tables() -> bool:
                         future_plans TEXT,
                         action_plan TEXT,
                         solutions TEXT,
+                        retrieval_state MEDIUMTEXT,
                         analysis_type ENUM('comprehensive', 'hybrid', 'intelligence', 'summarization') DEFAULT 'comprehensive',
                         confidence_score DECIMAL(3,2) DEFAULT 0.00,
                         date_analyzed DATE NOT NULL,
@@ -208,6 +209,19 @@ def create_all_tables() -> bool:
                 logger.info("✅ Created 'analysis' table")
         else:
             logger.info("✅ 'analysis' table already exists")
+            # Add missing columns if they don't exist (migration)
+            with connection.cursor() as cursor:
+                # Check and add retrieval_state column (used for incremental RAG re-analysis)
+                cursor.execute("""
+                    SELECT COUNT(*) as count
+                    FROM information_schema.columns
+                    WHERE table_schema = %s AND table_name = 'analysis' AND column_name = 'retrieval_state'
+                """, (settings.db_name,))
+                if cursor.fetchone()['count'] == 0:
+                    cursor.execute("ALTER TABLE analysis ADD COLUMN retrieval_state MEDIUMTEXT AFTER solutions")
+                    logger.info("✅ Added 'retrieval_state' column to 'analysis' table")
+                
+                connection.commit()
         
         # Create Article table
         if not table_exists(connection, 'article'):
@@ -225,6 +239,7 @@ def create_all_tables() -> bool:
                         relevance_score DECIMAL(3,2) DEFAULT 0.00,
                         classification ENUM('Directly Relevant', 'Indirectly Useful', 'Not Relevant', 'news', 'update', 'announcement', 'financial', 'partnership', 'product', 'other') DEFAULT 'Not Relevant',
                         sentiment ENUM('positive', 'negative', 'neutral') DEFAULT 'neutral',
+                        sources MEDIUMTEXT,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                         
@@ -234,6 +249,7 @@ def create_all_tables() -> bool:
                         INDEX idx_article_published (published_date),
                         INDEX idx_article_relevance (relevance_score),
                         INDEX idx_article_url (url),
+                        UNIQUE KEY uq_article_company_url (company_id, url),
                         INDEX idx_article_company_classification (company_id, classification),
                         INDEX idx_article_company_published (company_id, published_date DESC),
                         
@@ -244,6 +260,53 @@ def create_all_tables() -> bool:
                 logger.info("✅ Created 'article' table")
         else:
             logger.info("✅ 'article' table already exists")
+            # Add the (company_id, url) unique key and missing columns if they don't exist (migration)
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*) as count
+                    FROM information_schema.statistics
+                    WHERE table_schema = %s AND table_name = 'article' AND index_name = 'uq_article_company_url'
+                """, (settings.db_name,))
+                if cursor.fetchone()['count'] == 0:
+                    # Earlier bulk stores could save a url twice per company
+                    cursor.execute("""
+                        SELECT COUNT(*) as count FROM article newer
+                        JOIN article older
+                          ON older.company_id = newer.company_id AND older.url = newer.url
+                         AND older.article_id < newer.article_id
+                    """)
+                    duplicates = cursor.fetchone()['count']
+                    if duplicates and settings.db_remove_duplicate_articles:
+                        # Operator opt-in: keep the oldest copy of each duplicated url
+                        cursor.execute("""
+                            DELETE newer FROM article newer
+                            JOIN article older
+                              ON older.company_id = newer.company_id AND older.url = newer.url
+                             AND older.article_id < newer.article_id
+                        """)
+                        logger.info(f"✅ Removed {cursor.rowcount} duplicate articles (DB_REMOVE_DUPLICATE_ARTICLES)")
+                        duplicates = 0
+                    if duplicates:
+                        logger.warning(
+                            f"⚠️ 'article' table has {duplicates} duplicate (company_id, url) rows; not adding the "
+                            f"'uq_article_company_url' unique key. Resolve them, or set DB_REMOVE_DUPLICATE_ARTICLES=true "
+                            f"to delete all but the oldest copy at the next startup."
+                        )
+                    else:
+                        cursor.execute("ALTER TABLE article ADD UNIQUE KEY uq_article_company_url (company_id, url)")
+                        logger.info("✅ Added 'uq_article_company_url' unique key to 'article' table")
+                
+                # Check and add sources column (outlets of the republished copies collapsed into an article)
+                cursor.execute("""
+                    SELECT COUNT(*) as count
+                    FROM information_schema.columns
+                    WHERE table_schema = %s AND table_name = 'article' AND column_name = 'sources'
+                """, (settings.db_name,))
+                if cursor.fetchone()['count'] == 0:
+                    cursor.execute("ALTER TABLE article ADD COLUMN sources MEDIUMTEXT AFTER sentiment")
+                    logger.info("✅ Added 'sources' column to 'article' table")
+                
+                connection.commit()
         
         # Create Recommendation table
         if not table_exists(connection, 'recommendation'):
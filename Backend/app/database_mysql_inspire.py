@@ -5,6 +5,7 @@ Handles connections to the inspire database with proper error handling and conne
 
 import logging
 import json
+import hashlib
 from datetime import datetime, date
 from typing import Optional, Dict, Any, List
 from contextlib import asynccontextmanager
@@ -17,6 +18,34 @@ from app.config import settings
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Widths (in characters) of the article table's VARCHAR columns
+ARTICLE_COLUMN_WIDTHS = {'title': 255, 'url': 255, 'source': 100}
+
+def _fit_article_row(article: Dict[str, Any]) -> tuple:
+    """
+    An article dict as a (url, title, content, source, published_date, relevance_score,
+    classification, sources) row that fits the article columns. Title and source are clipped; an
+    over-long url is clipped and suffixed with a hash of the full url, so two long urls that
+    share a prefix stay distinct under the (company_id, url) unique index. `sources` (the
+    outlets that ran the article, see article_dedup) is stored as JSON.
+    """
+    url = article['url']
+    url_width = ARTICLE_COLUMN_WIDTHS['url']
+    if len(url) > url_width:
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        url = f"{url[:url_width - len(digest) - 1]}#{digest}"
+    source = article.get('source')
+    return (
+        url,
+        article['title'][:ARTICLE_COLUMN_WIDTHS['title']],
+        article.get('content'),
+        source[:ARTICLE_COLUMN_WIDTHS['source']] if source else source,
+        article.get('published_date'),
+        article.get('relevance_score', 0.0),
+        article.get('classification', 'Not Relevant'),
+        json.dumps(article['sources']) if isinstance(article.get('sources'), list) else None,
+    )
+
 class MySQLInspireConnection:
     """MySQL connection manager for INSPIRE database"""
     
@@ -97,6 +126,18 @@ class MySQLInspireConnection:
                 connection.close()
                 self.current_connections -= 1
     
+    @asynccontextmanager
+    async def transaction(self):
+        """Get a pooled connection inside a transaction (committed on success, rolled back on error)"""
+        async with self.get_connection() as conn:
+            conn.begin()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    
     def _is_connection_alive(self, connection) -> bool:
         """Check if connection is still alive"""
         try:
@@ -455,7 +496,8 @@ class InspireDatabaseService:
     async def create_analysis(self, company_id: int, latest_updates: str = None, challenges: str = None,
                             decision_makers: str = None, market_position: str = None, future_plans: str = None,
                             action_plan: str = None, solutions: str = None, analysis_type: str = 'COMPREHENSIVE',
-                            confidence_score: float = 0.0, date_analyzed: str = None, status: str = 'COMPLETED') -> int:
+                            confidence_score: float = 0.0, date_analyzed: str = None, status: str = 'COMPLETED',
+                            retrieval_state: str = None) -> int:
         """Create a new analysis record"""
         if not date_analyzed:
             from datetime import date
@@ -468,12 +510,13 @@ class InspireDatabaseService:
         
         query = """
         INSERT INTO analysis (company_id, latest_updates, challenges, decision_makers, market_position,
-                            future_plans, action_plan, solutions, analysis_type, date_analyzed, status)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                            future_plans, action_plan, solutions, analysis_type, date_analyzed, status,
+                            retrieval_state)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         return await self.db.execute_insert(query, (company_id, latest_updates, challenges, decision_makers,
                                                    market_position, future_plans, action_plan, solutions,
-                                                   analysis_type, date_analyzed, status))
+                                                   analysis_type, date_analyzed, status, retrieval_state))
     
     async def get_analysis_for_company(self, company_id: int) -> List[Dict[str, Any]]:
         """Get all analyses for a company"""
@@ -499,6 +542,54 @@ class InspireDatabaseService:
         results = await self.db.execute_query(query, (company_id,))
         return results[0] if results else None
     
+    async def get_previous_rag_analysis(self, company_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the stored results and retrieval state of the company's latest RAG analysis,
+        in the shape RAGAnalysisService expects for incremental re-analysis
+        """
+        query = """
+        SELECT a.latest_updates, a.challenges, a.decision_makers, a.market_position, a.future_plans,
+               a.action_plan, a.solutions, a.retrieval_state,
+               c.company_info, c.strengths, c.opportunities
+        FROM analysis a
+        JOIN company c ON a.company_id = c.company_id
+        WHERE a.company_id = %s AND a.retrieval_state IS NOT NULL
+        ORDER BY a.analysis_id DESC
+        LIMIT 1
+        """
+        rows = await self.db.execute_query(query, (company_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        
+        try:
+            retrieval_state = json.loads(row['retrieval_state'])
+        except (TypeError, ValueError):
+            return None
+        
+        # Category key -> column holding its stored data
+        columns = {
+            'latest_updates': 'latest_updates',
+            'challenges': 'challenges',
+            'decision_makers': 'decision_makers',
+            'market_position': 'market_position',
+            'future_plans': 'future_plans',
+            'action_plan': 'action_plan',
+            'solution': 'solutions',
+            'company_info': 'company_info',
+            'strengths': 'strengths',
+            'opportunities': 'opportunities',
+        }
+        results = {}
+        for category, column in columns.items():
+            try:
+                results[category] = json.loads(row[column]) if row[column] else None
+            except (TypeError, ValueError):
+                # Truncated or legacy values can't be reused; the category is extracted again
+                results[category] = None
+        
+        return {'results': results, 'retrieval_state': retrieval_state}
+    
     # Article Operations
     async def create_article(self, company_id: int, title: str, url: str, content: str = None,
                            source: str = None, published_date: str = None, relevance_score: float = 0.0,
@@ -511,6 +602,66 @@ class InspireDatabaseService:
         return await self.db.execute_insert(query, (company_id, title, url, content, source, published_date,
                                                    relevance_score, classification))
     
+    async def create_articles(self, company_id: int, articles: List[Dict[str, Any]], upsert: bool = False,
+                            batch_size: int = 500) -> List[int]:
+        """
+        Create many article records in one transaction (one multi-row INSERT per `batch_size` rows)
+        
+        Each article dict takes the keyword arguments of create_article (title and url required);
+        title, url and source are fitted to their column widths first (see _fit_article_row).
+        Returns the article ids in input order. A url that already exists for the company - urls are
+        compared under the column's collation by the uq_article_company_url index - raises
+        IntegrityError, unless upsert=True: then the existing article is updated in place and a url
+        repeated within `articles` is stored once (its last occurrence wins). A database whose old
+        duplicates still block the index (see database_init) stores urls again instead.
+        """
+        if not articles:
+            return []
+        
+        # (url, title, content, source, published_date, relevance_score, classification, sources)
+        rows = [_fit_article_row(article) for article in articles]
+        on_duplicate = """
+            ON DUPLICATE KEY UPDATE title = VALUES(title), content = VALUES(content), source = VALUES(source),
+                published_date = VALUES(published_date), relevance_score = VALUES(relevance_score),
+                classification = VALUES(classification), sources = VALUES(sources)
+        """ if upsert else ""
+        
+        try:
+            ids: List[Optional[int]] = [None] * len(rows)
+            async with self.db.transaction() as conn:
+                with conn.cursor() as cursor:
+                    for start in range(0, len(rows), batch_size):
+                        batch = rows[start:start + batch_size]
+                        cursor.execute(
+                            "INSERT INTO article (company_id, url, title, content, source, published_date, "
+                            "relevance_score, classification, sources) VALUES "
+                            + ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(batch)) + on_duplicate,
+                            tuple(value for row in batch for value in (company_id, *row))
+                        )
+                        # The ids are looked up rather than derived from lastrowid: a multi-row INSERT's
+                        # auto-increment values need not be consecutive (innodb_autoinc_lock_mode=2) and
+                        # upserted rows keep theirs. The join matches urls with the column's collation,
+                        # exactly like the unique index does, so case or trailing-space variants resolve.
+                        cursor.execute(
+                            "SELECT v.idx, a.article_id FROM ("
+                            + " UNION ALL ".join(["SELECT %s AS idx, %s AS url"] * len(batch))
+                            + ") AS v JOIN article a ON a.company_id = %s "
+                            "AND a.url = v.url COLLATE utf8mb4_unicode_ci ORDER BY a.article_id",
+                            (*(value for offset, row in enumerate(batch) for value in (start + offset, row[0])),
+                             company_id)
+                        )
+                        for found in cursor.fetchall():
+                            if ids[found['idx']] is None:
+                                ids[found['idx']] = found['article_id']
+                    
+                    missing = [rows[i][0] for i, article_id in enumerate(ids) if article_id is None]
+                    if missing:
+                        raise RuntimeError(f"Inserted articles not found again: {missing[:5]}")
+            return ids
+        except Exception as e:
+            logger.error(f"Error creating {len(articles)} articles: {str(e)}")
+            raise
+    
     async def get_articles_for_company(self, company_id: int, limit: int = 50) -> List[Dict[str, Any]]:
         """Get articles for a company"""
         query = """
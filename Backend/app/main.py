@@ -17,6 +17,7 @@ except Exception as e:
     print(f"⚠️  RAG analysis unavailable: {e}")
 from app.middleware import setup_middleware
 from app.logging_config import setup_logging
+from app.utils.event_loop import close_loop_sessions
 
 def is_port_open(host: str, port: int) -> bool:
     """Check if a port is open"""
@@ -164,6 +165,9 @@ async def lifespan(app: FastAPI):
     print("\n" + "="*60)
     print("🛑 Server Shutting Down...")
     print("="*60 + "\n")
+    
+    # Shared HTTP sessions (SerpAPI, OpenAI) opened on the server's event loop
+    await close_loop_sessions()
 
 app = FastAPI(
     title=settings.app_name,
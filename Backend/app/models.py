@@ -1,3 +1,4 @@
+import json
 from datetime import datetime, date
 from typing import List, Optional, Dict, Any, Generic, TypeVar, Union
 from enum import Enum
@@ -270,6 +271,15 @@ class ArticleCreateINSPIRE(BaseModel):
     classification: ArticleClassification = Field(ArticleClassification.NEWS, description="Article classification")
     sentiment: Sentiment = Field(Sentiment.NEUTRAL, description="Article sentiment")
 
+def _parse_article_sources(value):
+    """The article's `sources` column holds JSON text"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
 class ArticleINSPIRE(BaseModel):
     article_id: int
     company_id: int
@@ -277,6 +287,7 @@ class ArticleINSPIRE(BaseModel):
     url: str
     content: Optional[str] = None
     source: Optional[str] = None
+    sources: Optional[List[Dict[str, Any]]] = Field(None, description="Outlets that ran this article (republished copies)")
     published_date: Optional[date] = None
     relevance_score: float
     classification: ArticleClassification
@@ -284,6 +295,8 @@ class ArticleINSPIRE(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
+    _parse_sources = field_validator("sources", mode="before")(_parse_article_sources)
+
 class ArticleWithDetails(BaseModel):
     article_id: int
     company_id: int
@@ -291,12 +304,15 @@ class ArticleWithDetails(BaseModel):
     url: str
     content: Optional[str] = None
     source: Optional[str] = None
+    sources: Optional[List[Dict[str, Any]]] = Field(None, description="Outlets that ran this article (republished copies)")
     published_date: Optional[date] = None
     relevance_score: float
     classification: ArticleClassification
     sentiment: Sentiment
     company_name: Optional[str] = None
 
+    _parse_sources = field_validator("sources", mode="before")(_parse_article_sources)
+
 # Dashboard Models
 class DashboardStats(BaseModel):
     total_smes: int
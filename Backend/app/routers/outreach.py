@@ -32,6 +32,8 @@ outreach_service = OutreachService()
 async def generate_outreach(
     company_id: int = Form(..., description="Company ID to generate outreach for"),
     outreach_type: str = Form(..., description="Type of outreach: email, call, or meeting"),
+    deterministic: bool = Form(False, description="Reproducible draft (temperature 0); identical requests are served from the cache"),
+    regenerate: bool = Form(False, description="With deterministic: generate the draft again instead of reusing the cached one"),
     current_sme: Dict[str, Any] = Depends(get_current_sme)
 ):
     """
@@ -140,7 +142,9 @@ async def generate_outreach(
                 'objective': sme_info.get('objective')
             },
             relevant_articles=relevant_articles,
-            rag_analysis=rag_analysis  # Include RAG analysis data
+            rag_analysis=rag_analysis,  # Include RAG analysis data
+            deterministic=deterministic,
+            bypass_cache=regenerate
         )
         
         # Extract subject from content for email campaigns
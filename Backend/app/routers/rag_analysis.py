@@ -177,19 +177,22 @@ async def rag_company_analysis(
         # Initialize RAG service
         rag_svc = get_rag_service()
         
-        # Update hyperparameters if provided
-        if temperature is not None:
-            rag_svc.hyperparameters['temperature'] = temperature
-        if top_k is not None:
-            rag_svc.hyperparameters['top_k'] = top_k
+        # Per-request overrides; the shared service defaults are left untouched
+        hyperparameter_overrides = {
+            'temperature': temperature,
+            'top_k': top_k
+        }
         
         # Perform RAG analysis
         logger.info(f"🚀 Starting RAG analysis...")
         
-        analysis_result = rag_svc.analyze_comprehensive(
+        # Runs on this event loop (CPU stages are offloaded to threads), so the worker
+        # can keep serving other requests while the category LLM calls are in flight
+        analysis_result = await rag_svc.analyze_comprehensive_async(
             articles=validated_articles,
             company_name=company_name,
-            sme_objective=sme_objective
+            sme_objective=sme_objective,
+            hyperparameters=hyperparameter_overrides
         )
         
         # Format response
@@ -411,6 +414,7 @@ async def check_rag_health():
         health_status = {
             'embedding_model': 'available',
             'vector_storage': 'milvus' if rag_svc.milvus_available else 'in-memory',
+            'milvus': rag_svc.milvus_connection.status() if rag_svc.milvus_connection else None,
             'llm': 'checking...'
         }
         
@@ -13,7 +13,7 @@ import redis
 import json
 from datetime import datetime
 
-from app.tasks.unified_analysis_task import run_unified_analysis
+from app.tasks.unified_analysis_task import start_unified_analysis
 
 router = APIRouter()
 
@@ -156,7 +156,7 @@ async def unified_company_analysis(
     
     # Queue the Celery task
     try:
-        task = run_unified_analysis.delay(
+        task = start_unified_analysis(
             company_name=company_name,
             company_location=company_location,
             sme_id=sme_id,
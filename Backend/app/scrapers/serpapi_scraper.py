@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from app.scrapers.base import BaseScraper, ScrapeResult
 from app.models import Company, DataSource, NewsArticle, WebsiteUpdate, BusinessRegistry
 from app.config import settings
+from app.utils.event_loop import loop_session
 from loguru import logger
 
 class SerpApiScraper(BaseScraper):
@@ -18,10 +19,11 @@ class SerpApiScraper(BaseScraper):
         self.session = None
 
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=settings.request_timeout)
-            )
+        # One session per event loop, shared by every scraper instance running on it
+        self.session = loop_session(
+            "serpapi",
+            lambda: aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=settings.request_timeout))
+        )
         return self.session
 
     async def scrape_company(self, company: Company) -> ScrapeResult:
@@ -368,7 +370,3 @@ class SerpApiScraper(BaseScraper):
         except Exception as e:
             logger.warning(f"Failed to parse date '{date_str}': {e}")
             return datetime.utcnow()
-
-    async def close(self):
-        if self.session and not self.session.closed:
-            await self.session.close()
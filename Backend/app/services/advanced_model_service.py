@@ -3,8 +3,11 @@ import json
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
 from typing import Dict, List, Any, Tuple
+from app.config import settings
+from app.services.embedding_encoder import encode_texts
+from app.services.embedding_backend import get_shared_embedding_model
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -53,15 +56,13 @@ class AdvancedModelService:
                 self.scaler = pickle.load(f)
 
             sentence_model_info = self.model_path / "sentence_model_info.json"
-            # Force CPU device to prevent MPS/SIGSEGV crashes
-            import torch
-            device = 'cpu'  # Always use CPU
+            # CPU only (prevents MPS/SIGSEGV crashes); PyTorch or int8 ONNX per EMBEDDING_BACKEND, shared with RAG
             if sentence_model_info.exists():
                 with open(sentence_model_info, 'r') as f:
                     model_info = json.load(f)
-                self.sentence_model = SentenceTransformer(model_info['model_name'], device=device)
+                self.sentence_model = get_shared_embedding_model(model_info['model_name'])
             else:
-                self.sentence_model = SentenceTransformer('BAAI/bge-m3', device=device)
+                self.sentence_model = get_shared_embedding_model('BAAI/bge-m3')
 
             print(f"Model loaded successfully: {self.config['model_type']}")
             print(f"Model performance: F1={self.config['performance_metrics']['f1_score']:.3f}")
@@ -85,18 +86,24 @@ class AdvancedModelService:
     def _create_weak_labels(self, texts: List[str], company_objective: str,
                           direct_threshold: float = 0.65, indirect_threshold: float = 0.45) -> Tuple[List[int], List[float]]:
 
-        objectives_embedding = self.sentence_model.encode(company_objective, normalize_embeddings=True)
+        objectives_embedding = encode_texts(
+            self.sentence_model,
+            [company_objective],
+            max_seq_length=settings.classification_max_seq_length,
+            normalize_embeddings=True
+        )[0]
 
         labels = []
         similarities = []
 
-        batch_size = 256
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_embeddings = self.sentence_model.encode(batch_texts, normalize_embeddings=True)
-
-            batch_similarities = util.cos_sim(batch_embeddings, objectives_embedding).cpu().numpy().flatten()
-            similarities.extend(batch_similarities.tolist())
+        text_embeddings = encode_texts(
+            self.sentence_model,
+            texts,
+            max_seq_length=settings.classification_max_seq_length,
+            normalize_embeddings=True
+        )
+        if len(text_embeddings):
+            similarities = util.cos_sim(text_embeddings, objectives_embedding).cpu().numpy().flatten().tolist()
 
         similarities = self._apply_keyword_boost(texts, similarities)
 
@@ -241,7 +248,12 @@ class AdvancedModelService:
         texts = df['combined_text'].tolist()
 
         print("Generating embeddings...")
-        embeddings = self.sentence_model.encode(texts, convert_to_tensor=False, normalize_embeddings=True)
+        embeddings = encode_texts(
+            self.sentence_model,
+            texts,
+            max_seq_length=settings.classification_max_seq_length,
+            normalize_embeddings=True
+        )
 
         embeddings_scaled = self.scaler.transform(embeddings)
 
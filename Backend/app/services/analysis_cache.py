@@ -0,0 +1,204 @@
+"""
+Pluggable cache for finished RAG analyses
+
+The in-process backend is a small LRU dict and only helps when the same
+service instance sees a repeat. The Redis backend is shared by the API and
+every Celery worker: entries are stored as zlib-compressed JSON under a hash
+of the analysis cache key, expire after a TTL, and the number of entries is
+capped through a sorted-set index ordered by write time. Both backends count
+hits and misses.
+"""
+
+import copy
+import json
+import time
+import zlib
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from loguru import logger
+
+import redis
+
+from app.config import settings
+
+
+class AnalysisCacheBackend(ABC):
+    """Interface of an analysis cache backend"""
+
+    name = "base"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        """The cached entry for `key`, or None (counted as a hit or miss)"""
+
+    @abstractmethod
+    def set(self, key: tuple, entry: Dict[str, Any]) -> None:
+        """Store `entry` under `key`"""
+
+    def _record(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class InMemoryAnalysisCache(AnalysisCacheBackend):
+    """Per-process LRU cache"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Move to end for LRU behavior
+                self._entries.move_to_end(key)
+        self._record(entry is not None)
+        return copy.deepcopy(entry) if entry is not None else None
+
+    def set(self, key: tuple, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = copy.deepcopy(entry)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisAnalysisCache(AnalysisCacheBackend):
+    """Cross-process cache stored in Redis"""
+
+    name = "redis"
+
+    def __init__(
+        self,
+        client: "redis.Redis",
+        ttl_seconds: int = 86400,
+        max_entries: int = 1000,
+        max_payload_bytes: int = 1024 * 1024,
+        prefix: str = "rag:analysis:"
+    ):
+        super().__init__()
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_payload_bytes = max_payload_bytes
+        self.prefix = prefix
+        self._index_key = f"{prefix}index"
+        self._stats_key = f"{prefix}stats"
+
+    def _redis_key(self, key: tuple) -> str:
+        digest = hashlib.sha256(json.dumps(list(key), default=str).encode('utf-8')).hexdigest()
+        return f"{self.prefix}{digest}"
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        try:
+            payload = self.client.get(self._redis_key(key))
+            entry = json.loads(zlib.decompress(payload)) if payload is not None else None
+            self.client.hincrby(self._stats_key, 'hits' if entry is not None else 'misses', 1)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis analysis cache read failed: {e}")
+            entry = None
+        self._record(entry is not None)
+        return entry
+
+    def set(self, key: tuple, entry: Dict[str, Any]) -> None:
+        try:
+            payload = zlib.compress(json.dumps(entry, default=str).encode('utf-8'), 6)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Analysis result is not serializable, not caching: {e}")
+            return
+
+        if len(payload) > self.max_payload_bytes:
+            logger.info(f"ℹ️ Analysis result too large to cache ({len(payload)} bytes compressed)")
+            return
+
+        redis_key = self._redis_key(key)
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(redis_key, payload, ex=self.ttl_seconds)
+            pipe.zadd(self._index_key, {redis_key: time.time()})
+            # Entries expired by TTL fall out of the index here as well
+            pipe.zremrangebyscore(self._index_key, '-inf', time.time() - self.ttl_seconds)
+            pipe.execute()
+
+            overflow = self.client.zcard(self._index_key) - self.max_entries
+            if overflow > 0:
+                oldest = self.client.zrange(self._index_key, 0, overflow - 1)
+                if oldest:
+                    pipe = self.client.pipeline()
+                    pipe.delete(*oldest)
+                    pipe.zrem(self._index_key, *oldest)
+                    pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Redis analysis cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        try:
+            shared = self.client.hgetall(self._stats_key)
+            shared_hits = int(shared.get(b'hits', 0))
+            shared_misses = int(shared.get(b'misses', 0))
+            lookups = shared_hits + shared_misses
+            stats['shared'] = {
+                'hits': shared_hits,
+                'misses': shared_misses,
+                'hit_rate': round(shared_hits / lookups, 3) if lookups else 0.0,
+                'entries': int(self.client.zcard(self._index_key)),
+            }
+        except Exception as e:
+            logger.debug(f"Could not read shared analysis cache stats: {e}")
+        return stats
+
+
+def create_analysis_cache() -> AnalysisCacheBackend:
+    """Build the configured analysis cache backend (falls back to in-memory if Redis is unreachable)"""
+    backend = settings.rag_analysis_cache_backend.lower()
+    if backend == "redis":
+        for url in dict.fromkeys([
+            settings.redis_url,
+            # Fallback to localhost for local development
+            settings.redis_url.replace('redis://redis:', 'redis://localhost:'),
+        ]):
+            try:
+                client = redis.from_url(url, socket_connect_timeout=2, socket_timeout=2)
+                client.ping()
+                logger.info(f"✅ RAG analysis cache: Redis at {url}")
+                return RedisAnalysisCache(
+                    client,
+                    ttl_seconds=settings.rag_analysis_cache_ttl_seconds,
+                    max_entries=settings.rag_analysis_cache_max_entries,
+                    max_payload_bytes=settings.rag_analysis_cache_max_payload_kb * 1024
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Redis analysis cache unavailable at {url}: {e}")
+        logger.warning("⚠️ Using in-process RAG analysis cache")
+    elif backend != "memory":
+        logger.warning(f"⚠️ Unknown RAG analysis cache backend '{backend}', using in-process cache")
+
+    # Full analyses held per process: keep the in-process cap small, unlike Redis' shared one
+    return InMemoryAnalysisCache(max_entries=settings.rag_analysis_cache_memory_max_entries)
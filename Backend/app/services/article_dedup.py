@@ -0,0 +1,111 @@
+"""
+Cross-article near-duplicate detection
+
+News search results for a company often carry the same press release
+republished by several outlets. Articles are clustered when their normalized
+titles match or their content SimHashes are within a small Hamming distance.
+Short titles ("Press Release", "Company Update", the "Untitled" placeholder)
+say nothing about the story, so such articles merge on content only. Each
+cluster is reduced to one representative (the copy with the most content)
+that keeps the list of every outlet that ran it.
+"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+from app.services.text_chunker import SimHashIndex, simhash
+
+# Content shorter than this is too small for a stable SimHash; such articles are matched on title only
+MIN_CONTENT_WORDS = 40
+
+# Normalized titles with fewer words are too generic to identify a story
+MIN_TITLE_WORDS = 4
+
+# "Acme raises $10m - Reuters" / "Acme raises $10m | TechCrunch"
+_OUTLET_SUFFIX = re.compile(r'\s+[-|–—]\s+[^-|–—]{1,60}$')
+
+
+def normalize_title(title: str) -> str:
+    """Lowercased title without outlet suffix, punctuation or extra whitespace"""
+    title = (title or '').strip()
+    stripped = _OUTLET_SUFFIX.sub('', title)
+    # Keep the suffix if stripping it would leave almost nothing
+    if len(stripped.split()) >= 4:
+        title = stripped
+    return ' '.join(re.findall(r'\w+', title.lower()))
+
+
+def deduplicate_articles(
+    articles: List[Dict[str, Any]],
+    max_distance: int = 6
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Collapse near-duplicate articles into one representative per cluster
+
+    `articles` are dicts with at least title, content, url and source. Each returned
+    representative is a copy of one input dict with `sources` (source/url of every
+    article in its cluster) and `duplicate_count` added; order follows the first
+    appearance of each cluster.
+    """
+    parent = list(range(len(articles)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int) -> None:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    by_title: Dict[str, int] = {}
+    content_index = SimHashIndex(max_distance)
+    title_matches = 0
+    content_matches = 0
+
+    for i, article in enumerate(articles):
+        title_key = normalize_title(article.get('title', ''))
+        if len(title_key.split()) >= MIN_TITLE_WORDS:
+            if title_key in by_title:
+                if find(i) != find(by_title[title_key]):
+                    title_matches += 1
+                union(i, by_title[title_key])
+            else:
+                by_title[title_key] = i
+
+        content = article.get('content') or ''
+        if len(content.split()) < MIN_CONTENT_WORDS:
+            continue
+
+        fingerprint = simhash(content)
+        for j in content_index.near(fingerprint):
+            if find(i) != find(j):
+                content_matches += 1
+                union(i, j)
+        content_index.add(i, fingerprint)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(articles)):
+        clusters.setdefault(find(i), []).append(i)
+
+    representatives = []
+    for members in clusters.values():
+        best = max(members, key=lambda m: (len(articles[m].get('content') or ''), -m))
+        representative = dict(articles[best])
+        representative['sources'] = [
+            {'source': articles[m].get('source'), 'url': articles[m].get('url')} for m in members
+        ]
+        representative['duplicate_count'] = len(members) - 1
+        representatives.append(representative)
+
+    stats = {
+        'articles_in': len(articles),
+        'articles_out': len(representatives),
+        'duplicates_removed': len(articles) - len(representatives),
+        'clusters_with_duplicates': sum(1 for members in clusters.values() if len(members) > 1),
+        'title_matches': title_matches,
+        'content_matches': content_matches,
+    }
+    return representatives, stats
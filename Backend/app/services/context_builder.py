@@ -0,0 +1,110 @@
+"""
+Token-budgeted context selection for category prompts
+
+Retrieval returns a pool of candidate chunks per category. Instead of pasting
+the top few into the prompt as-is, chunks are picked by Maximal Marginal
+Relevance (relevance to the category query minus similarity to the chunks
+already picked, using the embeddings already held by the vector store) until
+the category's token budget is used up. Syndicated or overlapping chunks then
+stop crowding out other evidence, and prompt size stays predictable.
+
+Tokens are counted with tiktoken (the encoding of the OpenAI model) when it is
+installed, otherwise estimated from the character count.
+"""
+
+import functools
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# tiktoken (optional, a character-based estimate is used without it)
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None  # type: ignore
+    TIKTOKEN_AVAILABLE = False
+
+# English news text averages about 4 characters per GPT token
+CHARS_PER_TOKEN_ESTIMATE = 4
+
+
+@functools.lru_cache(maxsize=4)
+def _get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def token_counter_name() -> str:
+    return "tiktoken" if TIKTOKEN_AVAILABLE else "estimate"
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Number of prompt tokens `text` costs with the OpenAI `model`"""
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        return len(_get_encoding(model).encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN_ESTIMATE)
+
+
+def format_context_chunk(chunk: Dict[str, Any]) -> str:
+    """How a retrieved chunk appears in the CONTEXT block of a prompt"""
+    return f"[Article: {chunk['title']}]\n{chunk['text']}"
+
+
+def select_context_chunks(
+    chunks: List[Dict[str, Any]],
+    chunk_embeddings: Optional[np.ndarray],
+    token_budget: int,
+    max_chunks: int,
+    mmr_lambda: float = 0.7,
+    model: str = "gpt-4o"
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Pick up to `max_chunks` chunks by MMR whose formatted size fits `token_budget`
+
+    `chunks` are retrieval hits sorted best-first; their 'similarity' to the query is the
+    relevance term. Embeddings must be L2-normalized; without them chunks are taken in
+    retrieval order. The best chunk is always kept, even if it alone exceeds the budget;
+    otherwise the joined context (separators included) never exceeds it.
+    Returns the selected chunks (in selection order) and token statistics, including the
+    size of the plain top-`max_chunks` context for comparison.
+    """
+    if not chunks:
+        return [], {'candidates': 0, 'selected': 0, 'context_tokens': 0, 'top_k_context_tokens': 0}
+
+    tokens = [count_tokens(format_context_chunk(chunk), model) for chunk in chunks]
+    relevance = np.array([chunk['similarity'] for chunk in chunks], dtype=np.float32)
+    use_mmr = chunk_embeddings is not None and len(chunk_embeddings) == len(chunks)
+    pairwise = chunk_embeddings @ chunk_embeddings.T if use_mmr else None
+
+    selected: List[int] = []
+    used_tokens = 0
+    remaining = list(range(len(chunks)))
+    while remaining and len(selected) < max_chunks:
+        if use_mmr and selected:
+            redundancy = pairwise[np.ix_(remaining, selected)].max(axis=1)
+            scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+            order = [remaining[i] for i in np.argsort(-scores, kind='stable')]
+        else:
+            order = remaining
+
+        # Best-scoring candidate that still fits, with the blank line joining it to the
+        # chunks before it (the first pick always fits)
+        separator = 1 if selected else 0
+        pick = next((i for i in order if not selected or used_tokens + separator + tokens[i] <= token_budget), None)
+        if pick is None:
+            break
+        selected.append(pick)
+        used_tokens += separator + tokens[pick]
+        remaining.remove(pick)
+
+    stats = {
+        'candidates': len(chunks),
+        'selected': len(selected),
+        'context_tokens': used_tokens,
+        'top_k_context_tokens': sum(tokens[:max_chunks]) + max(min(len(chunks), max_chunks) - 1, 0),
+    }
+    return [chunks[i] for i in selected], stats
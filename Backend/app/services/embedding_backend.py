@@ -0,0 +1,221 @@
+"""
+Embedding model backends
+
+EMBEDDING_BACKEND=torch (default) loads bge-m3 with sentence-transformers in
+full precision. EMBEDDING_BACKEND=onnx runs an int8 dynamically-quantized ONNX
+export of the same model through onnxruntime with a fixed number of intra-op
+threads: a fraction of the load time and memory, and faster CPU inference.
+The export is created on first use (needs torch and onnx) under
+ONNX_MODEL_DIR and reused afterwards; it can also be built ahead of time with
+`python -m app.services.embedding_backend --export`.
+
+OnnxEmbeddingModel implements the part of the SentenceTransformer interface
+the services use (encode, get_sentence_embedding_dimension, tokenizer,
+max_seq_length), so callers don't care which backend they got.
+"""
+
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from typing import List, Optional, Union
+from loguru import logger
+
+from app.config import settings
+
+# onnxruntime (optional, the PyTorch backend is used without it)
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    onnxruntime = None  # type: ignore
+    ONNXRUNTIME_AVAILABLE = False
+
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+
+def _export_dir(model_name: str) -> str:
+    return os.path.join(settings.onnx_model_dir, model_name.replace('/', '__'))
+
+
+def export_quantized_onnx(model_name: str, output_dir: Optional[str] = None, opset: int = 17) -> str:
+    """Export `model_name` to ONNX and quantize its weights to int8; returns the quantized model path"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_dir = output_dir or _export_dir(model_name)
+    # The fp32 graph of bge-m3 exceeds protobuf's 2GB limit and is written with external data files
+    fp32_dir = os.path.join(output_dir, "fp32")
+    os.makedirs(fp32_dir, exist_ok=True)
+    fp32_path = os.path.join(fp32_dir, "model.onnx")
+    int8_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+
+    logger.info(f"📦 Exporting {model_name} to ONNX ({output_dir})...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset,
+        )
+
+    logger.info("📦 Quantizing ONNX weights to int8...")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, use_external_data_format=True)
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, "export_info.json"), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "embedding_dim": int(model.config.hidden_size),
+            "max_seq_length": int(min(tokenizer.model_max_length, model.config.max_position_embeddings - 2)),
+            "opset": opset,
+        }, f)
+
+    # Only the quantized graph is used at runtime
+    shutil.rmtree(fp32_dir, ignore_errors=True)
+    logger.info(f"✅ Quantized ONNX model written to {int8_path}")
+    return int8_path
+
+
+class OnnxEmbeddingModel:
+    """Dense (CLS-pooled, L2-normalized) bge-m3 embeddings from an int8 ONNX graph"""
+
+    def __init__(self, model_name: str, model_dir: Optional[str] = None, intra_op_threads: int = 0):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed")
+        from transformers import AutoTokenizer
+
+        model_dir = model_dir or _export_dir(model_name)
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE)
+        if not os.path.exists(model_path):
+            model_path = export_quantized_onnx(model_name, model_dir)
+
+        with open(os.path.join(model_dir, "export_info.json")) as f:
+            info = json.load(f)
+        self.model_name = model_name
+        self.embedding_dim = info["embedding_dim"]
+        self.max_seq_length = info["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        # InferenceSession.run is thread-safe, so one session serves every thread of the worker
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.embedding_dim
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        convert_to_tensor: bool = False,
+        normalize_embeddings: bool = True,
+        **kwargs
+    ) -> np.ndarray:
+        """Same call shape as SentenceTransformer.encode; always returns numpy arrays"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feed = {
+                "input_ids": encoded["input_ids"].astype(np.int64),
+                "attention_mask": encoded["attention_mask"].astype(np.int64),
+            }
+            hidden = self.session.run(["last_hidden_state"], feed)[0]
+            batches.append(hidden[:, 0].astype(np.float32))  # bge-m3 dense = CLS token
+
+        embeddings = np.vstack(batches)
+        # bge-m3's sentence-transformers pipeline always normalizes, so match it
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings = embeddings / norms
+        return embeddings[0] if single else embeddings
+
+
+def embedding_model_id(model_name: str, model) -> str:
+    """Identity of the vectors a loaded model produces (int8 ONNX vectors differ slightly from fp32 ones)"""
+    remote_id = getattr(model, 'model_id', None)
+    if remote_id:
+        return remote_id
+    return f"{model_name}:onnx-int8" if isinstance(model, OnnxEmbeddingModel) else model_name
+
+
+def load_embedding_model(model_name: str = "BAAI/bge-m3", backend: Optional[str] = None, allow_remote: bool = True):
+    """
+    The embedding model for `model_name`: the shared embedding server's client when
+    EMBEDDING_SERVER_URL is set and reachable, otherwise the configured in-process
+    backend (CPU only; falls back to PyTorch)
+    """
+    if allow_remote:
+        from app.services.embedding_client import get_remote_model
+        remote = get_remote_model(model_name)
+        if remote is not None:
+            return remote
+
+    backend = (backend or settings.embedding_backend).lower()
+    if backend == "onnx":
+        try:
+            model = OnnxEmbeddingModel(model_name, intra_op_threads=settings.onnx_intra_op_threads)
+            logger.info(f"✅ Loaded {model_name} as int8 ONNX (onnxruntime)")
+            return model
+        except Exception as e:
+            logger.warning(f"⚠️ ONNX embedding backend unavailable ({e}); loading PyTorch model")
+    elif backend != "torch":
+        logger.warning(f"⚠️ Unknown embedding backend '{backend}', loading PyTorch model")
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device='cpu')
+
+
+_shared_models = {}
+_shared_models_lock = threading.Lock()
+
+
+def get_shared_embedding_model(model_name: str = "BAAI/bge-m3"):
+    """
+    One embedding model per process and model name, shared by classification and RAG
+    (loaded on first use; encode_texts() serializes calls that change max_seq_length)
+    """
+    with _shared_models_lock:
+        model = _shared_models.get(model_name)
+        if model is None:
+            model = _shared_models[model_name] = load_embedding_model(model_name)
+        return model
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the quantized ONNX export of an embedding model")
+    parser.add_argument("--export", action="store_true", required=True)
+    parser.add_argument("--model", default="BAAI/bge-m3")
+    parser.add_argument("--output-dir", default=None)
+    args = parser.parse_args()
+    export_quantized_onnx(args.model, args.output_dir)
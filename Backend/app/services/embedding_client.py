@@ -0,0 +1,171 @@
+"""
+Client for the shared embedding server
+
+RemoteEmbeddingModel looks like a SentenceTransformer to the services
+(encode, get_sentence_embedding_dimension, tokenizer, max_seq_length) but
+sends texts to the embedding server, which batches them with other
+processes' requests. Only the tokenizer is loaded locally (for chunk sizing
+and token counts, no model weights). If the server stops answering, the
+client loads the model in-process and keeps serving from it, trying the
+server again after EMBEDDING_SERVER_RETRY_SECONDS. The in-process model may
+not produce the server's vectors (fp32 vs int8 ONNX), so the client reports
+which backend produced them (active_model_id / last_model_id) and caches
+keyed on vectors use that id rather than the server's model_id.
+"""
+
+import base64
+import threading
+import time
+import numpy as np
+import requests
+from typing import List, Optional, Union
+from loguru import logger
+
+from app.config import settings
+
+
+class EmbeddingServerUnavailable(RuntimeError):
+    pass
+
+
+class RemoteEmbeddingModel:
+    """Embedding model hosted by the shared embedding server"""
+
+    # encode_texts() hands whole inputs to encode(); the server does the batching
+    server_side_batching = True
+
+    def __init__(self, base_url: str, model_name: str = "BAAI/bge-m3", timeout: float = 60.0):
+        self.base_url = base_url.rstrip('/')
+        self.model_name = model_name
+        self.timeout = timeout
+        self._local = threading.local()
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+        self._retry_at = 0.0
+
+        info = self.health()
+        if info.get('model_name') != model_name:
+            raise EmbeddingServerUnavailable(f"server hosts {info.get('model_name')}, not {model_name}")
+        self.model_id = info['model_id']
+        self.embedding_dim = int(info['embedding_dim'])
+        self.max_seq_length = info.get('max_seq_length') or 8192
+
+        try:
+            from transformers import AutoTokenizer
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        except Exception as e:
+            logger.warning(f"⚠️ Tokenizer for {model_name} unavailable, token counts will be estimated: {e}")
+            self.tokenizer = None
+
+    def _session(self) -> requests.Session:
+        # requests.Session is not thread-safe; one per thread
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def health(self) -> dict:
+        try:
+            response = self._session().get(f"{self.base_url}/health", timeout=5)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            raise EmbeddingServerUnavailable(f"embedding server at {self.base_url} unavailable: {e}") from e
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.embedding_dim
+
+    def _fallback_model_id(self) -> str:
+        from app.services.embedding_backend import embedding_model_id
+        return embedding_model_id(self.model_name, self._fallback)
+
+    @property
+    def active_model_id(self) -> str:
+        """Id of the vectors encode() produces right now (the in-process model's while the server is skipped)"""
+        if self._fallback is not None and time.monotonic() < self._retry_at:
+            return self._fallback_model_id()
+        return self.model_id
+
+    @property
+    def last_model_id(self) -> str:
+        """Id of the vectors returned by this thread's last encode() call"""
+        return getattr(self._local, 'last_model_id', None) or self.model_id
+
+    def _encode_remote(self, texts: List[str], max_seq_length: Optional[int], normalize: bool) -> np.ndarray:
+        response = self._session().post(
+            f"{self.base_url}/embed",
+            json={'texts': texts, 'max_seq_length': max_seq_length, 'normalize': normalize},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        payload = response.json()
+        data = np.frombuffer(base64.b64decode(payload['data']), dtype=np.float32)
+        return data.reshape(payload['shape']).copy()
+
+    def _encode_local(self, texts: List[str], max_seq_length: Optional[int], normalize: bool) -> np.ndarray:
+        from app.services.embedding_backend import load_embedding_model
+        from app.services.embedding_encoder import encode_texts
+
+        if self._fallback is None:
+            with self._fallback_lock:
+                if self._fallback is None:
+                    logger.warning(f"⚠️ Loading {self.model_name} in-process while the embedding server is unavailable")
+                    self._fallback = load_embedding_model(self.model_name, allow_remote=False)
+        return encode_texts(self._fallback, texts, max_seq_length=max_seq_length, normalize_embeddings=normalize)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        convert_to_tensor: bool = False,
+        normalize_embeddings: bool = False,
+        max_seq_length: Optional[int] = None,
+        **kwargs
+    ) -> np.ndarray:
+        """Same call shape as SentenceTransformer.encode; always returns numpy arrays"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        max_seq_length = max_seq_length or self.max_seq_length
+
+        embeddings = None
+        if time.monotonic() >= self._retry_at:
+            try:
+                embeddings = self._encode_remote(texts, max_seq_length, normalize_embeddings)
+                self._local.last_model_id = self.model_id
+            except Exception as e:
+                logger.warning(
+                    f"⚠️ Embedding server request failed ({e}); encoding in-process for the next "
+                    f"{settings.embedding_server_retry_seconds}s"
+                )
+                self._retry_at = time.monotonic() + settings.embedding_server_retry_seconds
+        if embeddings is None:
+            embeddings = self._encode_local(texts, max_seq_length, normalize_embeddings)
+            self._local.last_model_id = self._fallback_model_id()
+        return embeddings[0] if single else embeddings
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_remote_model(model_name: str) -> Optional[RemoteEmbeddingModel]:
+    """Process-wide client for `model_name` if EMBEDDING_SERVER_URL is set and the server answers"""
+    if not settings.embedding_server_url:
+        return None
+    with _clients_lock:
+        client = _clients.get(model_name)
+        if client is None:
+            try:
+                client = RemoteEmbeddingModel(
+                    settings.embedding_server_url,
+                    model_name,
+                    timeout=settings.embedding_server_timeout_seconds
+                )
+            except EmbeddingServerUnavailable as e:
+                logger.warning(f"⚠️ {e}; loading the model in-process")
+                return None
+            _clients[model_name] = client
+            logger.info(f"✅ Using embedding server at {settings.embedding_server_url} ({client.model_id})")
+        return client
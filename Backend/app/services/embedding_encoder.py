@@ -0,0 +1,156 @@
+"""
+Length-bucketed batching for SentenceTransformer encoding
+
+bge-m3 reads up to 8192 tokens, so a fixed batch_size=32 lets one long article
+pad the whole batch to its length. encode_texts() truncates inputs to a
+per-use-case max_seq_length, sorts them by token length and cuts batches by
+padded-token budget (short texts go in large batches, long ones in small
+batches), then returns the embeddings in the original input order.
+"""
+
+import threading
+import weakref
+import numpy as np
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Optional
+from loguru import logger
+
+from app.config import settings
+
+
+class _SeqLengthGate:
+    """
+    encode() reads the model's max_seq_length, shared by every caller of the model. Callers
+    with the same limit encode concurrently; a caller with another limit waits until they
+    are done (and new callers of the current limit queue behind it, so it is not starved).
+    """
+
+    def __init__(self, model):
+        self.model_max = getattr(model, 'max_seq_length', None)
+        self._condition = threading.Condition()
+        self._active = 0
+        self._length: Optional[int] = None
+        self._waiting: Counter = Counter()
+
+    @contextmanager
+    def use(self, model, seq_length: int):
+        with self._condition:
+            self._waiting[seq_length] += 1
+            while self._active and (
+                self._length != seq_length
+                or any(count for length, count in self._waiting.items() if length != seq_length)
+            ):
+                self._condition.wait()
+            self._waiting[seq_length] -= 1
+            if not self._waiting[seq_length]:
+                del self._waiting[seq_length]
+            if not self._active:
+                self._length = seq_length
+                if self.model_max is not None:
+                    model.max_seq_length = seq_length
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                if not self._active:
+                    if self.model_max is not None:
+                        model.max_seq_length = self.model_max
+                    self._condition.notify_all()
+
+
+_model_gates: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_model_gates_guard = threading.Lock()
+
+
+def _model_gate(model) -> _SeqLengthGate:
+    with _model_gates_guard:
+        gate = _model_gates.get(model)
+        if gate is None:
+            gate = _model_gates[model] = _SeqLengthGate(model)
+        return gate
+
+
+def token_lengths(model, texts: List[str], max_seq_length: int) -> List[int]:
+    """Token count of each text as the model will see it (special tokens included, truncated)"""
+    tokenizer = getattr(model, 'tokenizer', None)
+    if tokenizer is not None:
+        try:
+            encoded = tokenizer(
+                texts,
+                add_special_tokens=True,
+                truncation=True,
+                max_length=max_seq_length,
+                return_attention_mask=False
+            )['input_ids']
+            return [min(len(ids), max_seq_length) for ids in encoded]
+        except Exception as e:
+            logger.debug(f"Tokenizer unavailable for batching, estimating tokens: {e}")
+    return [min(int(len(text.split()) * 1.3) + 2, max_seq_length) for text in texts]
+
+
+def plan_batches(lengths: List[int], max_batch_tokens: int, max_batch_size: int) -> List[List[int]]:
+    """
+    Group input indices into batches, longest first, so that no batch exceeds
+    `max_batch_size` inputs or `max_batch_tokens` padded tokens (inputs x longest input)
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for i in order:
+        # Sorted longest first: the batch's first input sets its padded length
+        padded_length = lengths[current[0]] if current else lengths[i]
+        if current and (padded_length * (len(current) + 1) > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def encode_texts(
+    model,
+    texts: List[str],
+    max_seq_length: Optional[int] = None,
+    max_batch_tokens: Optional[int] = None,
+    max_batch_size: Optional[int] = None,
+    normalize_embeddings: bool = False
+) -> np.ndarray:
+    """Encode `texts` with length-bucketed, token-budgeted batches; rows follow the input order"""
+    if getattr(model, 'server_side_batching', False):
+        # Embedding server client: the server buckets (and merges with other callers' requests)
+        seq_length = min(limit for limit in (max_seq_length, getattr(model, 'max_seq_length', None), 8192) if limit)
+        if not texts:
+            return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return model.encode(texts, max_seq_length=seq_length, normalize_embeddings=normalize_embeddings)
+
+    # The gate keeps the model's own limit; max_seq_length may be temporarily changed by another caller
+    gate = _model_gate(model)
+    seq_length = min(limit for limit in (max_seq_length, gate.model_max, 8192) if limit)
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    lengths = token_lengths(model, texts, seq_length)
+    batches = plan_batches(
+        lengths,
+        max_batch_tokens or settings.embedding_batch_max_tokens,
+        max_batch_size or settings.embedding_batch_max_size
+    )
+
+    output: Optional[np.ndarray] = None
+    with gate.use(model, seq_length):
+        for batch in batches:
+            embeddings = model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=normalize_embeddings
+            )
+            if output is None:
+                output = np.empty((len(texts), embeddings.shape[1]), dtype=embeddings.dtype)
+            output[batch] = embeddings
+    return output
@@ -0,0 +1,196 @@
+"""
+Shared embedding server
+
+One process hosts the embedding model for every API and Celery process on the
+machine, instead of each loading its own copy of bge-m3. Requests that arrive
+within EMBEDDING_SERVER_MAX_WAIT_MS of each other are merged into one encode
+call (dynamic micro-batching); the merged batch then goes through the usual
+length-bucketed encoder.
+
+Run it with:
+    python -m app.services.embedding_server [--host 127.0.0.1] [--port 8765]
+and point the other processes at it with EMBEDDING_SERVER_URL=http://127.0.0.1:8765
+(see embedding_client.RemoteEmbeddingModel).
+
+Protocol (JSON over HTTP):
+    GET  /health -> {model_name, model_id, embedding_dim, max_seq_length, ...stats}
+    POST /embed  {texts, max_seq_length, normalize} -> {shape, dtype, data (base64 float32)}
+"""
+
+import asyncio
+import base64
+import concurrent.futures
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from aiohttp import web
+from loguru import logger
+
+from app.config import settings
+from app.services.embedding_backend import embedding_model_id, load_embedding_model
+from app.services.embedding_encoder import encode_texts
+
+
+@dataclass
+class _EmbedRequest:
+    texts: List[str]
+    max_seq_length: Optional[int]
+    normalize: bool
+    future: asyncio.Future
+
+
+class MicroBatcher:
+    """Collects concurrent embed requests and encodes them together on one worker thread"""
+
+    def __init__(self, model, max_wait_ms: int = 10, max_batch_texts: int = 256):
+        self.model = model
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_texts = max_batch_texts
+        self.queue: "asyncio.Queue[_EmbedRequest]" = asyncio.Queue()
+        # The model already uses every core; a single thread keeps encode calls from competing
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self.stats = {'requests': 0, 'texts': 0, 'batches': 0, 'encode_seconds': 0.0}
+
+    async def submit(self, texts: List[str], max_seq_length: Optional[int], normalize: bool) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(_EmbedRequest(texts, max_seq_length, normalize, future))
+        return await future
+
+    async def _collect(self) -> List[_EmbedRequest]:
+        """The next request plus whatever else arrives before the wait window closes"""
+        loop = asyncio.get_running_loop()
+        pending = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        total = len(pending[0].texts)
+        while total < self.max_batch_texts:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(request)
+            total += len(request.texts)
+        return pending
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+
+            # Requests can only share an encode call if they want the same truncation/normalization
+            groups: Dict[Tuple[Optional[int], bool], List[_EmbedRequest]] = {}
+            for request in pending:
+                groups.setdefault((request.max_seq_length, request.normalize), []).append(request)
+
+            for (max_seq_length, normalize), requests in groups.items():
+                texts = [text for request in requests for text in request.texts]
+                started = time.perf_counter()
+                try:
+                    embeddings = await loop.run_in_executor(
+                        self.executor,
+                        lambda: encode_texts(self.model, texts, max_seq_length=max_seq_length, normalize_embeddings=normalize)
+                    )
+                except Exception as e:
+                    logger.error(f"❌ Embedding batch of {len(texts)} texts failed: {e}")
+                    for request in requests:
+                        if not request.future.done():
+                            request.future.set_exception(e)
+                    continue
+
+                self.stats['requests'] += len(requests)
+                self.stats['texts'] += len(texts)
+                self.stats['batches'] += 1
+                self.stats['encode_seconds'] += time.perf_counter() - started
+
+                offset = 0
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_result(embeddings[offset:offset + len(request.texts)])
+                    offset += len(request.texts)
+
+
+def _encode_array(array: np.ndarray) -> Dict[str, object]:
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {
+        'shape': list(array.shape),
+        'dtype': 'float32',
+        'data': base64.b64encode(array.tobytes()).decode('ascii'),
+    }
+
+
+def create_app(model_name: str = "BAAI/bge-m3") -> web.Application:
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+
+    async def on_startup(app: web.Application) -> None:
+        started = time.perf_counter()
+        # This process *is* the server, so never try to reach one
+        model = await asyncio.to_thread(load_embedding_model, model_name, allow_remote=False)
+        app['model'] = model
+        app['model_id'] = embedding_model_id(model_name, model)
+        app['batcher'] = MicroBatcher(
+            model,
+            max_wait_ms=settings.embedding_server_max_wait_ms,
+            max_batch_texts=settings.embedding_server_max_batch_texts
+        )
+        app['batcher_task'] = asyncio.create_task(app['batcher'].run())
+        logger.info(f"✅ Embedding server ready ({app['model_id']}, loaded in {time.perf_counter() - started:.1f}s)")
+
+    async def on_cleanup(app: web.Application) -> None:
+        app['batcher_task'].cancel()
+        app['batcher'].executor.shutdown(wait=False)
+
+    async def health(request: web.Request) -> web.Response:
+        model = request.app['model']
+        batcher: MicroBatcher = request.app['batcher']
+        stats = dict(batcher.stats)
+        stats['avg_texts_per_batch'] = round(stats['texts'] / stats['batches'], 2) if stats['batches'] else 0.0
+        return web.json_response({
+            'status': 'ok',
+            'model_name': model_name,
+            'model_id': request.app['model_id'],
+            'embedding_dim': model.get_sentence_embedding_dimension(),
+            'max_seq_length': getattr(model, 'max_seq_length', None),
+            'queue_size': batcher.queue.qsize(),
+            **stats,
+        })
+
+    async def embed(request: web.Request) -> web.Response:
+        try:
+            payload = await request.json()
+            texts = payload['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("'texts' must be a list of strings")
+        except Exception as e:
+            return web.json_response({'error': f"Invalid request: {e}"}, status=400)
+
+        if not texts:
+            dim = request.app['model'].get_sentence_embedding_dimension()
+            return web.json_response(_encode_array(np.empty((0, dim), dtype=np.float32)))
+
+        try:
+            embeddings = await request.app['batcher'].submit(
+                texts, payload.get('max_seq_length'), bool(payload.get('normalize', False))
+            )
+        except Exception as e:
+            return web.json_response({'error': str(e)}, status=500)
+        return web.json_response(_encode_array(embeddings))
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get('/health', health)
+    app.router.add_post('/embed', embed)
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared embedding server")
+    parser.add_argument("--host", default=settings.embedding_server_host)
+    parser.add_argument("--port", type=int, default=settings.embedding_server_port)
+    parser.add_argument("--model", default="BAAI/bge-m3")
+    args = parser.parse_args()
+    web.run_app(create_app(args.model), host=args.host, port=args.port)
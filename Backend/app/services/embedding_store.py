@@ -0,0 +1,198 @@
+"""
+Persistent, content-addressed store for chunk embeddings
+
+Embeddings are keyed by hash(model name, normalization, chunk text), so a
+chunk is only ever encoded once no matter which article set it came from.
+Vectors live in a memory-mapped float16 matrix; the key -> row index lives in
+a small SQLite database next to it. Both are plain files, so the API process
+and every Celery worker pointed at the same directory share one store.
+
+When the matrix is full, the least recently used rows are evicted and their
+slots reused. Every row carries a 16-byte tag (the key digest) that is written
+after the vector, so a reader never returns a row that another process is
+overwriting at the same time.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import List, Dict, Tuple
+from loguru import logger
+
+
+_TAG_BYTES = 16
+
+
+def make_embedding_key(text: str, model_name: str, normalized: bool = False) -> bytes:
+    """Content address of one chunk embedding"""
+    payload = f"{model_name}\x00{int(normalized)}\x00{text}".encode('utf-8')
+    return hashlib.sha256(payload).digest()[:_TAG_BYTES]
+
+
+class EmbeddingStore:
+    """Disk-backed float16 embedding cache shared between processes"""
+
+    def __init__(
+        self,
+        directory: str,
+        model_name: str,
+        embedding_dim: int,
+        max_size_mb: int = 1024,
+        normalized: bool = False
+    ):
+        self.model_name = model_name
+        self.embedding_dim = embedding_dim
+        self.normalized = normalized
+
+        model_slug = re.sub(r'[^A-Za-z0-9]+', '_', model_name).strip('_')
+        self.directory = os.path.join(directory, f"{model_slug}_{embedding_dim}")
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._index_path = os.path.join(self.directory, "index.sqlite3")
+        self._vectors_path = os.path.join(self.directory, "vectors.f16")
+        self._tags_path = os.path.join(self.directory, "tags.bin")
+        self._local = threading.local()
+
+        requested_capacity = max(1, (max_size_mb * 1024 * 1024) // (embedding_dim * 2))
+        self.capacity = self._init_files(requested_capacity)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float16, mode='r+', shape=(self.capacity, embedding_dim))
+        self._tags = np.memmap(self._tags_path, dtype=np.uint8, mode='r+', shape=(self.capacity, _TAG_BYTES))
+
+    def _connect(self) -> sqlite3.Connection:
+        """One SQLite connection per thread (connections are not thread-safe)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_files(self, requested_capacity: int) -> int:
+        """Create the index and matrix files once; an existing store keeps its capacity"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key BLOB PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+            row = conn.execute("SELECT value FROM meta WHERE name = 'capacity'").fetchone()
+            if row:
+                capacity = int(row[0])
+            else:
+                capacity = requested_capacity
+                # Sparse files: disk is only used for rows that are actually written
+                with open(self._vectors_path, 'wb') as f:
+                    f.truncate(capacity * self.embedding_dim * 2)
+                with open(self._tags_path, 'wb') as f:
+                    f.truncate(capacity * _TAG_BYTES)
+                conn.execute("INSERT INTO meta (name, value) VALUES ('capacity', ?)", (capacity,))
+                conn.execute("INSERT INTO meta (name, value) VALUES ('next_slot', 0)")
+                logger.info(f"✅ Created embedding store at {self.directory} (capacity={capacity} vectors)")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if capacity != requested_capacity:
+            logger.info(f"📦 Embedding store keeps its existing capacity of {capacity} vectors")
+        return capacity
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the cached embeddings (float32) for the keys that are present"""
+        if not keys:
+            return {}
+
+        conn = self._connect()
+        slots: List[Tuple[bytes, int]] = []
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            slots.extend(conn.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+            ).fetchall())
+
+        found: Dict[bytes, np.ndarray] = {}
+        for key, slot in slots:
+            key = bytes(key)
+            tag = bytes(self._tags[slot])
+            vector = np.array(self._vectors[slot], dtype=np.float32)
+            # Re-check the tag after the copy: a concurrent eviction may have reused the slot
+            if tag == key and bytes(self._tags[slot]) == key:
+                found[key] = vector
+
+        if found:
+            now = time.time()
+            conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+        return found
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Store embeddings, evicting the least recently used rows when the matrix is full"""
+        new_items = list(dict(zip(keys, vectors)).items())
+        if not new_items:
+            return
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = set()
+            for start in range(0, len(new_items), 500):
+                batch = [key for key, _ in new_items[start:start + 500]]
+                placeholders = ",".join("?" * len(batch))
+                existing.update(bytes(row[0]) for row in conn.execute(
+                    f"SELECT key FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall())
+            new_items = [(key, vector) for key, vector in new_items if key not in existing][:self.capacity]
+            if not new_items:
+                conn.execute("COMMIT")
+                return
+
+            next_slot = int(conn.execute("SELECT value FROM meta WHERE name = 'next_slot'").fetchone()[0])
+            fresh = min(len(new_items), self.capacity - next_slot)
+            slots = list(range(next_slot, next_slot + fresh))
+
+            evict_count = len(new_items) - fresh
+            if evict_count > 0:
+                evicted = conn.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_access LIMIT ?", (evict_count,)
+                ).fetchall()
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(row[0],) for row in evicted])
+                slots.extend(int(row[1]) for row in evicted)
+                logger.debug(f"🧹 Evicted {len(evicted)} embeddings from the store")
+
+            new_items = new_items[:len(slots)]
+            for (key, vector), slot in zip(new_items, slots):
+                self._tags[slot] = 0
+                self._vectors[slot] = np.asarray(vector, dtype=np.float16)
+                self._tags[slot] = np.frombuffer(key, dtype=np.uint8)
+            self._vectors.flush()
+            self._tags.flush()
+
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_access) VALUES (?, ?, ?)",
+                [(key, slot, now) for (key, _), slot in zip(new_items, slots)]
+            )
+            conn.execute("UPDATE meta SET value = ? WHERE name = 'next_slot'", (next_slot + fresh,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {'entries': int(entries), 'capacity': self.capacity}
@@ -0,0 +1,197 @@
+"""
+Content-addressed cache for LLM responses
+
+Responses are keyed by hash(model, system message, prompt, temperature,
+max_tokens), so re-sending an identical request - e.g. a Celery retry
+re-running all RAG categories - is served from the cache instead of the API.
+Redis is used when reachable (shared by all workers); otherwise a SQLite file
+on disk. Requests with a temperature above LLM_CACHE_MAX_TEMPERATURE (0.5 by
+default, so sampled outreach drafts at 0.7 are not cached), or
+made with bypass=True (an outreach `regenerate`), always go to the API.
+Outreach drafts are sampled at 0.7 unless the caller asks for a
+deterministic draft, generated at DETERMINISTIC_TEMPERATURE and cached.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Optional, Dict, Any
+from loguru import logger
+
+import redis
+
+from app.config import settings
+
+
+def make_llm_cache_key(
+    model: str,
+    system_message: Optional[str],
+    prompt: str,
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """Content address of one LLM request"""
+    payload = json.dumps(
+        [model, system_message or "", prompt, round(float(temperature), 4), int(max_tokens)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _RedisBackend:
+    name = "redis"
+
+    def __init__(self, client: "redis.Redis", prefix: str = "llm:response:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(f"{self.prefix}{key}")
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        self.client.set(f"{self.prefix}{key}", value.encode('utf-8'), ex=ttl_seconds)
+
+
+class _DiskBackend:
+    name = "disk"
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "responses.sqlite3")
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One SQLite connection per thread (connections are not thread-safe)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl_seconds)
+        )
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+
+
+# Temperature of requests that opt into reproducible (and therefore cacheable) output
+DETERMINISTIC_TEMPERATURE = 0.0
+
+
+class LLMResponseCache:
+    """TTL cache of LLM responses with a Redis or disk backend"""
+
+    def __init__(self, backend, ttl_seconds: int = 7 * 24 * 3600, max_temperature: float = 0.5):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._stats_lock = threading.Lock()
+
+    def is_cacheable(self, temperature: float, bypass: bool = False) -> bool:
+        """False for explicit bypasses and temperatures treated as non-deterministic"""
+        cacheable = self.backend is not None and not bypass and temperature <= self.max_temperature
+        if not cacheable:
+            with self._stats_lock:
+                self.bypassed += 1
+        return cacheable
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await asyncio.to_thread(self.backend.get, key)
+        except Exception as e:
+            logger.warning(f"⚠️ LLM cache read failed: {e}")
+            value = None
+        with self._stats_lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        if not value:
+            return
+        try:
+            await asyncio.to_thread(self.backend.set, key, value, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"⚠️ LLM cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'backend': getattr(self.backend, 'name', None),
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _create_backend():
+    if not settings.llm_cache_enabled:
+        logger.info("📝 LLM response cache disabled")
+        return None
+
+    if settings.llm_cache_backend.lower() == "redis":
+        for url in dict.fromkeys([
+            settings.redis_url,
+            # Fallback to localhost for local development
+            settings.redis_url.replace('redis://redis:', 'redis://localhost:'),
+        ]):
+            try:
+                client = redis.from_url(url, socket_connect_timeout=2, socket_timeout=2)
+                client.ping()
+                logger.info(f"✅ LLM response cache: Redis at {url}")
+                return _RedisBackend(client)
+            except Exception as e:
+                logger.warning(f"⚠️ LLM response cache: Redis unavailable at {url}: {e}")
+
+    try:
+        backend = _DiskBackend(settings.llm_cache_dir)
+        logger.info(f"✅ LLM response cache: disk at {backend.path}")
+        return backend
+    except Exception as e:
+        logger.warning(f"⚠️ LLM response cache unavailable: {e}")
+        return None
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide LLM response cache (created on first use)"""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache(
+                    _create_backend(),
+                    ttl_seconds=settings.llm_cache_ttl_seconds,
+                    max_temperature=settings.llm_cache_max_temperature
+                )
+    return _llm_cache
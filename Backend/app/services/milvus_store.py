@@ -0,0 +1,559 @@
+"""
+Shared Milvus chunk store for RAG analysis
+
+All analyses write into one long-lived collection. Rows are keyed by company
+(a partition key, so each company lands in its own partition) and by the
+vector signature of the article set they were built from. Inserts are
+upserts with deterministic ids, searches are filtered by company/signature,
+and superseded or expired rows are deleted by a background worker so no
+collection or index is created, loaded or dropped on the request path. A
+reused article set gets its `stored_at` refreshed, so the TTL runs from its
+last use.
+
+Every Milvus call goes through the process-wide MilvusConnectionManager: a
+circuit breaker that fails fast (instead of waiting on connect timeouts)
+once Milvus has failed a few times in a row, a background health probe that
+closes it again when the server answers, and collection handles cached for
+the life of the connection.
+"""
+
+import re
+import json
+import time
+import hashlib
+import threading
+import concurrent.futures
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from loguru import logger
+
+from app.config import settings
+
+
+def _patch_marshmallow():
+    """Ensure marshmallow exposes compatibility attributes for environs/pymilvus."""
+    try:
+        import marshmallow as ma  # type: ignore
+    except ImportError:
+        return None
+
+    if not hasattr(ma, "__version_info__"):
+        try:
+            version_tuple = tuple(int(part) for part in ma.__version__.split(".") if part.isdigit())
+        except Exception:
+            version_tuple = (0, 0, 0)
+        ma.__version_info__ = version_tuple  # type: ignore[attr-defined]
+
+    if not hasattr(ma.fields.Field, "__orig_init__"):
+        original_init = ma.fields.Field.__init__
+
+        def _field_init_with_missing(self, *args, **kwargs):
+            if "missing" in kwargs and "load_default" not in kwargs:
+                kwargs["load_default"] = kwargs.pop("missing")
+            return original_init(self, *args, **kwargs)
+
+        ma.fields.Field.__orig_init__ = original_init  # type: ignore[attr-defined]
+        ma.fields.Field.__init__ = _field_init_with_missing  # type: ignore[assignment]
+
+    if not hasattr(ma.fields.Field, "missing"):
+        def _get_missing(self):
+            return getattr(self, "load_default", None)
+
+        def _set_missing(self, value):
+            setattr(self, "load_default", value)
+
+        ma.fields.Field.missing = property(_get_missing, _set_missing)  # type: ignore[attr-defined]
+
+    return ma
+
+
+_patched_marshmallow = _patch_marshmallow()
+
+# Milvus (optional, with in-memory fallback)
+try:
+    from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
+    from pymilvus.exceptions import MilvusException
+    MILVUS_AVAILABLE = True
+except ImportError:
+    connections = Collection = FieldSchema = CollectionSchema = DataType = utility = None  # type: ignore
+    MilvusException = Exception  # type: ignore
+    MILVUS_AVAILABLE = False
+    logger.warning("pymilvus not available, using in-memory vector storage")
+
+
+T = TypeVar("T")
+
+
+class MilvusUnavailableError(RuntimeError):
+    """Raised without contacting Milvus while its circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through, and `failure_threshold` consecutive failures open it.
+    Open: calls fail fast; after `reset_timeout` seconds it turns half-open and lets
+    a single trial call through, whose outcome closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._current_state() == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._trip()
+
+    def trip(self) -> None:
+        """Open immediately (e.g. the health probe found the server down)"""
+        with self._lock:
+            self._trip()
+
+    def _trip(self) -> None:
+        if self._state != self.OPEN:
+            self.stats['opened'] += 1
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class MilvusConnectionManager:
+    """
+    One Milvus connection per process, shared by every RAGAnalysisService: calls
+    run through a circuit breaker, a daemon thread probes the server every
+    `probe_interval` seconds, and collection handles are cached until a failure.
+    It also owns the process's Milvus GC: one delete thread and one TTL sweeper
+    per collection, however many chunk stores are created on the connection.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: str,
+        alias: str = "default",
+        connect_timeout: float = 3.0,
+        probe_interval: float = 15.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.host = host
+        self.port = port
+        self.alias = alias
+        self.connect_timeout = connect_timeout
+        self.probe_interval = probe_interval
+        self.breaker = breaker or CircuitBreaker()
+        self.last_error: Optional[str] = None
+
+        self._connected = False
+        self._collections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._probe_stop = threading.Event()
+        self._probe_thread: Optional[threading.Thread] = None
+        self._gc_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._gc_sweepers: Dict[str, threading.Thread] = {}
+        self._gc_stop = threading.Event()
+
+    @property
+    def available(self) -> bool:
+        """False while the breaker is open (new analyses should not plan on Milvus)"""
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def _connect(self) -> None:
+        connections.connect(alias=self.alias, host=self.host, port=self.port, timeout=self.connect_timeout)
+        self._connected = True
+
+    def _disconnect(self, error: Exception) -> None:
+        self.last_error = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self._collections.clear()
+            self._connected = False
+        try:
+            connections.disconnect(self.alias)
+        except Exception:
+            pass
+
+    def call(self, operation: Callable[[], T]) -> T:
+        """Run one Milvus operation through the breaker (MilvusUnavailableError while it is open)"""
+        if not self.breaker.allow_request():
+            raise MilvusUnavailableError(f"Milvus circuit breaker is open (last error: {self.last_error})")
+        try:
+            if not self._connected:
+                self._connect()
+            result = operation()
+        except Exception as exc:
+            self._disconnect(exc)
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def collection(self, name: str, open_collection: Callable[[], Any]):
+        """Cached collection handle; `open_collection` runs once per connection"""
+        with self._lock:
+            cached = self._collections.get(name)
+            if cached is None:
+                cached = self._collections[name] = open_collection()
+            return cached
+
+    def invalidate_collections(self) -> None:
+        with self._lock:
+            self._collections.clear()
+
+    def probe(self) -> bool:
+        """Check the server directly (bypassing the breaker) and open or close the breaker accordingly"""
+        try:
+            if not self._connected:
+                self._connect()
+            utility.get_server_version(using=self.alias, timeout=self.connect_timeout)
+        except Exception as exc:
+            if self.breaker.state != CircuitBreaker.OPEN:
+                logger.warning(f"⚠️ Milvus health probe failed ({exc}); using in-memory vectors until it recovers")
+            self._disconnect(exc)
+            self.breaker.trip()
+            return False
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            logger.info(f"✅ Milvus at {self.host}:{self.port} is reachable again")
+        self.breaker.record_success()
+        return True
+
+    def start_health_probes(self) -> None:
+        if self._probe_thread is not None:
+            return
+
+        def run():
+            while not self._probe_stop.wait(self.probe_interval):
+                self.probe()
+
+        self._probe_thread = threading.Thread(target=run, name="milvus-health-probe", daemon=True)
+        self._probe_thread.start()
+
+    def stop_health_probes(self) -> None:
+        self._probe_stop.set()
+
+    def submit_gc(self, operation: Callable[[], None]) -> None:
+        """Run a GC operation (e.g. a delete) on the connection's single background GC thread"""
+        with self._lock:
+            if self._gc_executor is None:
+                self._gc_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="milvus-gc")
+            executor = self._gc_executor
+        executor.submit(operation)
+
+    def start_gc_sweeper(self, collection_name: str, sweep: Callable[[], None], interval: float) -> None:
+        """Run `sweep` every `interval` seconds; one sweeper per collection (later calls are no-ops)"""
+        with self._lock:
+            if collection_name in self._gc_sweepers:
+                return
+
+            def run():
+                while not self._gc_stop.wait(interval):
+                    sweep()
+
+            thread = threading.Thread(target=run, name=f"milvus-gc-sweeper-{collection_name}", daemon=True)
+            self._gc_sweepers[collection_name] = thread
+        thread.start()
+
+    def stop_gc(self) -> None:
+        self._gc_stop.set()
+        with self._lock:
+            if self._gc_executor is not None:
+                self._gc_executor.shutdown(wait=False)
+                self._gc_executor = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'host': f"{self.host}:{self.port}",
+            'state': self.breaker.state,
+            'last_error': self.last_error,
+            **self.breaker.stats,
+        }
+
+
+_connection_managers: Dict[Tuple[str, str], MilvusConnectionManager] = {}
+_connection_managers_lock = threading.Lock()
+
+
+def get_milvus_connection(host: str, port: str) -> MilvusConnectionManager:
+    """Process-wide connection manager for host:port, probed once on creation and then in the background"""
+    key = (host, str(port))
+    with _connection_managers_lock:
+        manager = _connection_managers.get(key)
+        if manager is None:
+            manager = MilvusConnectionManager(
+                host,
+                port,
+                connect_timeout=settings.milvus_connect_timeout_seconds,
+                probe_interval=settings.milvus_health_probe_interval_seconds,
+                breaker=CircuitBreaker(
+                    failure_threshold=settings.milvus_breaker_failure_threshold,
+                    reset_timeout=settings.milvus_breaker_reset_seconds
+                )
+            )
+            manager.probe()
+            manager.start_health_probes()
+            _connection_managers[key] = manager
+        return manager
+
+
+def make_company_key(company_name: str, company_id: Optional[int] = None) -> str:
+    """Stable partition key for a company (database id when known, otherwise its name)"""
+    if company_id is not None:
+        return f"id_{company_id}"
+    sanitized = re.sub(r'[^a-z0-9]+', '_', (company_name or '').lower()).strip('_')
+    return f"name_{(sanitized or 'company')[:48]}"
+
+
+class MilvusChunkStore:
+    """One long-lived Milvus collection holding the chunk vectors of every company"""
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_dim: int,
+        connection: MilvusConnectionManager,
+        vector_ttl_seconds: int = 7 * 24 * 3600,
+        superseded_grace_seconds: int = 3600,
+        gc_interval_seconds: int = 3600
+    ):
+        self.collection_name = collection_name
+        self.embedding_dim = embedding_dim
+        self.vector_ttl_seconds = vector_ttl_seconds
+        self.superseded_grace_seconds = superseded_grace_seconds
+        self.gc_interval_seconds = gc_interval_seconds
+        self.connection = connection
+
+    def get_collection(self):
+        """Return the shared collection, creating, indexing and loading it once per connection"""
+        return self.connection.collection(self.collection_name, self._open_collection)
+
+    def _open_collection(self):
+        alias = self.connection.alias
+        if utility.has_collection(self.collection_name, using=alias):
+            collection = Collection(name=self.collection_name, using=alias)
+        else:
+            fields = [
+                FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, auto_id=False, max_length=128),
+                FieldSchema(name="company_key", dtype=DataType.VARCHAR, max_length=64, is_partition_key=True),
+                FieldSchema(name="vector_signature", dtype=DataType.VARCHAR, max_length=128),
+                FieldSchema(name="chunk_text", dtype=DataType.VARCHAR, max_length=2000),
+                FieldSchema(name="article_title", dtype=DataType.VARCHAR, max_length=500),
+                FieldSchema(name="stored_at", dtype=DataType.INT64),
+                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.embedding_dim)
+            ]
+            schema = CollectionSchema(fields=fields, description="RAG company analysis chunks")
+            collection = Collection(name=self.collection_name, schema=schema, using=alias)
+
+            # Built once for the lifetime of the collection, never per analysis
+            collection.create_index(
+                field_name="embedding",
+                index_params={
+                    "metric_type": "COSINE",
+                    "index_type": "HNSW",
+                    "params": {"M": 16, "efConstruction": 200}
+                }
+            )
+            logger.info(f"✅ Created shared Milvus collection: {self.collection_name}")
+
+        collection.load()
+        return collection
+
+    def reset(self) -> None:
+        """Forget the cached collection handle (e.g. after a connection error)"""
+        self.connection.invalidate_collections()
+
+    @staticmethod
+    def _filter_expr(company_key: str, vector_signature: str) -> str:
+        return f'company_key == "{company_key}" and vector_signature == "{vector_signature}"'
+
+    def count_chunks(self, company_key: str, vector_signature: str) -> int:
+        """Number of chunks already stored for this company and article set"""
+        rows = self.connection.call(lambda: self.get_collection().query(
+            expr=self._filter_expr(company_key, vector_signature),
+            output_fields=["count(*)"]
+        ))
+        return int(rows[0]["count(*)"]) if rows else 0
+
+    def refresh_chunks(self, company_key: str, vector_signature: str, chunk_count: int, batch_size: int = 1000) -> int:
+        """
+        Re-stamp `stored_at` of a reused article set so the TTL sweep counts from its last use,
+        not from when it was first stored. Returns the number of refreshed rows.
+
+        Milvus cannot update a scalar field in place: a refresh reads the rows back, vectors
+        included, and upserts them again - a full-vector round trip. It is therefore done only
+        once the set is past half its TTL (it then still has at least half the TTL left, far
+        longer than an analysis); younger sets are recognised from one `stored_at` lookup.
+        """
+        signature_digest = hashlib.sha1(vector_signature.encode('utf-8')).hexdigest()[:16]
+        now = int(time.time())
+        cutoff = now - self.vector_ttl_seconds // 2
+        output_fields = ["id", "company_key", "vector_signature", "chunk_text", "article_title", "embedding"]
+
+        # All rows of a set are stamped together, so its first row tells whether a refresh is due
+        first_id = f"{company_key}:{signature_digest}:0"
+        stamps = self.connection.call(lambda: self.get_collection().query(
+            expr=f"id in {json.dumps([first_id])}",
+            output_fields=["stored_at"]
+        ))
+        if stamps and int(stamps[0]['stored_at']) >= cutoff:
+            return 0
+
+        refreshed = 0
+        for start in range(0, chunk_count, batch_size):
+            # Ids are deterministic (see upsert_chunks), so the set is read back batch by batch by id
+            ids = [f"{company_key}:{signature_digest}:{i}" for i in range(start, min(start + batch_size, chunk_count))]
+            expr = f"id in {json.dumps(ids)} and stored_at < {cutoff}"
+            rows = self.connection.call(lambda: self.get_collection().query(expr=expr, output_fields=output_fields))
+            if not rows:
+                continue
+            columns = [
+                [row['id'] for row in rows],
+                [row['company_key'] for row in rows],
+                [row['vector_signature'] for row in rows],
+                [row['chunk_text'] for row in rows],
+                [row['article_title'] for row in rows],
+                [now] * len(rows),
+                np.asarray([row['embedding'] for row in rows], dtype=np.float32).tolist()
+            ]
+            self.connection.call(lambda: self.get_collection().upsert(columns))
+            refreshed += len(rows)
+
+        if refreshed:
+            logger.debug(f"🕒 Refreshed stored_at of {refreshed} reused chunks ({company_key})")
+        return refreshed
+
+    def upsert_chunks(
+        self,
+        company_key: str,
+        vector_signature: str,
+        chunks: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        batch_size: int = 1000
+    ) -> int:
+        """
+        Upsert chunk vectors; ids are deterministic so re-storing the same set is idempotent.
+        Rows are sent `batch_size` at a time: the sets planned onto Milvus are large, and one
+        upsert of all of them would far exceed the gRPC message size limit.
+        """
+        signature_digest = hashlib.sha1(vector_signature.encode('utf-8')).hexdigest()[:16]
+        stored_at = int(time.time())
+        vectors = np.asarray(embeddings, dtype=np.float32)
+
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            rows = [
+                [f"{company_key}:{signature_digest}:{i}" for i in range(start, start + len(batch))],
+                [company_key] * len(batch),
+                [vector_signature] * len(batch),
+                [c['text'][:1800] for c in batch],  # Max 2000, leave buffer
+                [c['title'][:400] for c in batch],  # Max 500, leave buffer
+                [stored_at] * len(batch),
+                vectors[start:start + len(batch)].tolist()
+            ]
+            self.connection.call(lambda: self.get_collection().upsert(rows))
+
+        self.schedule_superseded_cleanup(company_key, vector_signature)
+        logger.info(f"✅ Upserted {len(chunks)} chunks into Milvus ({company_key})")
+        return len(chunks)
+
+    def search(
+        self,
+        company_key: str,
+        vector_signature: str,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        with_embeddings: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        """Search within one company's article set; returns hits per query (with their vectors if asked)"""
+        output_fields = ["chunk_text", "article_title"]
+        if with_embeddings:
+            output_fields.append("embedding")
+        results = self.connection.call(lambda: self.get_collection().search(
+            data=query_embeddings,
+            anns_field="embedding",
+            param={"metric_type": "COSINE", "params": {"ef": max(64, top_k)}},
+            limit=top_k,
+            expr=self._filter_expr(company_key, vector_signature),
+            output_fields=output_fields
+        ))
+
+        hits_per_query = []
+        for hits in results:
+            query_hits = []
+            for hit in hits:
+                item = {
+                    'text': hit.entity.get('chunk_text'),
+                    'title': hit.entity.get('article_title'),
+                    'similarity': float(hit.distance)
+                }
+                if with_embeddings:
+                    item['embedding'] = hit.entity.get('embedding')
+                query_hits.append(item)
+            hits_per_query.append(query_hits)
+        return hits_per_query
+
+    def schedule_superseded_cleanup(self, company_key: str, vector_signature: str) -> None:
+        """Delete (in the background) older article sets of a company once they are past the grace period"""
+        cutoff = int(time.time()) - self.superseded_grace_seconds
+        expr = (
+            f'company_key == "{company_key}" and vector_signature != "{vector_signature}" '
+            f'and stored_at < {cutoff}'
+        )
+        self.connection.submit_gc(lambda: self._delete(expr))
+
+    def _delete(self, expr: str) -> None:
+        try:
+            self.connection.call(lambda: self.get_collection().delete(expr))
+            logger.debug(f"🧹 Milvus GC deleted rows matching: {expr}")
+        except MilvusUnavailableError:
+            logger.debug(f"🧹 Milvus GC skipped while Milvus is unavailable: {expr}")
+        except Exception as exc:
+            logger.warning(f"⚠️ Milvus GC delete failed: {exc}")
+
+    def _sweep_expired(self) -> None:
+        cutoff = int(time.time()) - self.vector_ttl_seconds
+        self._delete(f"stored_at < {cutoff}")
+
+    def start_background_gc(self) -> None:
+        """Start the periodic sweep that deletes vectors older than the TTL (once per collection and process)"""
+        self.connection.start_gc_sweeper(self.collection_name, self._sweep_expired, self.gc_interval_seconds)
+
+    def stop_background_gc(self) -> None:
+        """Stop the process's Milvus GC (shared by every store on this connection)"""
+        self.connection.stop_gc()
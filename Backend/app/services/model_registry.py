@@ -0,0 +1,138 @@
+"""
+Worker-level model registry
+
+Celery tasks used to build AdvancedModelService and RAGAnalysisService (two
+copies of bge-m3 plus the pickled classifier) at the start of every job.
+WorkerModelRegistry loads them once per worker process - when the worker
+starts (WORKER_PRELOAD_MODELS) or on the first task - and hands the same
+instances to every task; both services share one embedding model.
+
+Sharing is safe under `worker_pool='threads'`: the classifier and scaler are
+only read, RAG retrieval state lives in per-analysis contexts, and
+encode_texts() serializes encode calls that change the embedding model's
+max_seq_length. Loading is guarded by a lock, so concurrent first tasks load
+the models once.
+
+Instead of reloading models per task to keep memory in check, MemoryWatchdog
+looks at the worker's RSS after each task and, past WORKER_MAX_RSS_MB, asks the
+worker for a warm shutdown (running tasks finish; the supervisor starts a
+fresh worker).
+"""
+
+import os
+import resource
+import threading
+from typing import Optional
+from loguru import logger
+
+from app.config import settings
+
+
+def _force_cpu_torch() -> None:
+    """Keep PyTorch on CPU (MPS/CUDA initialisation has crashed workers with SIGSEGV)"""
+    os.environ["TORCH_DEVICE"] = "cpu"
+    os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
+    os.environ["PYTORCH_MPS_HIGH_WATERMARK_RATIO"] = "0.0"
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_default_device('cpu')
+    if hasattr(torch.backends, 'mps'):
+        torch.backends.mps.is_available = lambda: False
+    if hasattr(torch, 'mps'):
+        torch.mps.is_available = lambda: False
+
+
+class WorkerModelRegistry:
+    """Process-wide, lazily loaded classification and RAG services"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model_service = None
+        self._rag_service = None
+
+    def model_service(self):
+        """The shared AdvancedModelService (classifier, scaler, embedding model)"""
+        if self._model_service is None:
+            with self._lock:
+                if self._model_service is None:
+                    from app.services.advanced_model_service import AdvancedModelService
+
+                    _force_cpu_torch()
+                    logger.info("📦 Loading classification model for this worker...")
+                    self._model_service = AdvancedModelService()
+        return self._model_service
+
+    def rag_service(self):
+        """The shared RAGAnalysisService (reuses the classification service's embedding model)"""
+        if self._rag_service is None:
+            with self._lock:
+                if self._rag_service is None:
+                    from app.services.rag_analysis_service import RAGAnalysisService
+
+                    _force_cpu_torch()
+                    logger.info("📦 Loading RAG service for this worker...")
+                    self._rag_service = RAGAnalysisService(
+                        milvus_host=settings.milvus_host,
+                        milvus_port=settings.milvus_port,
+                        ollama_host=None,  # Deprecated - using llama.cpp now
+                        llm_model=None  # Deprecated - using llama.cpp now
+                    )
+        return self._rag_service
+
+    def warm_up(self) -> None:
+        """Load every model now (worker start-up) instead of on the first task"""
+        try:
+            self.model_service()
+            self.rag_service()
+            logger.info(f"✅ Worker models loaded (RSS {current_rss_mb():.0f}MB)")
+        except Exception as e:
+            # Tasks retry the load lazily
+            logger.error(f"❌ Preloading worker models failed: {e}")
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+class MemoryWatchdog:
+    """Asks the worker to recycle itself once its RSS passes `max_rss_mb`"""
+
+    def __init__(self, max_rss_mb: Optional[int]):
+        self.max_rss_mb = max_rss_mb
+        self._shutdown_requested = False
+
+    def check(self, celery_app, hostname: Optional[str]) -> bool:
+        """Returns True if a shutdown was requested"""
+        if not self.max_rss_mb or self._shutdown_requested or not hostname:
+            # Without a hostname the shutdown would be broadcast to every worker
+            return False
+        rss = current_rss_mb()
+        if rss <= self.max_rss_mb:
+            return False
+
+        logger.warning(
+            f"⚠️ Worker RSS {rss:.0f}MB exceeds WORKER_MAX_RSS_MB={self.max_rss_mb}; "
+            f"requesting a warm shutdown of {hostname}"
+        )
+        self._shutdown_requested = True
+        try:
+            celery_app.control.shutdown(destination=[hostname])
+        except Exception as e:
+            logger.error(f"❌ Could not request worker shutdown: {e}")
+            self._shutdown_requested = False
+            return False
+        return True
+
+
+worker_models = WorkerModelRegistry()
+memory_watchdog = MemoryWatchdog(settings.worker_max_rss_mb)
@@ -12,9 +12,13 @@ import asyncio
 import aiohttp
 from ..models import OutreachType
 from app.config import settings
+from app.services.llm_cache import DETERMINISTIC_TEMPERATURE, get_llm_cache, make_llm_cache_key
 
 logger = logging.getLogger(__name__)
 
+# Drafts are sampled so that asking again gives a different text (not cached)
+OUTREACH_TEMPERATURE = 0.7
+
 class OutreachService:
     def __init__(self):
         # Initialize OpenAI API key
@@ -32,7 +36,9 @@ class OutreachService:
         company_info: Dict[str, Any],
         sme_info: Dict[str, Any],
         relevant_articles: List[Dict[str, Any]],
-        rag_analysis: Optional[Dict[str, Any]] = None
+        rag_analysis: Optional[Dict[str, Any]] = None,
+        deterministic: bool = False,
+        bypass_cache: bool = False
     ) -> Dict[str, str]:
         """
         Generate tailored outreach content based on company data and SME objectives.
@@ -44,6 +50,9 @@ class OutreachService:
             sme_info: SME details (name, sector, objectives)
             relevant_articles: List of relevant articles about the company
             rag_analysis: Optional RAG analysis data with intelligence insights
+            deterministic: Generate at temperature 0: the same inputs give the same draft,
+                which is served from the LLM response cache
+            bypass_cache: Skip the LLM response cache (regenerate instead of returning an earlier draft)
             
         Returns:
             Dict with 'title' and 'content' keys
@@ -54,13 +63,15 @@ class OutreachService:
                 company_name, company_info, sme_info, relevant_articles, rag_analysis
             )
             
+            temperature = DETERMINISTIC_TEMPERATURE if deterministic else OUTREACH_TEMPERATURE
+            
             # Generate content based on outreach type
             if outreach_type == OutreachType.EMAIL:
-                return await self._generate_email_content(context)
+                return await self._generate_email_content(context, temperature, bypass_cache=bypass_cache)
             elif outreach_type == OutreachType.CALL:
-                return await self._generate_call_content(context)
+                return await self._generate_call_content(context, temperature, bypass_cache=bypass_cache)
             elif outreach_type == OutreachType.MEETING:
-                return await self._generate_meeting_content(context)
+                return await self._generate_meeting_content(context, temperature, bypass_cache=bypass_cache)
             else:
                 raise ValueError(f"Unsupported outreach type: {outreach_type}")
                 
@@ -219,7 +230,7 @@ OUR ORGANIZATION INFORMATION:
         
         return f"{company_context}\n{our_org_context}{rag_context}\n{articles_context}"
     
-    async def _generate_email_content(self, context: str) -> Dict[str, str]:
+    async def _generate_email_content(self, context: str, temperature: float = OUTREACH_TEMPERATURE, bypass_cache: bool = False) -> Dict[str, str]:
         """Generate email outreach content."""
         prompt = f"""
 Based on the following comprehensive intelligence about the company, create a highly personalized and professional email outreach for strategic partnership and collaboration opportunities.
@@ -260,9 +271,9 @@ IMPORTANT: You MUST respond with ONLY valid JSON, no additional text or explanat
 Return ONLY the JSON object, nothing else.
 """
         
-        return await self._call_llm(prompt, "email")
+        return await self._call_llm(prompt, "email", temperature, bypass_cache=bypass_cache)
     
-    async def _generate_call_content(self, context: str) -> Dict[str, str]:
+    async def _generate_call_content(self, context: str, temperature: float = OUTREACH_TEMPERATURE, bypass_cache: bool = False) -> Dict[str, str]:
         """Generate call script content."""
         prompt = f"""
 Based on the following comprehensive intelligence about the company, create a highly personalized call script for strategic partnership outreach.
@@ -300,9 +311,9 @@ IMPORTANT: You MUST respond with ONLY valid JSON, no additional text or explanat
 Return ONLY the JSON object, nothing else.
 """
         
-        return await self._call_llm(prompt, "call")
+        return await self._call_llm(prompt, "call", temperature, bypass_cache=bypass_cache)
     
-    async def _generate_meeting_content(self, context: str) -> Dict[str, str]:
+    async def _generate_meeting_content(self, context: str, temperature: float = OUTREACH_TEMPERATURE, bypass_cache: bool = False) -> Dict[str, str]:
         """Generate meeting agenda content."""
         prompt = f"""
 Based on the following comprehensive intelligence about the company, create a professional and strategic meeting agenda for partnership and collaboration discussion.
@@ -347,10 +358,16 @@ IMPORTANT: You MUST respond with ONLY valid JSON, no additional text or explanat
 Return ONLY the JSON object, nothing else.
 """
         
-        return await self._call_llm(prompt, "meeting")
+        return await self._call_llm(prompt, "meeting", temperature, bypass_cache=bypass_cache)
     
-    async def _call_llm(self, prompt: str, outreach_type: str) -> Dict[str, str]:
-        """Call OpenAI API to generate content."""
+    async def _call_llm(
+        self,
+        prompt: str,
+        outreach_type: str,
+        temperature: float = OUTREACH_TEMPERATURE,
+        bypass_cache: bool = False
+    ) -> Dict[str, str]:
+        """Call OpenAI API to generate content (deterministic requests are served from the LLM cache)."""
         if not self.openai_api_key:
             raise ValueError("OpenAI API key not configured")
         
@@ -358,39 +375,52 @@ Return ONLY the JSON object, nothing else.
             # System message for outreach generation
             system_message = f"""You are a professional business outreach assistant specializing in strategic partnerships. Generate personalized {outreach_type} content that emphasizes collaboration, mutual benefits, and shared growth opportunities. Always maintain respect for the company and never use diminutive terms like "SME". Always return valid JSON with 'title' and 'content' fields."""
             
-            # Call OpenAI API
-            async with aiohttp.ClientSession() as session:
-                messages = []
-                if system_message:
-                    messages.append({"role": "system", "content": system_message})
-                messages.append({"role": "user", "content": prompt})
-                
-                async with session.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.openai_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4o",
-                        "messages": messages,
-                        "temperature": 0.7,
-                        "max_tokens": 1000
-                    },
-                    timeout=aiohttp.ClientTimeout(total=120)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        generated_text = data['choices'][0]['message']['content'].strip()
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"OpenAI API error: {response.status} - {error_text}")
-                        raise Exception(f"OpenAI API error: {response.status}")
+            llm_cache = get_llm_cache()
+            cache_key = None
+            generated_text = None
+            if llm_cache.is_cacheable(temperature, bypass=bypass_cache):
+                cache_key = make_llm_cache_key("gpt-4o", system_message, prompt, temperature, 1000)
+                generated_text = await llm_cache.get(cache_key)
             
-            if not generated_text:
-                raise Exception("OpenAI returned empty response")
-            
-            logger.info(f"✅ Successfully generated {outreach_type} content using OpenAI (length: {len(generated_text)})")
+            if generated_text is not None:
+                logger.info(f"🔁 Using cached {outreach_type} content (length: {len(generated_text)})")
+            else:
+                # Call OpenAI API
+                async with aiohttp.ClientSession() as session:
+                    messages = []
+                    if system_message:
+                        messages.append({"role": "system", "content": system_message})
+                    messages.append({"role": "user", "content": prompt})
+                    
+                    async with session.post(
+                        "https://api.openai.com/v1/chat/completions",
+                        headers={
+                            "Authorization": f"Bearer {self.openai_api_key}",
+                            "Content-Type": "application/json"
+                        },
+                        json={
+                            "model": "gpt-4o",
+                            "messages": messages,
+                            "temperature": temperature,
+                            "max_tokens": 1000
+                        },
+                        timeout=aiohttp.ClientTimeout(total=120)
+                    ) as response:
+                        if response.status == 200:
+                            data = await response.json()
+                            generated_text = data['choices'][0]['message']['content'].strip()
+                        else:
+                            error_text = await response.text()
+                            logger.error(f"OpenAI API error: {response.status} - {error_text}")
+                            raise Exception(f"OpenAI API error: {response.status}")
+                
+                if not generated_text:
+                    raise Exception("OpenAI returned empty response")
+                
+                if cache_key is not None:
+                    await llm_cache.set(cache_key, generated_text)
+                
+                logger.info(f"✅ Successfully generated {outreach_type} content using OpenAI (length: {len(generated_text)})")
             
             # Try to parse JSON response
             try:
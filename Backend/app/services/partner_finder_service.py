@@ -12,7 +12,7 @@ import aiohttp
 from uuid import uuid4
 from app.config import settings
 from app.database_mysql_inspire import inspire_db
-from app.tasks.unified_analysis_task import run_unified_analysis
+from app.tasks.unified_analysis_task import start_unified_analysis
 from loguru import logger
 
 logger = logging.getLogger(__name__)
@@ -116,7 +116,7 @@ class PartnerFinderService:
                             job_identifier = f"partner-finder-{company_id}-{uuid4().hex[:8]}"
                             
                             # Trigger unified analysis as a Celery task (non-blocking)
-                            task = run_unified_analysis.delay(
+                            task = start_unified_analysis(
                                 company_name=partner['name'],
                                 company_location=partner.get('location', location),
                                 sme_id=sme_id,
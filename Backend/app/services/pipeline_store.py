@@ -0,0 +1,242 @@
+"""
+Payload store for the staged unified-analysis pipeline
+
+The unified analysis runs as a Celery chain of stage tasks (scrape -> classify
+-> store -> embed -> extract). Stage outputs - scraped articles, classified
+rows, chunk embeddings - can be megabytes, so they are never inlined into the
+broker messages: each stage writes its output here under
+`pipeline:<run_id>:<stage>` and hands only that key to the next stage. The run id
+is generated when the chain is queued, so a client re-using a job_identifier
+never picks up an earlier run's entries.
+
+The same entries make up the run's checkpoint: `pipeline:<run_id>:checkpoint`
+records the completed stages and the job dict after the last of them, and
+stages in flight save partial results (stored article ids, extracted
+categories). A retried or redelivered stage task resumes from there instead of
+re-scraping SerpAPI, re-inserting articles or re-running finished categories.
+
+Redis is used when reachable (shared by all workers); otherwise one file per
+payload under PIPELINE_PAYLOAD_DIR, which must then be shared by the io and
+cpu workers. Payloads are stored as JSON - numpy arrays as `np.save` bytes
+without pickled objects - so nothing read back from the shared store can run
+code in a worker; they expire after PIPELINE_PAYLOAD_TTL_SECONDS.
+"""
+
+import os
+import time
+import io
+import json
+import base64
+import hashlib
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional
+from loguru import logger
+
+import numpy as np
+
+import redis
+
+from app.config import settings
+
+CHECKPOINT = "checkpoint"
+
+
+class PipelinePayloadMissing(KeyError):
+    """The payload behind a stage key expired or was never written"""
+
+
+def _to_json(value: Any) -> Any:
+    """`value` as plain JSON types; arrays and dicts with non-string keys are tagged"""
+    if isinstance(value, np.ndarray):
+        buffer = io.BytesIO()
+        np.save(buffer, value, allow_pickle=False)
+        return {"__ndarray__": base64.b64encode(buffer.getvalue()).decode('ascii')}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _to_json(item) for key, item in value.items()}
+        # e.g. row index -> article id; JSON objects would turn the keys into strings
+        return {"__items__": [[_to_json(key), _to_json(item)] for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot store {type(value).__name__} in a pipeline payload")
+
+
+def _from_json_object(obj: Dict[str, Any]) -> Any:
+    if "__ndarray__" in obj and len(obj) == 1:
+        return np.load(io.BytesIO(base64.b64decode(obj["__ndarray__"])), allow_pickle=False)
+    if "__items__" in obj and len(obj) == 1:
+        return {_hashable(key): item for key, item in obj["__items__"]}
+    return obj
+
+
+def _hashable(key: Any) -> Any:
+    return tuple(key) if isinstance(key, list) else key
+
+
+def dumps_payload(payload: Any) -> bytes:
+    return json.dumps(_to_json(payload), separators=(',', ':')).encode('utf-8')
+
+
+def loads_payload(value: bytes) -> Any:
+    return json.loads(value, object_hook=_from_json_object)
+
+
+def make_payload_key(run_id: str, stage: str) -> str:
+    return f"pipeline:{run_id}:{stage}"
+
+
+class _RedisBackend:
+    name = "redis"
+
+    def __init__(self, client: "redis.Redis"):
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        self.client.set(key, value, ex=ttl_seconds)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if keys:
+            self.client.delete(*keys)
+
+
+class _DiskBackend:
+    name = "disk"
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        # Keys embed the job identifier in older runs; never use them as file names directly
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + ".json")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) < time.time():
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        # The file's mtime doubles as its expiry time
+        expires_at = time.time() + ttl_seconds
+        os.utime(path, (expires_at, expires_at))
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+class PipelinePayloadStore:
+    """Stage payloads of running pipelines, addressed by key"""
+
+    def __init__(self, backend, ttl_seconds: int = 86400):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    def put(self, run_id: str, stage: str, payload: Any) -> str:
+        """Store a stage's output; returns the key the next stage loads it from"""
+        key = make_payload_key(run_id, stage)
+        self.backend.set(key, dumps_payload(payload), self.ttl_seconds)
+        return key
+
+    def get(self, key: str) -> Any:
+        value = self.backend.get(key)
+        if value is None:
+            raise PipelinePayloadMissing(key)
+        try:
+            return loads_payload(value)
+        except ValueError as e:
+            # e.g. an entry written in the old pickle format; never unpickle shared data
+            logger.warning(f"⚠️ Unreadable pipeline payload {key}: {e}")
+            raise PipelinePayloadMissing(key) from e
+
+    def get_optional(self, run_id: str, stage: str, default: Any = None) -> Any:
+        """A run's payload for `stage`, or `default` if there is none (e.g. no checkpoint yet)"""
+        try:
+            return self.get(make_payload_key(run_id, stage))
+        except PipelinePayloadMissing:
+            return default
+
+    def load_checkpoint(self, run_id: str) -> Dict[str, Any]:
+        """{'completed_stages': [...], 'job': job dict after the last completed stage}"""
+        return self.get_optional(run_id, CHECKPOINT, {'completed_stages': [], 'job': None})
+
+    def save_checkpoint(self, run_id: str, stage: str, job: Dict[str, Any]) -> None:
+        """Record that `stage` completed, leaving `job` for the following stages"""
+        checkpoint = self.load_checkpoint(run_id)
+        if stage not in checkpoint['completed_stages']:
+            checkpoint['completed_stages'].append(stage)
+        checkpoint['job'] = job
+        self.put(run_id, CHECKPOINT, checkpoint)
+
+    def delete_job(self, run_id: str, stages: Iterable[str]) -> None:
+        """Drop a run's payloads for `stages` (they would otherwise expire after the TTL)"""
+        try:
+            self.backend.delete(make_payload_key(run_id, stage) for stage in stages)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to delete pipeline payloads of {run_id}: {e}")
+
+
+def _create_backend():
+    if settings.pipeline_payload_backend.lower() == "redis":
+        for url in dict.fromkeys([
+            settings.redis_url,
+            # Fallback to localhost for local development
+            settings.redis_url.replace('redis://redis:', 'redis://localhost:'),
+        ]):
+            try:
+                client = redis.from_url(url, socket_connect_timeout=2, socket_timeout=10)
+                client.ping()
+                logger.info(f"✅ Pipeline payload store: Redis at {url}")
+                return _RedisBackend(client)
+            except Exception as e:
+                logger.warning(f"⚠️ Pipeline payload store: Redis unavailable at {url}: {e}")
+
+    backend = _DiskBackend(settings.pipeline_payload_dir)
+    logger.info(f"✅ Pipeline payload store: disk at {backend.directory}")
+    return backend
+
+
+_pipeline_store: Optional[PipelinePayloadStore] = None
+_pipeline_store_lock = threading.Lock()
+
+
+def get_pipeline_store() -> PipelinePayloadStore:
+    """Process-wide pipeline payload store (created on first use)"""
+    global _pipeline_store
+    if _pipeline_store is None:
+        with _pipeline_store_lock:
+            if _pipeline_store is None:
+                _pipeline_store = PipelinePayloadStore(
+                    _create_backend(),
+                    ttl_seconds=settings.pipeline_payload_ttl_seconds
+                )
+    return _pipeline_store
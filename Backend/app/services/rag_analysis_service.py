@@ -17,68 +17,43 @@ Extracts 10 categories:
 
 import json
 import re
-import copy
+import time
+import asyncio
 import hashlib
+import threading
 import numpy as np
 import aiohttp
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from datetime import datetime
 from collections import OrderedDict
 from loguru import logger
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 from app.config import settings
+from app.services.rag_context import RAGAnalysisContext
+from app.services.embedding_store import EmbeddingStore, make_embedding_key
+from app.services.embedding_encoder import encode_texts
+from app.services.embedding_backend import embedding_model_id, get_shared_embedding_model
+from app.services.vector_index import ChunkTable, InMemoryVectorIndex, normalize_rows
+from app.services.vector_planner import MEMORY_HNSW, plan_vector_backend
+from app.services.analysis_cache import AnalysisCacheBackend, create_analysis_cache
+from app.services.llm_cache import get_llm_cache, make_llm_cache_key
+from app.services.text_chunker import CHUNKER_VERSION, chunk_text, find_near_duplicates
+from app.utils.event_loop import loop_session, run_coroutine_sync
+from app.services.context_builder import (
+    count_tokens,
+    format_context_chunk,
+    select_context_chunks,
+    token_counter_name,
+)
+from app.services.milvus_store import (
+    MILVUS_AVAILABLE,
+    MilvusException,
+    MilvusChunkStore,
+    MilvusConnectionManager,
+    get_milvus_connection,
+    make_company_key,
+)
 
 
-def _patch_marshmallow():
-    """Ensure marshmallow exposes compatibility attributes for environs/pymilvus."""
-    try:
-        import marshmallow as ma  # type: ignore
-    except ImportError:
-        return None
-
-    if not hasattr(ma, "__version_info__"):
-        try:
-            version_tuple = tuple(int(part) for part in ma.__version__.split(".") if part.isdigit())
-        except Exception:
-            version_tuple = (0, 0, 0)
-        ma.__version_info__ = version_tuple  # type: ignore[attr-defined]
-
-    if not hasattr(ma.fields.Field, "__orig_init__"):
-        original_init = ma.fields.Field.__init__
-
-        def _field_init_with_missing(self, *args, **kwargs):
-            if "missing" in kwargs and "load_default" not in kwargs:
-                kwargs["load_default"] = kwargs.pop("missing")
-            return original_init(self, *args, **kwargs)
-
-        ma.fields.Field.__orig_init__ = original_init  # type: ignore[attr-defined]
-        ma.fields.Field.__init__ = _field_init_with_missing  # type: ignore[assignment]
-
-    if not hasattr(ma.fields.Field, "missing"):
-        def _get_missing(self):
-            return getattr(self, "load_default", None)
-
-        def _set_missing(self, value):
-            setattr(self, "load_default", value)
-
-        ma.fields.Field.missing = property(_get_missing, _set_missing)  # type: ignore[attr-defined]
-
-    return ma
-
-
-_patched_marshmallow = _patch_marshmallow()
-
-# Milvus (optional, with in-memory fallback)
-try:
-    from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
-    from pymilvus.exceptions import MilvusException
-    MILVUS_AVAILABLE = True
-except ImportError:
-    connections = Collection = FieldSchema = CollectionSchema = DataType = utility = None  # type: ignore
-    MilvusException = Exception  # type: ignore
-    MILVUS_AVAILABLE = False
-    logger.warning("pymilvus not available, using in-memory vector storage")
 
 
 class RAGAnalysisService:
@@ -99,7 +74,8 @@ class RAGAnalysisService:
         milvus_host: str = "localhost",
         milvus_port: str = "19530",
         ollama_host: str = None,  # Deprecated - kept for backward compatibility
-        llm_model: str = None  # Deprecated - kept for backward compatibility
+        llm_model: str = None,  # Deprecated - kept for backward compatibility
+        max_concurrent_categories: Optional[int] = None
     ):
         """Initialize RAG service"""
         logger.info("🚀 Initializing RAG Analysis Service...")
@@ -108,6 +84,13 @@ class RAGAnalysisService:
         self.milvus_host = milvus_host
         self.milvus_port = milvus_port
         
+        # Upper bound on category extractions (OpenAI calls) running at the same time
+        self.max_concurrent_categories = max(
+            1,
+            max_concurrent_categories if max_concurrent_categories is not None
+            else settings.rag_max_concurrent_categories
+        )
+        
         # Initialize OpenAI API key
         self.openai_api_key = settings.openai_api_key
         
@@ -118,49 +101,90 @@ class RAGAnalysisService:
         
         # Hyperparameters
         self.hyperparameters = {
-            'chunk_size': 400,  # Reduced from 500 for faster processing
-            'chunk_overlap': 80,  # Reduced proportionally
-            'top_k': 3,  # Reduced from 5 to 3 for faster retrieval and less LLM processing
+            'chunk_size': 400,  # Embedding-tokenizer tokens per chunk (whole sentences)
+            'chunk_overlap': 80,  # Tokens of trailing sentences repeated in the next chunk
+            'top_k': 3,  # Chunks per category prompt (reduced from 5 to 3 for less LLM processing)
+            'mmr_fetch_k': settings.rag_mmr_fetch_k,  # Candidates retrieved per category for MMR selection
+            'mmr_lambda': settings.rag_mmr_lambda,  # 1.0 = pure relevance, lower = more diverse context
+            'context_token_budget': settings.rag_context_token_budget,  # GPT tokens of context per category
             'temperature': 0.3,
             'max_tokens': 600,  # Reduced from 800 for faster inference (still maintains quality)
-            'similarity_threshold': 0.15  # Increased from 0.1 to filter more chunks faster
+            'similarity_threshold': 0.15,  # Increased from 0.1 to filter more chunks faster
+            'extraction_mode': settings.rag_extraction_mode,  # 'separate' (one call per category) or 'packed'
+            'pack_overlap_threshold': settings.rag_pack_overlap_threshold
         }
         
         # Initialize embedding model - FORCE CPU to prevent MPS/SIGSEGV crashes
-        logger.info("📦 Loading SentenceTransformer model (CPU-only)...")
-        import torch
+        logger.info(f"📦 Loading embedding model (CPU-only, {settings.embedding_backend} backend)...")
         device = 'cpu'  # Always use CPU to prevent SIGSEGV crashes
-        self.embedding_model = SentenceTransformer('BAAI/bge-m3', device=device)
+        self.embedding_model_name = 'BAAI/bge-m3'
+        self.embedding_model = get_shared_embedding_model(self.embedding_model_name)  # Shared with classification
+        # Vectors from different backends are not mixed in the stores
+        self.embedding_model_id = embedding_model_id(self.embedding_model_name, self.embedding_model)
         self.embedding_dim = self.embedding_model.get_sentence_embedding_dimension()
-        logger.info(f"✅ Embedding model loaded (dim={self.embedding_dim}, device={device})")
+        logger.info(f"✅ Embedding model loaded ({self.embedding_model_id}, dim={self.embedding_dim}, device={device})")
+        
+        # Disk-backed chunk embedding store shared with the other API/Celery processes; one per
+        # vector space (an embedding server client serves in-process vectors while the server is down)
+        self._embedding_stores: Dict[str, Optional[EmbeddingStore]] = {}
+        self._embedding_stores_lock = threading.Lock()
+        self._embedding_store_for(self.embedding_model_id)  # opened at start-up, as before
         
         # Initialize Milvus or in-memory storage
-        self.milvus_available = False
-        self.collection = None
-        self.in_memory_chunks = []
-        self.in_memory_embeddings = None
-        self.analysis_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        # Per-analysis vector stores live in RAGAnalysisContext; only shared state is kept here
+        self.milvus_connection: Optional[MilvusConnectionManager] = None
+        self.milvus_store: Optional[MilvusChunkStore] = None
+        self._cache_lock = threading.RLock()
+        # Finished analyses are cached in Redis when available, so any worker can serve a repeat
+        self.analysis_cache: AnalysisCacheBackend = create_analysis_cache()
         self.vector_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
-        self.cache_max_entries = 10
-        self.vector_cache_max_entries = 5
+        # Budgeted by memory (index matrix + chunk table), not entry count: one large article set
+        # can outweigh dozens of small ones
+        self.vector_cache_max_bytes = int(settings.rag_vector_cache_max_mb * 1024 * 1024)
+        self._vector_cache_bytes = 0
+        # Category queries barely change between analyses, so their embeddings are kept
+        self.query_embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.query_embedding_cache_max_entries = 256
         
         if MILVUS_AVAILABLE:
-            try:
-                connections.connect(
-                    alias="default",
-                    host=milvus_host,
-                    port=milvus_port,
-                    timeout=10  # Balanced timeout: enough for startup, not too long
-                )
-                self.milvus_available = True
+            # Shared by every service in the process: one connection, one breaker, one health probe
+            self.milvus_connection = get_milvus_connection(milvus_host, milvus_port)
+            self.milvus_store = MilvusChunkStore(
+                collection_name=settings.milvus_collection_name,
+                embedding_dim=self.embedding_dim,
+                connection=self.milvus_connection,
+                vector_ttl_seconds=settings.milvus_vector_ttl_hours * 3600,
+                gc_interval_seconds=settings.milvus_gc_interval_seconds
+            )
+            self.milvus_store.start_background_gc()
+            if self.milvus_connection.available:
                 logger.info(f"✅ Connected to Milvus at {milvus_host}:{milvus_port}")
-            except Exception as e:
-                logger.warning(f"⚠️ Milvus connection failed: {e}. Using in-memory storage.")
+            else:
+                logger.warning(
+                    f"⚠️ Milvus at {milvus_host}:{milvus_port} unreachable ({self.milvus_connection.last_error}). "
+                    "Using in-memory storage until the health probe sees it again."
+                )
         else:
             logger.info("📝 Using in-memory vector storage (Milvus not available)")
         
         logger.info("✅ RAG Analysis Service initialized")
     
+    @property
+    def milvus_available(self) -> bool:
+        """Milvus is configured and its circuit breaker is not open"""
+        return self.milvus_connection is not None and self.milvus_connection.available
+    
+    def create_context(self, hyperparameter_overrides: Optional[Dict[str, Any]] = None) -> RAGAnalysisContext:
+        """Create the per-analysis context (private vector store and settings, shared model)"""
+        hyperparameters = dict(self.hyperparameters)
+        if hyperparameter_overrides:
+            unknown = set(hyperparameter_overrides) - set(hyperparameters)
+            if unknown:
+                raise ValueError(f"Unknown RAG hyperparameters: {sorted(unknown)}")
+            hyperparameters.update({k: v for k, v in hyperparameter_overrides.items() if v is not None})
+        
+        return RAGAnalysisContext(hyperparameters=hyperparameters, use_milvus=self.milvus_available)
+    
     def _generate_articles_signature(self, articles: List[Dict[str, str]]) -> str:
         """Generate deterministic signature for a list of articles"""
         hasher = hashlib.sha256()
@@ -173,22 +197,29 @@ class RAGAnalysisService:
             hasher.update(b'\x01')
         return hasher.hexdigest()
     
-    def _make_vector_signature(self, articles_signature: str) -> str:
+    def _make_vector_signature(self, ctx: RAGAnalysisContext, articles_signature: str) -> str:
         """Combine articles signature with chunking hyperparameters for vector cache"""
-        return f"{articles_signature}:{self.hyperparameters['chunk_size']}:{self.hyperparameters['chunk_overlap']}"
+        signature = f"{articles_signature}:{ctx.hyperparameters['chunk_size']}:{ctx.hyperparameters['chunk_overlap']}:{CHUNKER_VERSION}"
+        if self.embedding_model_id != self.embedding_model_name:
+            signature += f":{self.embedding_model_id.rsplit(':', 1)[-1]}"
+        return signature
     
-    def _make_cache_key(self, company_name: str, sme_objective: str, articles_signature: str) -> tuple:
+    def _make_cache_key(self, ctx: RAGAnalysisContext, company_name: str, sme_objective: str, articles_signature: str) -> tuple:
         """Create cache key including key hyperparameters and model choice"""
         return (
             company_name.strip().lower(),
             (sme_objective or '').strip().lower(),
             articles_signature,
             "openai-gpt-4o",  # Model identifier for cache key
-            self.hyperparameters['chunk_size'],
-            self.hyperparameters['chunk_overlap'],
-            self.hyperparameters['top_k'],
-            self.hyperparameters['temperature'],
-            self.hyperparameters['max_tokens'],
+            ctx.hyperparameters['chunk_size'],
+            ctx.hyperparameters['chunk_overlap'],
+            ctx.hyperparameters['top_k'],
+            ctx.hyperparameters['mmr_fetch_k'],
+            ctx.hyperparameters['mmr_lambda'],
+            ctx.hyperparameters['context_token_budget'],
+            ctx.hyperparameters['temperature'],
+            ctx.hyperparameters['max_tokens'],
+            ctx.hyperparameters['extraction_mode'],
         )
     
     def _get_cached_analysis(self, cache_key: tuple) -> Optional[Dict[str, Any]]:
@@ -197,298 +228,350 @@ class RAGAnalysisService:
         if not entry:
             return None
         
-        # Move to end for LRU behavior
-        self.analysis_cache.move_to_end(cache_key)
-        
-        cached_result = copy.deepcopy(entry['result'])
+        cached_result = entry['result']
         cached_result['metadata']['timestamp'] = datetime.now().isoformat()
         cached_result['metadata']['cache_hit'] = True
         cached_result['metadata']['cached_at'] = entry['cached_at']
         cached_result['metadata']['vector_store_reused'] = entry['result']['metadata'].get('vector_store_reused', False)
-        logger.info("🔁 Returning cached RAG analysis result")
+        cached_result['metadata']['analysis_cache'] = self.analysis_cache.stats()
+        logger.info(f"🔁 Returning cached RAG analysis result ({self.analysis_cache.name} cache)")
         return cached_result
     
     def _update_analysis_cache(self, cache_key: tuple, result: Dict[str, Any], articles_signature: str) -> None:
-        """Store analysis result in cache with LRU eviction"""
+        """Store analysis result in the analysis cache (the backend handles TTL and eviction)"""
         cached_at = datetime.now().isoformat()
         result['metadata']['cached_at'] = cached_at
         result['metadata']['cache_hit'] = False
+        result['metadata']['analysis_cache'] = self.analysis_cache.stats()
         cache_entry = {
-            'result': copy.deepcopy(result),
+            'result': result,
             'cached_at': cached_at,
             'articles_signature': articles_signature,
         }
-        cache_entry['result']['metadata']['cached_at'] = cached_at
-        cache_entry['result']['metadata']['cache_hit'] = False
-        
-        self.analysis_cache[cache_key] = cache_entry
-        self.analysis_cache.move_to_end(cache_key)
-        
-        while len(self.analysis_cache) > self.cache_max_entries:
-            self.analysis_cache.popitem(last=False)
+        self.analysis_cache.set(cache_key, cache_entry)
     
     def _get_vector_cache_entry(self, signature: str) -> Optional[Dict[str, Any]]:
         """Retrieve vector store cache entry, keeping LRU order"""
-        entry = self.vector_cache.get(signature)
-        if entry:
-            self.vector_cache.move_to_end(signature)
-        return entry
+        with self._cache_lock:
+            entry = self.vector_cache.get(signature)
+            if entry:
+                self.vector_cache.move_to_end(signature)
+            return entry
     
     def _update_vector_cache(self, signature: str, entry: Dict[str, Any]) -> None:
-        """Store vector cache entry and evict old ones as needed"""
-        self.vector_cache[signature] = entry
-        self.vector_cache.move_to_end(signature)
-        
-        while len(self.vector_cache) > self.vector_cache_max_entries:
-            old_signature, old_entry = self.vector_cache.popitem(last=False)
-            if self.milvus_available and old_entry.get('vector_storage') == 'milvus':
-                collection_name = old_entry.get('collection_name')
-                if collection_name:
-                    try:
-                        # Check if collection exists with proper error handling
-                        collection_exists = False
-                        try:
-                            collection_exists = utility.has_collection(collection_name)
-                        except (MilvusException, Exception) as check_exc:
-                            logger.warning(f"⚠️ Error checking Milvus collection existence during cleanup: {check_exc}")
-                            collection_exists = False
-                        
-                        if collection_exists:
-                            Collection(name=collection_name).drop()
-                            logger.info(f"🧹 Dropped unused Milvus collection: {collection_name}")
-                    except Exception as exc:
-                        logger.warning(f"⚠️ Failed to drop Milvus collection {collection_name}: {exc}")
+        """Store vector cache entry and evict least recently used ones beyond the memory budget"""
+        entry['nbytes'] = entry['index'].nbytes + entry['chunks'].nbytes
+        if entry['nbytes'] > self.vector_cache_max_bytes:
+            logger.info(
+                f"💾 Vector store ({entry['nbytes'] / 1e6:.1f}MB) exceeds the vector cache budget; not caching"
+            )
+            return
+        with self._cache_lock:
+            previous = self.vector_cache.pop(signature, None)
+            if previous:
+                self._vector_cache_bytes -= previous['nbytes']
+            self.vector_cache[signature] = entry
+            self._vector_cache_bytes += entry['nbytes']
+            
+            while self._vector_cache_bytes > self.vector_cache_max_bytes:
+                _, evicted = self.vector_cache.popitem(last=False)
+                self._vector_cache_bytes -= evicted['nbytes']
     
-    def _get_collection_name(self, company_name: str, articles_signature: str) -> str:
-        """Generate deterministic Milvus collection name"""
-        sanitized = re.sub(r'[^a-z0-9]+', '_', company_name.lower()).strip('_')
-        if not sanitized:
-            sanitized = "company"
-        return f"company_rag_{sanitized[:24]}_{articles_signature[:8]}"
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        """Token counts with the embedding model's tokenizer (word-based estimate if unavailable)"""
+        tokenizer = getattr(self.embedding_model, 'tokenizer', None)
+        if tokenizer is not None:
+            try:
+                encoded = tokenizer(texts, add_special_tokens=False)['input_ids']
+                return [len(ids) for ids in encoded]
+            except Exception as e:
+                logger.debug(f"Tokenizer unavailable for chunking, estimating tokens: {e}")
+        return [int(len(text.split()) * 1.3) + 1 for text in texts]
     
-    def _chunk_text(self, text: str) -> List[str]:
-        """Split text into overlapping chunks (max 1800 chars for Milvus)"""
-        chunk_size = self.hyperparameters['chunk_size']
-        overlap = self.hyperparameters['chunk_overlap']
+    def _chunk_text(self, text: str, ctx: RAGAnalysisContext) -> List[str]:
+        """Split text into sentence-aligned chunks within the token budget (max 1800 chars for Milvus)"""
         max_chunk_chars = 1800  # Leave buffer for Milvus 2000 char limit
+        # Never exceed what the embedding model actually reads (minus the 2 special tokens)
+        max_tokens = min(ctx.hyperparameters['chunk_size'], settings.rag_embedding_max_seq_length - 2)
+        
+        chunks = chunk_text(
+            text,
+            self._count_tokens,
+            max_tokens=max_tokens,
+            overlap_tokens=ctx.hyperparameters['chunk_overlap'],
+            max_chars=max_chunk_chars,
+            min_chars=50  # Minimum chunk size
+        )
         
-        words = text.split()
-        chunks = []
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            
-            # Ensure chunk doesn't exceed max length
-            if len(chunk) > max_chunk_chars:
-                # Truncate to max length at word boundary
-                chunk = chunk[:max_chunk_chars].rsplit(' ', 1)[0]
-            
-            if len(chunk) >= 50:  # Minimum chunk size
-                chunks.append(chunk)
-        
-        return chunks if chunks else [text[:max_chunk_chars]]
+        if not chunks and text.strip():
+            return [' '.join(text.split())[:max_chunk_chars]]
+        return chunks
     
     def _generate_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Generate embeddings for texts"""
-        return self.embedding_model.encode(
-            texts,
-            batch_size=32,
-            show_progress_bar=False,
-            convert_to_numpy=True
-        )
+        """Generate embeddings for texts (length-bucketed batches)"""
+        return encode_texts(self.embedding_model, texts, max_seq_length=settings.rag_embedding_max_seq_length)
+    
+    def _embed_chunks(self, ctx: RAGAnalysisContext, texts: List[str]) -> np.ndarray:
+        """Embed chunk texts, reusing embeddings handed in by the pipeline's embed stage"""
+        precomputed = ctx.precomputed_embeddings
+        if not precomputed or not texts:
+            return self._embed_chunks_from_store(ctx, texts)
+        
+        missing = [i for i, text in enumerate(texts) if text not in precomputed]
+        ctx.embedding_cache_hits += len(texts) - len(missing)
+        embeddings = np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            if text in precomputed:
+                embeddings[i] = precomputed[text]
+        if missing:
+            embeddings[missing] = self._embed_chunks_from_store(ctx, [texts[i] for i in missing])
+        logger.info(f"📦 Precomputed embeddings: {len(texts) - len(missing)}/{len(texts)} chunks reused")
+        return embeddings
+    
+    def _embedding_store_for(self, model_id: str) -> Optional[EmbeddingStore]:
+        """The embedding store of one vector space (None when the store is disabled or unavailable)"""
+        if not settings.rag_embedding_store_enabled:
+            return None
+        with self._embedding_stores_lock:
+            if model_id not in self._embedding_stores:
+                try:
+                    self._embedding_stores[model_id] = EmbeddingStore(
+                        directory=settings.rag_embedding_store_dir,
+                        model_name=model_id,
+                        embedding_dim=self.embedding_dim,
+                        max_size_mb=settings.rag_embedding_store_max_mb
+                    )
+                except Exception as e:
+                    logger.warning(f"⚠️ Embedding store for {model_id} unavailable: {e}. Chunks will be embedded on every analysis.")
+                    self._embedding_stores[model_id] = None
+            return self._embedding_stores[model_id]
     
-    def _store_vectors_milvus(self, chunks: List[Dict[str, Any]], collection_name: str):
-        """Store chunks and embeddings in Milvus"""
+    def _embed_chunks_from_store(self, ctx: RAGAnalysisContext, texts: List[str]) -> np.ndarray:
+        """Embed chunk texts, encoding only those missing from the embedding store"""
+        # Read and write under the backend that actually produces the vectors, not the configured one
+        model_id = getattr(self.embedding_model, 'active_model_id', self.embedding_model_id)
+        store = self._embedding_store_for(model_id)
+        if store is None or not texts:
+            ctx.embedding_cache_misses += len(texts)
+            return self._generate_embeddings(texts)
+        
+        keys = [make_embedding_key(text, model_id) for text in texts]
         try:
-            # Check if collection exists with proper error handling
-            collection_exists = False
-            try:
-                collection_exists = utility.has_collection(collection_name)
-            except (MilvusException, Exception) as check_exc:
-                logger.warning(f"⚠️ Error checking if Milvus collection exists: {check_exc}")
-                collection_exists = False
-            
-            if collection_exists:
+            cached = store.get_many(keys)
+        except Exception as exc:
+            logger.warning(f"⚠️ Embedding store lookup failed: {exc}")
+            cached = {}
+        
+        miss_positions = [i for i, key in enumerate(keys) if key not in cached]
+        
+        embeddings = np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            if key in cached:
+                embeddings[i] = cached[key]
+        
+        if miss_positions:
+            encoded = self._generate_embeddings([texts[i] for i in miss_positions])
+            produced_id = getattr(self.embedding_model, 'last_model_id', model_id)
+            if produced_id != model_id:
+                # The embedding server failed over during this call: the stored vectors belong to the
+                # other backend's space, so encode everything with the producing backend and store it there
+                logger.warning(f"⚠️ Embeddings came from {produced_id}, not {model_id}; re-keying the embedding store")
+                model_id = produced_id
+                store = self._embedding_store_for(model_id)
+                if len(miss_positions) < len(texts):
+                    encoded = self._generate_embeddings(texts)
+                    miss_positions = list(range(len(texts)))
+                keys = [make_embedding_key(text, model_id) for text in texts]
+            embeddings[miss_positions] = encoded
+            if store is not None:
                 try:
-                    existing_collection = Collection(name=collection_name)
-                    existing_collection.release()
-                    existing_collection.drop()
-                    logger.info(f"♻️  Replacing existing Milvus collection: {collection_name}")
+                    store.put_many([keys[i] for i in miss_positions], encoded)
                 except Exception as exc:
-                    logger.warning(f"⚠️ Failed to drop existing Milvus collection {collection_name}: {exc}")
-            
-            # Define schema
-            fields = [
-                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-                FieldSchema(name="chunk_text", dtype=DataType.VARCHAR, max_length=2000),
-                FieldSchema(name="article_title", dtype=DataType.VARCHAR, max_length=500),
-                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.embedding_dim)
-            ]
-            schema = CollectionSchema(fields=fields, description="RAG company analysis")
-            
-            # Create collection
-            collection = Collection(name=collection_name, schema=schema)
-            
-            # Prepare data (ensure lengths don't exceed Milvus limits)
-            chunk_texts = [c['text'][:1800] for c in chunks]  # Max 2000, leave buffer
-            titles = [c['title'][:400] for c in chunks]  # Max 500, leave buffer
-            embeddings = [c['embedding'].tolist() for c in chunks]
-            
-            # Insert data
-            collection.insert([chunk_texts, titles, embeddings])
-            
-            # Create index
-            index_params = {
-                "metric_type": "COSINE",
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 128}
-            }
-            collection.create_index(field_name="embedding", index_params=index_params)
-            collection.load()
-            
-            self.collection = collection
-            logger.info(f"✅ Stored {len(chunks)} chunks in Milvus collection: {collection_name}")
+                    logger.warning(f"⚠️ Failed to write embeddings to the store: {exc}")
+        
+        ctx.embedding_cache_hits += len(texts) - len(miss_positions)
+        ctx.embedding_cache_misses += len(miss_positions)
+        
+        logger.info(f"💾 Embedding store: {len(texts) - len(miss_positions)}/{len(texts)} chunks reused")
+        return embeddings
+    
+    def _store_vectors_milvus(self, ctx: RAGAnalysisContext, chunks: List[Dict[str, Any]], embeddings: np.ndarray):
+        """Upsert chunks and embeddings into the shared Milvus collection"""
+        try:
+            self.milvus_store.upsert_chunks(ctx.company_key, ctx.vector_signature, chunks, embeddings)
+            ctx.milvus_ready = True
         except (MilvusException, Exception) as exc:
             # If anything fails in Milvus operations, raise the exception
             # so the caller can handle it (fallback to in-memory)
             logger.error(f"❌ Failed to store vectors in Milvus: {exc}")
             raise
     
-    def _store_vectors_memory(self, chunks: List[Dict[str, Any]]):
-        """Store chunks and embeddings in memory"""
-        self.in_memory_chunks = chunks
-        self.in_memory_embeddings = np.vstack([c['embedding'] for c in chunks])
-        logger.info(f"✅ Stored {len(chunks)} chunks in memory")
+    def _store_vectors_memory(
+        self,
+        ctx: RAGAnalysisContext,
+        chunks: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        approximate: bool = False
+    ):
+        """Store chunk metadata (columnar) and embeddings (one compact matrix, plus an HNSW graph if approximate)"""
+        ctx.in_memory_chunks = ChunkTable.from_chunks(chunks)
+        ctx.in_memory_index = InMemoryVectorIndex(
+            embeddings,
+            dtype=settings.rag_memory_index_dtype,
+            hnsw_min_size=0 if approximate else None
+        )
+        logger.info(
+            f"✅ Stored {len(chunks)} chunks in memory ({ctx.in_memory_index.mode} index, "
+            f"{ctx.in_memory_index.matrix.dtype}, {ctx.in_memory_index.nbytes / 1e6:.1f}MB vectors)"
+        )
     
-    def _retrieve_milvus(self, query: str, top_k: int) -> List[Dict[str, Any]]:
-        """Retrieve relevant chunks from Milvus"""
-        try:
-            query_embedding = self._generate_embeddings([query])[0].tolist()
-            
-            search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
-            results = self.collection.search(
-                data=[query_embedding],
-                anns_field="embedding",
-                param=search_params,
-                limit=top_k,
-                output_fields=["chunk_text", "article_title"]
-            )
-        except (MilvusException, Exception) as exc:
-            logger.warning(f"⚠️ Failed to retrieve from Milvus: {exc}. Falling back to in-memory.")
-            # If Milvus fails, try to use in-memory if available
-            if hasattr(self, 'in_memory_chunks') and self.in_memory_chunks:
-                return self._retrieve_memory(query, top_k)
-            # Otherwise return empty list
-            return []
-        
-        chunks = []
-        threshold = self.hyperparameters['similarity_threshold']
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed retrieval queries, encoding only those not seen before (one batched forward pass)"""
+        with self._cache_lock:
+            cached = {q: self.query_embedding_cache[q] for q in queries if q in self.query_embedding_cache}
+            for q in cached:
+                self.query_embedding_cache.move_to_end(q)
+        
+        missing = list(dict.fromkeys(q for q in queries if q not in cached))
+        if missing:
+            encoded = self._generate_embeddings(missing)
+            with self._cache_lock:
+                for q, emb in zip(missing, encoded):
+                    cached[q] = emb
+                    self.query_embedding_cache[q] = emb
+                while len(self.query_embedding_cache) > self.query_embedding_cache_max_entries:
+                    self.query_embedding_cache.popitem(last=False)
+        
+        return np.vstack([cached[q] for q in queries])
+    
+    @staticmethod
+    def _apply_similarity_threshold(hits: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+        """Keep hits (sorted best-first) above the threshold, or at least the top one above the minimum"""
         min_threshold = 0.05  # Absolute minimum to avoid completely irrelevant chunks
-        
-        for hit in results[0]:
-            similarity = float(hit.distance)
-            # Use threshold, but be more lenient if we have few chunks
-            if similarity >= threshold or (len(chunks) == 0 and similarity >= min_threshold):
-                chunks.append({
-                    'text': hit.entity.get('chunk_text'),
-                    'title': hit.entity.get('article_title'),
-                    'similarity': similarity
-                })
-        
-        # If we still have no chunks, include at least the top result if above minimum
-        if not chunks and len(results[0]) > 0:
-            top_hit = results[0][0]
-            top_similarity = float(top_hit.distance)
-            if top_similarity >= min_threshold:
-                chunks.append({
-                    'text': top_hit.entity.get('chunk_text'),
-                    'title': top_hit.entity.get('article_title'),
-                    'similarity': top_similarity
-                })
-        
+        chunks = [hit for hit in hits if hit['similarity'] >= threshold]
+        if not chunks and hits and hits[0]['similarity'] >= min_threshold:
+            chunks.append(hits[0])
         return chunks
     
-    def _retrieve_memory(self, query: str, top_k: int) -> List[Dict[str, Any]]:
-        """Retrieve relevant chunks from memory"""
-        query_embedding = self._generate_embeddings([query])[0].reshape(1, -1)
-        
-        similarities = cosine_similarity(query_embedding, self.in_memory_embeddings)[0]
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        
-        chunks = []
-        threshold = self.hyperparameters['similarity_threshold']
+    def _retrieve_milvus(self, ctx: RAGAnalysisContext, query_embeddings: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        """Retrieve relevant chunks for several queries with one Milvus search (nq = len(queries))"""
+        results = self.milvus_store.search(
+            ctx.company_key, ctx.vector_signature, query_embeddings.tolist(), top_k, with_embeddings=True
+        )
+        threshold = ctx.hyperparameters['similarity_threshold']
+        return [self._apply_similarity_threshold(hits, threshold) for hits in results]
+    
+    def _retrieve_memory(self, ctx: RAGAnalysisContext, query_embeddings: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        """Retrieve relevant chunks for several queries from the in-memory index"""
+        threshold = ctx.hyperparameters['similarity_threshold']
         min_threshold = 0.05  # Absolute minimum to avoid completely irrelevant chunks
         
-        for idx in top_indices:
-            similarity = float(similarities[idx])
-            # Use threshold, but if we have very few chunks, be more lenient
-            # Always include top result if it's above minimum threshold
-            if similarity >= threshold or (len(chunks) == 0 and similarity >= min_threshold):
-                chunk = self.in_memory_chunks[idx]
-                chunks.append({
-                    'text': chunk['text'],
-                    'title': chunk['title'],
-                    'similarity': similarity
-                })
-        
-        # If we still have no chunks but have some with reasonable similarity, include at least the top one
-        if not chunks and len(top_indices) > 0:
-            top_similarity = float(similarities[top_indices[0]])
-            if top_similarity >= min_threshold:
-                chunk = self.in_memory_chunks[top_indices[0]]
-                chunks.append({
-                    'text': chunk['text'],
-                    'title': chunk['title'],
-                    'similarity': top_similarity
-                })
-        
-        return chunks
+        results = []
+        for indices, scores in ctx.in_memory_index.search(query_embeddings, top_k, min_score=min_threshold):
+            # Keep hits above the threshold, or at least the top one (already above the minimum)
+            keep = scores >= threshold
+            if len(keep) and not keep.any():
+                keep[0] = True
+            results.append([
+                {
+                    **ctx.in_memory_chunks[idx],
+                    'similarity': float(score),
+                    'embedding': ctx.in_memory_index.vectors(idx)
+                }
+                for idx, score in zip(indices[keep], scores[keep])
+            ])
+        return results
     
-    async def _call_llm(self, prompt: str, temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> Optional[str]:
-        """Call OpenAI API for LLM inference"""
+    async def _call_llm(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        ctx: Optional[RAGAnalysisContext] = None,
+        bypass_cache: bool = False
+    ) -> Optional[str]:
+        """Call OpenAI API for LLM inference (uses the loop's shared session unless one is provided; responses are cached)"""
         if not self.openai_api_key:
             logger.error("OpenAI API key not configured")
             return None
         
-        temp = temperature if temperature is not None else self.hyperparameters['temperature']
-        max_tok = max_tokens if max_tokens is not None else self.hyperparameters['max_tokens']
+        hyperparameters = ctx.hyperparameters if ctx is not None else self.hyperparameters
+        temp = temperature if temperature is not None else hyperparameters['temperature']
+        max_tok = max_tokens if max_tokens is not None else hyperparameters['max_tokens']
         
         # System message for RAG analysis
         system_message = "You are a helpful assistant that extracts structured information from company articles. Always return valid JSON."
         
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        messages.append({"role": "user", "content": prompt})
+        
+        # Identical requests (e.g. a Celery retry re-running every category) are served from the cache
+        llm_cache = get_llm_cache()
+        cache_key = None
+        if llm_cache.is_cacheable(temp, bypass=bypass_cache):
+            cache_key = make_llm_cache_key("gpt-4o", system_message, prompt, temp, max_tok)
+            cached_response = await llm_cache.get(cache_key)
+            if cached_response is not None:
+                logger.debug("🔁 LLM response served from cache")
+                if ctx is not None:
+                    ctx.llm_usage['cached_calls'] += 1
+                return cached_response
+        
+        usage = ctx.llm_usage if ctx is not None else None
         try:
-            async with aiohttp.ClientSession() as session:
-                messages = []
-                if system_message:
-                    messages.append({"role": "system", "content": system_message})
-                messages.append({"role": "user", "content": prompt})
-                
-                async with session.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.openai_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4o",
-                        "messages": messages,
-                        "temperature": temp,
-                        "max_tokens": max_tok
-                    },
-                    timeout=aiohttp.ClientTimeout(total=120)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        generated_text = data['choices'][0]['message']['content'].strip()
-                        logger.debug(f"✅ OpenAI generated {len(generated_text)} characters")
-                        return generated_text
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"OpenAI API error: {response.status} - {error_text}")
-                        return None
+            response = await self._post_chat_completion(session or self._openai_session(), messages, temp, max_tok, usage=usage)
         except Exception as e:
             logger.error(f"Error calling OpenAI: {e}")
             return None
+        
+        if cache_key is not None and response:
+            await llm_cache.set(cache_key, response)
+        return response
+    
+    def _openai_session(self) -> aiohttp.ClientSession:
+        """The running loop's shared OpenAI session (its connections are kept alive across analyses)"""
+        # In-flight calls are bounded per analysis by max_concurrent_categories, not by the connector
+        return loop_session("openai", lambda: aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=100)))
+    
+    async def _post_chat_completion(
+        self,
+        session: aiohttp.ClientSession,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        usage: Optional[Dict[str, int]] = None
+    ) -> Optional[str]:
+        """POST a chat completion request and return the generated text (token usage is added to `usage`)"""
+        async with session.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "gpt-4o",
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens
+            },
+            timeout=aiohttp.ClientTimeout(total=120)
+        ) as response:
+            if response.status == 200:
+                data = await response.json()
+                generated_text = data['choices'][0]['message']['content'].strip()
+                if usage is not None:
+                    usage['calls'] += 1
+                    usage['prompt_tokens'] += data.get('usage', {}).get('prompt_tokens', 0)
+                    usage['completion_tokens'] += data.get('usage', {}).get('completion_tokens', 0)
+                logger.debug(f"✅ OpenAI generated {len(generated_text)} characters")
+                return generated_text
+            else:
+                error_text = await response.text()
+                logger.error(f"OpenAI API error: {response.status} - {error_text}")
+                return None
     
     def _parse_json_response(self, response: str) -> Optional[Dict[str, Any]]:
         """Robustly parse JSON from LLM response"""
@@ -588,76 +671,193 @@ class RAGAnalysisService:
         logger.error(f"Failed to parse JSON from response: {response[:200]}...")
         return None
     
-    def extract_category(
-        self,
-        category_name: str,
-        query: str,
-        prompt_template: str,
-        company_name: str,
-        sme_objective: str = ""
-    ) -> Dict[str, Any]:
-        """Extract a specific category using RAG"""
-        logger.info(f"📊 Extracting: {category_name}")
-        
-        # Retrieve relevant chunks
-        top_k = self.hyperparameters['top_k']
+    def _fail_over_to_memory(self, ctx: RAGAnalysisContext) -> bool:
+        """
+        Move an analysis off Milvus for its remaining retrievals. Uses the standby in-memory
+        index when this run embedded the chunks; for reused Milvus vectors the index is
+        built from the embedding store (no re-encoding when it is warm).
+        """
+        with ctx.failover_lock:
+            if ctx.use_milvus:
+                ctx.disable_milvus()
+                ctx.milvus_failed_over = True
+            if not ctx.has_memory_vectors() and ctx.failover_chunks:
+                chunks = ctx.failover_chunks
+                embeddings = self._embed_chunks(ctx, [c['text'] for c in chunks])
+                self._store_vectors_memory(ctx, chunks, embeddings)
+                ctx.failover_chunks = []
+            return ctx.has_memory_vectors()
+    
+    def _retrieve_candidates(self, ctx: RAGAnalysisContext, query_embeddings: np.ndarray) -> List[List[Dict[str, Any]]]:
+        """Retrieve the candidate pool (with embeddings) for several queries at once (Milvus with in-memory fallback)"""
+        top_k = max(ctx.hyperparameters['top_k'], ctx.hyperparameters['mmr_fetch_k'])
         
-        if self.milvus_available and self.collection:
+        if ctx.use_milvus and ctx.milvus_ready:
             try:
-                chunks = self._retrieve_milvus(query, top_k)
-                # If Milvus retrieval returns empty and we have in-memory fallback, use it
-                if not chunks and hasattr(self, 'in_memory_chunks') and self.in_memory_chunks:
-                    logger.info("ℹ️ Milvus retrieval returned no results, using in-memory fallback")
-                    chunks = self._retrieve_memory(query, top_k)
+                results = self._retrieve_milvus(ctx, query_embeddings, top_k)
             except (MilvusException, Exception) as exc:
                 logger.warning(f"⚠️ Milvus retrieval failed: {exc}. Using in-memory fallback.")
-                chunks = self._retrieve_memory(query, top_k) if hasattr(self, 'in_memory_chunks') and self.in_memory_chunks else []
-        else:
-            chunks = self._retrieve_memory(query, top_k)
-        
-        if not chunks:
-            logger.warning(f"No relevant chunks found for {category_name}")
-            return {
-                'category': category_name,
-                'data': [],
-                'confidence': 0.0,
-                'chunks_retrieved': 0
-            }
-        
-        # Build context from chunks
+                if self._fail_over_to_memory(ctx):
+                    return self._retrieve_memory(ctx, query_embeddings, top_k)
+                return [[] for _ in query_embeddings]
+            
+            # If Milvus retrieval returns empty for some queries and we have in-memory fallback, use it
+            empty_rows = [i for i, chunks in enumerate(results) if not chunks]
+            if empty_rows and ctx.has_memory_vectors():
+                logger.info("ℹ️ Milvus retrieval returned no results, using in-memory fallback")
+                fallback = self._retrieve_memory(ctx, query_embeddings[empty_rows], top_k)
+                for i, chunks in zip(empty_rows, fallback):
+                    results[i] = chunks
+            return results
+        
+        return self._retrieve_memory(ctx, query_embeddings, top_k)
+    
+    def _select_context(
+        self,
+        ctx: RAGAnalysisContext,
+        candidates: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Pick the chunks for one category prompt: MMR over the candidates within the token budget"""
+        embeddings = None
+        if candidates and all(hit.get('embedding') is not None for hit in candidates):
+            embeddings = normalize_rows(np.vstack([np.asarray(hit['embedding'], dtype=np.float32) for hit in candidates]))
+        
+        selected, stats = select_context_chunks(
+            candidates,
+            embeddings,
+            token_budget=ctx.hyperparameters['context_token_budget'],
+            max_chunks=ctx.hyperparameters['top_k'],
+            mmr_lambda=ctx.hyperparameters['mmr_lambda']
+        )
+        # Vectors were only needed for the selection
+        return [{k: v for k, v in chunk.items() if k != 'embedding'} for chunk in selected], stats
+    
+    def _retrieve_queries(
+        self,
+        ctx: RAGAnalysisContext,
+        queries: List[str]
+    ) -> Tuple[List[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """Retrieve and select the prompt chunks for several queries; returns chunks and context stats per query"""
+        if not queries:
+            return [], []
+        
+        if not (ctx.use_milvus and ctx.milvus_ready) and not ctx.has_memory_vectors():
+            return [[] for _ in queries], [self._select_context(ctx, [])[1] for _ in queries]
+        
+        query_embeddings = self._embed_queries(queries)
+        selections = [self._select_context(ctx, hits) for hits in self._retrieve_candidates(ctx, query_embeddings)]
+        return [chunks for chunks, _ in selections], [stats for _, stats in selections]
+    
+    def _retrieve_category_chunks(self, ctx: RAGAnalysisContext, query: str) -> List[Dict[str, Any]]:
+        """Retrieve the prompt chunks for a single category query"""
+        return self._retrieve_queries(ctx, [query])[0][0]
+    
+    def _build_category_prompt(
+        self,
+        chunks: List[Dict[str, Any]],
+        prompt_template: str,
+        company_name: str,
+        sme_objective: str
+    ) -> str:
+        """Build the LLM prompt for a category from its retrieved chunks"""
         context = "\n\n".join([
-            f"[Article: {chunk['title']}]\n{chunk['text']}"
+            format_context_chunk(chunk)
             for chunk in chunks[:5]
         ])
         
-        # Build prompt
-        prompt = prompt_template.format(
+        return prompt_template.format(
             company_name=company_name,
             sme_objective=sme_objective,
             context=context
         )
+    
+    def _run_coroutine_sync(self, coro, timeout: float = 180):
+        """Run a coroutine from sync code, even when the calling thread already runs an event loop"""
+        # On this thread's long-lived loop, or a persistent runner thread's loop if one is running here
+        # (either way the loop, and its HTTP sessions, outlive the call)
+        return run_coroutine_sync(coro, timeout=timeout)
+    
+    def extract_category(
+        self,
+        category_name: str,
+        query: str,
+        prompt_template: str,
+        company_name: str,
+        sme_objective: str = "",
+        *,
+        ctx: RAGAnalysisContext
+    ) -> Dict[str, Any]:
+        """Extract a specific category using RAG over the vectors stored in `ctx`"""
+        return self._run_coroutine_sync(
+            self.extract_category_async(
+                category_name=category_name,
+                query=query,
+                prompt_template=prompt_template,
+                company_name=company_name,
+                sme_objective=sme_objective,
+                ctx=ctx
+            )
+        )
+    
+    async def extract_category_async(
+        self,
+        category_name: str,
+        query: str,
+        prompt_template: str,
+        company_name: str,
+        sme_objective: str = "",
+        session: Optional[aiohttp.ClientSession] = None,
+        *,
+        ctx: RAGAnalysisContext
+    ) -> Dict[str, Any]:
+        """Extract a specific category using RAG on the caller's event loop"""
+        # Retrieve relevant chunks (embedding the query is CPU-bound, keep it off the loop)
+        chunks = await asyncio.to_thread(self._retrieve_category_chunks, ctx, query)
+        return await self._generate_category_result(
+            ctx, category_name, chunks, prompt_template, company_name, sme_objective, session=session
+        )
+    
+    async def _generate_category_result(
+        self,
+        ctx: RAGAnalysisContext,
+        category_name: str,
+        chunks: List[Dict[str, Any]],
+        prompt_template: str,
+        company_name: str,
+        sme_objective: str,
+        session: Optional[aiohttp.ClientSession] = None,
+        category_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run the LLM over already-retrieved chunks and parse the category result"""
+        logger.info(f"📊 Extracting: {category_name}")
         
-        # Call LLM (async, but we're in a sync context)
-        # Since extract_category is called from analyze_comprehensive which is sync,
-        # we need to run the async call in an event loop
-        import asyncio
-        try:
-            # Try to get the current event loop
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If loop is running (e.g., in async context), we can't use run_until_complete
-                # Use a thread pool to run the async function
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(lambda: asyncio.run(self._call_llm(prompt)))
-                    response = future.result(timeout=180)  # 3 minute timeout
-            else:
-                # No running loop, safe to use run_until_complete
-                response = loop.run_until_complete(self._call_llm(prompt))
-        except RuntimeError:
-            # No event loop exists, create one
-            response = asyncio.run(self._call_llm(prompt))
+        if not chunks:
+            logger.warning(f"No relevant chunks found for {category_name}")
+            return self._empty_category_result(category_name)
+        
+        prompt = self._build_category_prompt(chunks, prompt_template, company_name, sme_objective)
+        if category_key:
+            ctx.context_stats.setdefault(category_key, {})['prompt_tokens'] = count_tokens(prompt)
+        response = await self._call_llm(prompt, session=session, ctx=ctx)
         
+        return self._finalize_category_result(category_name, chunks, response)
+    
+    def _empty_category_result(self, category_name: str) -> Dict[str, Any]:
+        """Result for a category with no relevant chunks"""
+        return {
+            'category': category_name,
+            'data': [],
+            'confidence': 0.0,
+            'chunks_retrieved': 0
+        }
+    
+    def _finalize_category_result(
+        self,
+        category_name: str,
+        chunks: List[Dict[str, Any]],
+        response: Optional[str]
+    ) -> Dict[str, Any]:
+        """Parse the LLM response for a category into its result structure"""
         if not response:
             logger.error(f"LLM returned empty response for {category_name}")
             return {
@@ -670,7 +870,15 @@ class RAGAnalysisService:
         
         # Parse JSON
         parsed = self._parse_json_response(response)
-        
+        return self._build_category_result(category_name, chunks, parsed)
+    
+    def _build_category_result(
+        self,
+        category_name: str,
+        chunks: List[Dict[str, Any]],
+        parsed: Optional[Any]
+    ) -> Dict[str, Any]:
+        """Turn the parsed JSON for a category into its result structure"""
         if not parsed:
             logger.error(f"Failed to parse LLM response for {category_name}")
             return {
@@ -724,12 +932,202 @@ class RAGAnalysisService:
             'chunks_retrieved': len(chunks)
         }
     
+    @staticmethod
+    def _chunk_id(chunk: Dict[str, Any]) -> str:
+        """Stable id of a chunk (content hash), comparable across runs and article sets"""
+        return hashlib.sha1(chunk['text'].encode('utf-8', errors='ignore')).hexdigest()[:16]
+    
+    def _category_retrieval_state(
+        self,
+        ctx: RAGAnalysisContext,
+        cat_config: Dict[str, str],
+        chunks: List[Dict[str, Any]],
+        company_name: str,
+        sme_objective: str
+    ) -> Dict[str, Any]:
+        """What a category's LLM result depends on: its retrieved chunk ids and its prompt inputs"""
+        prompt_fingerprint = hashlib.sha256(json.dumps([
+            cat_config['query'],
+            cat_config['prompt'],
+            company_name.strip().lower(),
+            (sme_objective or '').strip().lower(),
+            "openai-gpt-4o",
+            ctx.hyperparameters['temperature'],
+            ctx.hyperparameters['max_tokens'],
+        ]).encode('utf-8')).hexdigest()
+        return {
+            'chunk_ids': [self._chunk_id(chunk) for chunk in chunks],
+            'prompt_fingerprint': prompt_fingerprint,
+        }
+    
+    def _reuse_unchanged_categories(
+        self,
+        ctx: RAGAnalysisContext,
+        categories: Dict[str, Dict[str, str]],
+        retrieved: Dict[str, List[Dict[str, Any]]],
+        previous_analysis: Dict[str, Any]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Stored results of the categories whose top-k chunk ids and prompt inputs are unchanged"""
+        previous_state = (previous_analysis.get('retrieval_state') or {}).get('categories') or {}
+        previous_results = previous_analysis.get('results') or {}
+        
+        reused = {}
+        for cat_key in categories:
+            state = ctx.retrieval_state[cat_key]
+            old_state = previous_state.get(cat_key)
+            old_data = previous_results.get(cat_key)
+            if not state['chunk_ids'] or not old_state or old_data in (None, '', {}, []):
+                continue
+            if old_state.get('chunk_ids') != state['chunk_ids'] or old_state.get('prompt_fingerprint') != state['prompt_fingerprint']:
+                continue
+            
+            result = self._build_category_result(categories[cat_key]['name'], retrieved[cat_key], old_data)
+            result['reused'] = True
+            reused[cat_key] = result
+        return reused
+    
+    def _group_categories_for_packing(
+        self,
+        ctx: RAGAnalysisContext,
+        categories: Dict[str, Dict[str, str]],
+        retrieved: Dict[str, List[Dict[str, Any]]]
+    ) -> List[List[str]]:
+        """Group categories whose retrieved chunks overlap (Jaccard) enough to share one packed prompt"""
+        threshold = ctx.hyperparameters['pack_overlap_threshold']
+        max_group_size = max(1, settings.rag_pack_max_categories)
+        groups: List[Tuple[List[str], set]] = []
+        
+        for cat_key in categories:
+            # Same content-hash ids as the retrieval state (cheaper to hash and compare than whole texts)
+            chunk_ids = {self._chunk_id(chunk) for chunk in retrieved[cat_key]}
+            best_group = None
+            best_overlap = threshold
+            if chunk_ids:
+                for members, group_ids in groups:
+                    if not group_ids or len(members) >= max_group_size:
+                        continue
+                    overlap = len(chunk_ids & group_ids) / len(chunk_ids | group_ids)
+                    if overlap >= best_overlap:
+                        best_group, best_overlap = (members, group_ids), overlap
+            
+            if best_group is None:
+                groups.append(([cat_key], set(chunk_ids)))
+            else:
+                best_group[0].append(cat_key)
+                best_group[1].update(chunk_ids)
+        
+        return [members for members, _ in groups]
+    
+    def _build_packed_prompt(
+        self,
+        categories: Dict[str, Dict[str, str]],
+        group: List[str],
+        retrieved: Dict[str, List[Dict[str, Any]]],
+        company_name: str,
+        sme_objective: str
+    ) -> str:
+        """One prompt over the union of the group's chunks, asking for every category's JSON under its key"""
+        union: Dict[str, Dict[str, Any]] = {}
+        for cat_key in group:
+            for chunk in retrieved[cat_key][:5]:
+                if chunk['text'] not in union or chunk['similarity'] > union[chunk['text']]['similarity']:
+                    union[chunk['text']] = chunk
+        context_chunks = sorted(union.values(), key=lambda c: c['similarity'], reverse=True)
+        context = "\n\n".join([
+            format_context_chunk(chunk)
+            for chunk in context_chunks
+        ])
+        
+        # Reuse each category's own instructions and schema (everything after its CONTEXT block)
+        tasks = []
+        for cat_key in group:
+            instructions = categories[cat_key]['prompt'].split('{context}', 1)[-1].strip()
+            if instructions.endswith('JSON:'):
+                instructions = instructions[:-len('JSON:')].rstrip()
+            instructions = instructions.format(company_name=company_name, sme_objective=sme_objective)
+            tasks.append(f'TASK "{cat_key}" ({categories[cat_key]["name"]}):\n{instructions}')
+        
+        keys = ", ".join(f'"{cat_key}"' for cat_key in group)
+        objective = f"SME OBJECTIVE: {sme_objective}\n\n" if sme_objective else ""
+        tasks_text = "\n\n".join(tasks)
+        return f"""Analyze these articles about {company_name} and complete {len(group)} extraction tasks in one pass.
+
+{objective}CONTEXT:
+{context}
+
+{tasks_text}
+
+Return ONLY one valid JSON object with exactly these top-level keys: {keys}. The value of each key is the JSON object its task asks for. No explanations.
+
+JSON:"""
+    
+    async def _generate_packed_results(
+        self,
+        ctx: RAGAnalysisContext,
+        categories: Dict[str, Dict[str, str]],
+        group: List[str],
+        retrieved: Dict[str, List[Dict[str, Any]]],
+        company_name: str,
+        sme_objective: str,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Extract a group of categories with one LLM call and split the answer per category"""
+        names = ", ".join(categories[cat_key]['name'] for cat_key in group)
+        logger.info(f"📦 Extracting (packed): {names}")
+        
+        prompt = self._build_packed_prompt(categories, group, retrieved, company_name, sme_objective)
+        prompt_tokens = count_tokens(prompt)
+        for cat_key in group:
+            # One prompt serves the whole group
+            ctx.context_stats.setdefault(cat_key, {}).update({'prompt_tokens': prompt_tokens, 'packed_with': len(group)})
+        response = await self._call_llm(
+            prompt,
+            max_tokens=ctx.hyperparameters['max_tokens'] * len(group),
+            session=session,
+            ctx=ctx
+        )
+        parsed = self._parse_json_response(response) if response else None
+        
+        if not isinstance(parsed, dict):
+            parsed = {}
+        results = {
+            cat_key: self._build_category_result(categories[cat_key]['name'], retrieved[cat_key], parsed[cat_key])
+            for cat_key in group
+            if cat_key in parsed
+        }
+        
+        # Don't lose categories the packed answer left out (or all of them, if it did not parse): one call each,
+        # one after another - the caller holds a single max_concurrent_categories slot for the whole group
+        missing = [cat_key for cat_key in group if cat_key not in results]
+        if missing:
+            missing_names = ", ".join(categories[cat_key]['name'] for cat_key in missing)
+            logger.warning(f"⚠️ Packed extraction returned nothing for {missing_names}; extracting them separately")
+            for cat_key in missing:
+                results[cat_key] = await self._generate_category_result(
+                    ctx,
+                    categories[cat_key]['name'],
+                    retrieved[cat_key],
+                    categories[cat_key]['prompt'],
+                    company_name,
+                    sme_objective,
+                    session=session,
+                    category_key=cat_key
+                )
+        
+        return {cat_key: results[cat_key] for cat_key in group}
+    
     def analyze_comprehensive(
         self,
         articles: List[Dict[str, str]],
         company_name: str,
         sme_objective: str = "",
-        progress_callback: Optional[Callable[[str, int, int], None]] = None
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
+        hyperparameters: Optional[Dict[str, Any]] = None,
+        company_id: Optional[int] = None,
+        previous_analysis: Optional[Dict[str, Any]] = None,
+        precomputed_embeddings: Optional[Dict[str, np.ndarray]] = None,
+        completed_categories: Optional[Dict[str, Dict[str, Any]]] = None,
+        category_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
         """
         Perform comprehensive RAG analysis on company articles
@@ -750,213 +1148,89 @@ class RAGAnalysisService:
             articles: List of article dictionaries with 'title' and 'content'
             company_name: Name of the company being analyzed
             sme_objective: SME's objectives and capabilities
-            progress_callback: Optional callback function(category_name, category_num, total_categories) for progress updates
+            progress_callback: Optional callback function(category_name, categories_completed, total_categories),
+                called as each category finishes (completion order, not category order)
+            hyperparameters: Optional per-analysis overrides (e.g. temperature, top_k); the
+                service defaults are never mutated
+            company_id: Database id of the company; keys its vectors in the shared Milvus
+                collection (falls back to the company name)
+            previous_analysis: Stored result of the last analysis ({'results': {category: data},
+                'retrieval_state': ...}); enables incremental mode, where categories whose
+                retrieved chunks are unchanged reuse the stored result instead of calling the LLM
+            precomputed_embeddings: Chunk text -> embedding, as returned by `embed_articles` (the
+                pipeline's embed stage); chunks found there are not encoded again
+            completed_categories: Category results finished by an earlier attempt of the same job
+                (pipeline checkpoint); they are kept as they are instead of being extracted again
+            category_callback: Optional callback function(category_key, result), called with each
+                successfully extracted category so the caller can checkpoint it
+        """
+        return self._run_coroutine_sync(
+            self.analyze_comprehensive_async(
+                articles=articles,
+                company_name=company_name,
+                sme_objective=sme_objective,
+                progress_callback=progress_callback,
+                hyperparameters=hyperparameters,
+                company_id=company_id,
+                previous_analysis=previous_analysis,
+                precomputed_embeddings=precomputed_embeddings,
+                completed_categories=completed_categories,
+                category_callback=category_callback
+            ),
+            timeout=None
+        )
+    
+    async def analyze_comprehensive_async(
+        self,
+        articles: List[Dict[str, str]],
+        company_name: str,
+        sme_objective: str = "",
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
+        hyperparameters: Optional[Dict[str, Any]] = None,
+        company_id: Optional[int] = None,
+        previous_analysis: Optional[Dict[str, Any]] = None,
+        precomputed_embeddings: Optional[Dict[str, np.ndarray]] = None,
+        completed_categories: Optional[Dict[str, Dict[str, Any]]] = None,
+        category_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of `analyze_comprehensive` that runs on the caller's event loop.
+        
+        Chunking, embedding and retrieval are offloaded to worker threads so the loop
+        stays free to serve other requests while the category LLM calls are in flight.
+        All retrieval state lives in a per-call RAGAnalysisContext, so concurrent analyses
+        on one service instance are isolated from each other.
         """
         start_time = datetime.now()
+        ctx = self.create_context(hyperparameters)
+        ctx.company_key = make_company_key(company_name, company_id)
+        ctx.precomputed_embeddings = precomputed_embeddings or {}
         logger.info(f"🎯 Starting comprehensive RAG analysis for: {company_name}")
         logger.info(f"📚 Processing {len(articles)} articles")
         
         articles_signature = self._generate_articles_signature(articles)
-        cache_key = self._make_cache_key(company_name, sme_objective, articles_signature)
+        cache_key = self._make_cache_key(ctx, company_name, sme_objective, articles_signature)
         cached_result = self._get_cached_analysis(cache_key)
         if cached_result:
             return cached_result
         
-        vector_signature = self._make_vector_signature(articles_signature)
-        vector_cache_entry = self._get_vector_cache_entry(vector_signature)
-        vector_store_reused = False
-        vector_storage_used = 'milvus' if self.milvus_available else 'in-memory'
-        chunk_count = 0
-        collection_name = None
-        
-        # Wrap the entire vector cache lookup in a try-except to catch any Milvus errors
-        try:
-            if vector_cache_entry:
-                if self.milvus_available and vector_cache_entry.get('vector_storage') == 'milvus':
-                    try:
-                        collection_name = vector_cache_entry.get('collection_name')
-                        if collection_name:
-                            # Check if collection exists with proper error handling
-                            # If ANY error occurs, disable Milvus and use in-memory storage
-                            collection_exists = False
-                            try:
-                                # Suppress pymilvus error logging temporarily
-                                import logging
-                                milvus_logger = logging.getLogger('pymilvus')
-                                original_level = milvus_logger.level
-                                milvus_logger.setLevel(logging.CRITICAL)
-                                try:
-                                    # Wrap has_collection in the most defensive way possible
-                                    try:
-                                        collection_exists = utility.has_collection(collection_name)
-                                    except BaseException as inner_exc:
-                                        # Catch absolutely everything, including KeyboardInterrupt, SystemExit, etc.
-                                        logger.error(f"❌ CRITICAL: has_collection raised {type(inner_exc).__name__}: {inner_exc}")
-                                        raise  # Re-raise to be caught by outer handler
-                                finally:
-                                    milvus_logger.setLevel(original_level)
-                            except BaseException as check_exc:
-                                # Catch ANY exception, not just MilvusException
-                                # This includes MilvusException from pymilvus
-                                logger.warning(f"⚠️ Error checking Milvus collection existence: {type(check_exc).__name__}: {check_exc}")
-                                collection_exists = False
-                                # Disable Milvus immediately to prevent further errors
-                                self.milvus_available = False
-                                self.collection = None
-                                vector_cache_entry = None
-                                logger.info("ℹ️ Milvus disabled due to collection check error, will use in-memory storage")
-                                # Don't re-raise - just continue without Milvus
-                            
-                            if collection_exists:
-                                try:
-                                    self.collection = Collection(name=collection_name)
-                                    self.collection.load()
-                                    chunk_count = vector_cache_entry.get('chunk_count', 0)
-                                    vector_storage_used = 'milvus'
-                                    vector_store_reused = True
-                                    logger.info(f"♻️ Reusing Milvus collection '{collection_name}' ({chunk_count} chunks)")
-                                except (MilvusException, Exception) as load_exc:
-                                    logger.warning(f"⚠️ Failed to load Milvus collection '{collection_name}': {load_exc}. Regenerating vectors.")
-                                    vector_cache_entry = None
-                                    self.collection = None
-                                    # Disable Milvus for this analysis session to avoid repeated failures
-                                    self.milvus_available = False
-                                    logger.info("ℹ️ Milvus disabled for this analysis, using in-memory storage")
-                            else:
-                                vector_cache_entry = None
-                                logger.info(f"ℹ️ Milvus collection '{collection_name}' not found; regenerating vectors.")
-                        else:
-                            # No collection_name in cache entry
-                            vector_cache_entry = None
-                            logger.info("ℹ️ No collection name in cache; regenerating vectors.")
-                    except (MilvusException, Exception) as exc:
-                        vector_cache_entry = None
-                        self.collection = None
-                        # Disable Milvus for this analysis session
-                        self.milvus_available = False
-                        logger.warning(f"⚠️ Failed to reuse Milvus collection: {exc}. Regenerating vectors with in-memory storage.")
-            elif not self.milvus_available and vector_cache_entry.get('vector_storage') == 'memory':
-                try:
-                    self.in_memory_chunks = copy.deepcopy(vector_cache_entry['chunks'])
-                    self.in_memory_embeddings = vector_cache_entry['embeddings'].copy()
-                    chunk_count = len(self.in_memory_chunks)
-                    vector_storage_used = 'in-memory'
-                    vector_store_reused = True
-                    logger.info(f"♻️ Reusing in-memory vectors ({chunk_count} chunks)")
-                except Exception as exc:
-                    logger.warning(f"⚠️ Failed to load in-memory vectors: {exc}. Regenerating vectors.")
-                    vector_cache_entry = None
-        except BaseException as outer_exc:
-            # Catch ANY exception from the entire vector cache lookup (including SystemExit, KeyboardInterrupt, etc.)
-            # This is a safety net to ensure we don't crash if anything goes wrong
-            logger.error(f"❌ Error during vector cache lookup: {type(outer_exc).__name__}: {outer_exc}")
-            logger.error(f"❌ Exception details: {repr(outer_exc)}")
-            # Disable Milvus and clear cache entry
-            self.milvus_available = False
-            self.collection = None
-            vector_cache_entry = None
-            logger.info("ℹ️ Milvus disabled due to vector cache lookup error, will use in-memory storage")
-            # Continue without Milvus - don't re-raise
-            # Only re-raise if it's a critical exception that shouldn't be caught
-            if isinstance(outer_exc, (SystemExit, KeyboardInterrupt)):
-                raise
-        
-        all_chunks: List[Dict[str, Any]] = []
-        if not vector_store_reused:
-            # Step 1: Chunk all articles
-            for article in articles:
-                title = article.get('title', '')[:400]  # Truncate title to 400 chars
-                content = article.get('content', '')
-                text = f"{title} {content}"
-                
-                chunks = self._chunk_text(text)
-                for chunk in chunks:
-                    all_chunks.append({
-                        'text': chunk[:1800],  # Ensure max 1800 chars
-                        'title': title
-                    })
-            
-            chunk_count = len(all_chunks)
-            logger.info(f"✂️ Created {chunk_count} chunks")
-            
-            # Step 2: Generate embeddings
-            logger.info("🔢 Generating embeddings...")
-            chunk_texts = [c['text'] for c in all_chunks]
-            embeddings = self._generate_embeddings(chunk_texts)
-            
-            for i, chunk in enumerate(all_chunks):
-                chunk['embedding'] = embeddings[i]
-            
-            logger.info(f"✅ Generated {len(embeddings)} embeddings")
-            
-            # Step 3: Store vectors
-            if self.milvus_available:
-                collection_name = self._get_collection_name(company_name, articles_signature)
-                try:
-                    self._store_vectors_milvus(all_chunks, collection_name)
-                    vector_storage_used = 'milvus'
-                    self._update_vector_cache(vector_signature, {
-                        'vector_storage': 'milvus',
-                        'collection_name': collection_name,
-                        'chunk_count': chunk_count,
-                        'stored_at': datetime.now().isoformat(),
-                    })
-                except (MilvusException, Exception) as exc:
-                    logger.warning(f"⚠️ Failed to store vectors in Milvus: {exc}. Falling back to in-memory storage.")
-                    # Clear any partial Milvus state and disable Milvus for this session
-                    self.collection = None
-                    self.milvus_available = False
-                    # Fall back to in-memory storage
-                    self._store_vectors_memory(all_chunks)
-                    vector_storage_used = 'in-memory'
-                    self._update_vector_cache(vector_signature, {
-                        'vector_storage': 'memory',
-                        'chunks': copy.deepcopy(self.in_memory_chunks),
-                        'embeddings': self.in_memory_embeddings.copy(),
-                        'chunk_count': chunk_count,
-                        'stored_at': datetime.now().isoformat(),
-                    })
-            else:
-                self._store_vectors_memory(all_chunks)
-                vector_storage_used = 'in-memory'
-                if self.in_memory_embeddings is not None:
-                    self._update_vector_cache(vector_signature, {
-                        'vector_storage': 'memory',
-                        'chunks': copy.deepcopy(self.in_memory_chunks),
-                        'embeddings': self.in_memory_embeddings.copy(),
-                        'chunk_count': chunk_count,
-                        'stored_at': datetime.now().isoformat(),
-                    })
-        else:
-            logger.info("✅ Vector store reused successfully; skipping chunking and embedding regeneration.")
+        chunk_count, vector_storage_used, vector_store_reused = await asyncio.to_thread(
+            self._prepare_vector_store, ctx, articles, company_name, articles_signature
+        )
         
-        # Step 4: Extract all 10 categories sequentially
-        # Note: OpenAI API calls are made sequentially for simplicity and predictability.
+        # Step 4: Extract all 10 categories concurrently (bounded by max_concurrent_categories)
         categories = self._get_category_configs(company_name, sme_objective)
         
-        results = {}
-        total_categories = len(categories)
-        category_num = 0
-        
-        for cat_key, cat_config in categories.items():
-            category_num += 1
-            category_name = cat_config['name']
-            
-            # Call progress callback if provided
-            if progress_callback:
-                try:
-                    progress_callback(category_name, category_num, total_categories)
-                except Exception as e:
-                    logger.warning(f"Progress callback failed: {e}")
-            
-            result = self.extract_category(
-                category_name=category_name,
-                query=cat_config['query'],
-                prompt_template=cat_config['prompt'],
-                company_name=company_name,
-                sme_objective=sme_objective
-            )
-            results[cat_key] = result
+        results, category_latencies = await self._extract_categories_concurrently(
+            ctx,
+            categories=categories,
+            company_name=company_name,
+            sme_objective=sme_objective,
+            progress_callback=progress_callback,
+            previous_analysis=previous_analysis,
+            completed_categories=completed_categories,
+            category_callback=category_callback
+        )
         
         # Calculate overall metrics
         end_time = datetime.now()
@@ -986,11 +1260,36 @@ class RAGAnalysisService:
                 'average_confidence': float(avg_confidence),
                 'duration_seconds': duration,
                 'timestamp': datetime.now().isoformat(),
-            'hyperparameters': dict(self.hyperparameters),
+            'hyperparameters': dict(ctx.hyperparameters),
             'vector_storage': vector_storage_used,
             'vector_store_reused': vector_store_reused,
+            'vector_backend': ctx.vector_plan.as_dict() if ctx.vector_plan else None,
+            'milvus': {
+                'failed_over_to_memory': ctx.milvus_failed_over,
+                'circuit': self.milvus_connection.status() if self.milvus_connection else None,
+            },
             'cache_hit': False,
             'articles_signature': articles_signature,
+            'max_concurrent_categories': self.max_concurrent_categories,
+            'category_latency_seconds': category_latencies,
+            'embedding_cache': ctx.embedding_cache_stats(),
+            'chunking': ctx.chunking_stats,
+            'context': {
+                'token_counter': token_counter_name(),
+                'token_budget': ctx.hyperparameters['context_token_budget'],
+                'categories': ctx.context_stats,
+            },
+            'incremental': {
+                'enabled': previous_analysis is not None,
+                'reused_categories': ctx.reused_categories,
+                'resumed_categories': ctx.resumed_categories,
+            },
+            'retrieval_state': {'categories': ctx.retrieval_state},
+            'llm_usage': {
+                'extraction_mode': ctx.hyperparameters['extraction_mode'],
+                **ctx.llm_usage,
+                'groups': ctx.extraction_groups,
+            },
         }
         
         result_payload = {
@@ -1001,6 +1300,302 @@ class RAGAnalysisService:
         self._update_analysis_cache(cache_key, result_payload, articles_signature)
         return result_payload
     
+    def embed_articles(
+        self,
+        articles: List[Dict[str, str]],
+        hyperparameters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Chunk and embed `articles` ahead of `analyze_comprehensive` (the pipeline's embed stage)
+        
+        Returns {'texts', 'embeddings', 'stats'}; pass dict(zip(texts, embeddings)) to
+        analyze_comprehensive as `precomputed_embeddings`. Embeddings also land in the
+        embedding store, so a later analysis of the same chunks skips encoding either way.
+        """
+        ctx = self.create_context(hyperparameters)
+        started = time.perf_counter()
+        chunks, chunks_before_dedup = self._chunk_articles(ctx, articles)
+        texts = [c['text'] for c in chunks]
+        embeddings = self._embed_chunks(ctx, texts)
+        return {
+            'texts': texts,
+            'embeddings': embeddings,
+            'stats': {
+                'chunks': len(texts),
+                'near_duplicates_removed': chunks_before_dedup - len(texts),
+                'embedding_cache': ctx.embedding_cache_stats(),
+                'seconds': round(time.perf_counter() - started, 3),
+            },
+        }
+    
+    def _chunk_articles(self, ctx: RAGAnalysisContext, articles: List[Dict[str, str]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Chunk every article and drop near-duplicate chunks; returns the chunks and the count before dedup"""
+        all_chunks: List[Dict[str, Any]] = []
+        for article in articles:
+            title = article.get('title', '')[:400]  # Truncate title to 400 chars
+            content = article.get('content', '')
+            text = f"{title}\n\n{content}"  # Title is its own sentence
+            
+            for chunk in self._chunk_text(text, ctx):
+                all_chunks.append({
+                    'text': chunk,
+                    'title': title
+                })
+        
+        # Drop near-duplicate chunks (syndicated / re-posted articles) before embedding
+        chunks_before_dedup = len(all_chunks)
+        duplicates = set(find_near_duplicates([c['text'] for c in all_chunks]))
+        if duplicates:
+            all_chunks = [c for i, c in enumerate(all_chunks) if i not in duplicates]
+        return all_chunks, chunks_before_dedup
+    
+    def _prepare_vector_store(
+        self,
+        ctx: RAGAnalysisContext,
+        articles: List[Dict[str, str]],
+        company_name: str,
+        articles_signature: str
+    ) -> Tuple[int, str, bool]:
+        """
+        Chunk, embed and store the articles in `ctx` (or reuse a cached vector store)
+        
+        Returns (chunk_count, vector_storage_used, vector_store_reused).
+        """
+        vector_signature = self._make_vector_signature(ctx, articles_signature)
+        vector_cache_entry = self._get_vector_cache_entry(vector_signature)
+        ctx.vector_signature = vector_signature
+        
+        # In-process vectors are the cheapest to reuse
+        if vector_cache_entry and vector_cache_entry.get('vector_storage') == 'memory':
+            ctx.in_memory_chunks = vector_cache_entry['chunks']
+            ctx.in_memory_index = vector_cache_entry['index']
+            ctx.vector_plan = vector_cache_entry.get('plan')
+            chunk_count = len(ctx.in_memory_chunks)
+            logger.info(f"♻️ Reusing in-memory vectors ({chunk_count} chunks)")
+            return chunk_count, 'in-memory', True
+        
+        # Step 1: Chunk all articles (cheap, and the chunk count decides the vector backend)
+        chunking_started = time.perf_counter()
+        all_chunks, chunks_before_dedup = self._chunk_articles(ctx, articles)
+        duplicates_removed = chunks_before_dedup - len(all_chunks)
+        chunking_seconds = time.perf_counter() - chunking_started
+        
+        chunk_count = len(all_chunks)
+        logger.info(f"✂️ Created {chunk_count} chunks ({duplicates_removed} near-duplicates dropped)")
+        
+        plan = plan_vector_backend(
+            chunk_count,
+            milvus_available=ctx.use_milvus,
+            persist=settings.rag_persist_vectors,
+            hnsw_min_chunks=settings.rag_memory_index_hnsw_min_chunks,
+            milvus_min_chunks=settings.rag_milvus_min_chunks
+        )
+        ctx.vector_plan = plan
+        logger.info(f"🧭 Vector backend: {plan.backend} ({plan.reason})")
+        
+        if not plan.uses_milvus:
+            ctx.use_milvus = False
+        else:
+            # The shared collection may already hold this article set (stored by an earlier run or another worker)
+            try:
+                stored_chunks = self.milvus_store.count_chunks(ctx.company_key, vector_signature)
+                # Only a complete set is reused: one partly removed by the GC sweep, or left short by an
+                # interrupted upsert, is stored again below (ids are deterministic, so the upsert fills the gaps)
+                if stored_chunks and stored_chunks != chunk_count:
+                    logger.info(
+                        f"🧩 Milvus holds {stored_chunks} of {chunk_count} chunks for {ctx.company_key}; storing the set again"
+                    )
+                elif stored_chunks:
+                    # Restart the TTL of a set that is still in use, or the GC sweep could delete it mid-analysis
+                    try:
+                        self.milvus_store.refresh_chunks(ctx.company_key, vector_signature, stored_chunks)
+                    except (MilvusException, Exception) as exc:
+                        logger.warning(f"⚠️ Could not refresh the TTL of reused Milvus vectors: {exc}")
+                    ctx.milvus_ready = True
+                    # Nothing is embedded in this run; keep the chunks to rebuild from if Milvus fails mid-analysis
+                    ctx.failover_chunks = all_chunks
+                    logger.info(f"♻️ Reusing Milvus vectors for {ctx.company_key} ({stored_chunks} chunks)")
+                    logger.info("✅ Vector store reused successfully; skipping embedding regeneration.")
+                    return stored_chunks, 'milvus', True
+            except (MilvusException, Exception) as exc:
+                logger.warning(f"⚠️ Milvus lookup failed: {exc}. Using in-memory storage for this analysis.")
+                ctx.disable_milvus()
+        
+        # Step 2: Generate embeddings
+        logger.info("🔢 Generating embeddings...")
+        chunk_texts = [c['text'] for c in all_chunks]
+        embedding_started = time.perf_counter()
+        misses_before = ctx.embedding_cache_misses
+        embeddings = self._embed_chunks(ctx, chunk_texts)
+        embedding_seconds = time.perf_counter() - embedding_started
+        
+        logger.info(f"✅ Generated {len(embeddings)} embeddings")
+        
+        # Time saved = dropped duplicates x this run's cost per encoded chunk
+        encoded = ctx.embedding_cache_misses - misses_before
+        per_chunk_seconds = embedding_seconds / encoded if encoded else 0.0
+        ctx.chunking_stats = {
+            'chunks_before_dedup': chunks_before_dedup,
+            'near_duplicates_removed': duplicates_removed,
+            'chunks': chunk_count,
+            'chunking_seconds': round(chunking_seconds, 3),
+            'embedding_seconds': round(embedding_seconds, 3),
+            'embedding_seconds_saved': round(duplicates_removed * per_chunk_seconds, 3),
+        }
+        
+        # Step 3: Store vectors
+        if ctx.use_milvus:
+            try:
+                self._store_vectors_milvus(ctx, all_chunks, embeddings)
+                # Standby copy (compact, this analysis only): a Milvus failure during retrieval
+                # then switches to it without chunking or embedding again
+                self._store_vectors_memory(ctx, all_chunks, embeddings)
+                return chunk_count, 'milvus', False
+            except (MilvusException, Exception) as exc:
+                logger.warning(f"⚠️ Failed to store vectors in Milvus: {exc}. Falling back to in-memory storage.")
+                ctx.disable_milvus()
+        
+        self._store_vectors_memory(ctx, all_chunks, embeddings, approximate=plan.backend == MEMORY_HNSW)
+        self._update_vector_cache(vector_signature, {
+            'vector_storage': 'memory',
+            'chunks': ctx.in_memory_chunks,
+            'index': ctx.in_memory_index,
+            'plan': plan,
+            'chunk_count': chunk_count,
+            'stored_at': datetime.now().isoformat(),
+        })
+        return chunk_count, 'in-memory', False
+    
+    async def _extract_categories_concurrently(
+        self,
+        ctx: RAGAnalysisContext,
+        categories: Dict[str, Dict[str, str]],
+        company_name: str,
+        sme_objective: str,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
+        previous_analysis: Optional[Dict[str, Any]] = None,
+        completed_categories: Optional[Dict[str, Dict[str, Any]]] = None,
+        category_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+        """
+        Extract all categories with at most `max_concurrent_categories` LLM calls in flight.
+        
+        Retrieval for all categories runs first as one batch in a worker thread (CPU-bound), then
+        the OpenAI calls fan out over a single HTTP session on the caller's event loop. In packed
+        extraction mode, categories with overlapping chunks share one call. With a
+        `previous_analysis`, categories whose retrieved chunks and prompt are unchanged reuse the
+        stored result without an LLM call, and `completed_categories` (finished by an earlier
+        attempt of the same job) are kept as they are. Returns the results in category order
+        and the per-category latency (retrieval + LLM) in seconds.
+        """
+        total_categories = len(categories)
+        semaphore = asyncio.Semaphore(self.max_concurrent_categories)
+        
+        def retrieve_all() -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, float]]:
+            # One batched retrieval for every category; its cost is shared evenly in the latencies
+            started = time.perf_counter()
+            chunk_lists, context_stats = self._retrieve_queries(ctx, [cat_config['query'] for cat_config in categories.values()])
+            per_category = (time.perf_counter() - started) / max(total_categories, 1)
+            retrieved = dict(zip(categories.keys(), chunk_lists))
+            ctx.context_stats = dict(zip(categories.keys(), context_stats))
+            retrieval_seconds = {cat_key: per_category for cat_key in categories}
+            return retrieved, retrieval_seconds
+        
+        retrieved, retrieval_seconds = await asyncio.to_thread(retrieve_all)
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        latencies: Dict[str, float] = {}
+        
+        def report_progress(cat_key: str):
+            if progress_callback:
+                try:
+                    progress_callback(categories[cat_key]['name'], len(results), total_categories)
+                except Exception as e:
+                    logger.warning(f"Progress callback failed: {e}")
+        
+        # Incremental mode: unchanged categories keep their stored result
+        ctx.retrieval_state = {
+            cat_key: self._category_retrieval_state(ctx, cat_config, retrieved[cat_key], company_name, sme_objective)
+            for cat_key, cat_config in categories.items()
+        }
+        if previous_analysis:
+            for cat_key, result in self._reuse_unchanged_categories(ctx, categories, retrieved, previous_analysis).items():
+                results[cat_key] = result
+                latencies[cat_key] = round(retrieval_seconds[cat_key], 3)
+                ctx.reused_categories.append(cat_key)
+                report_progress(cat_key)
+            if ctx.reused_categories:
+                logger.info(f"♻️ Reusing {len(ctx.reused_categories)} unchanged categories: {', '.join(ctx.reused_categories)}")
+        
+        # Resumed job: categories an earlier attempt already extracted are not sent to the LLM again
+        for cat_key, result in (completed_categories or {}).items():
+            if cat_key in categories and cat_key not in results:
+                results[cat_key] = result
+                latencies[cat_key] = round(retrieval_seconds[cat_key], 3)
+                ctx.resumed_categories.append(cat_key)
+                report_progress(cat_key)
+        if ctx.resumed_categories:
+            logger.info(f"⏯️ Resuming with {len(ctx.resumed_categories)} completed categories: {', '.join(ctx.resumed_categories)}")
+        pending = {cat_key: cat_config for cat_key, cat_config in categories.items() if cat_key not in results}
+        
+        # Packed mode: categories with overlapping context share one LLM call
+        if ctx.hyperparameters['extraction_mode'] == 'packed':
+            groups = self._group_categories_for_packing(ctx, pending, retrieved)
+        else:
+            groups = [[cat_key] for cat_key in pending]
+        ctx.extraction_groups = groups
+        
+        async def run_group(session: aiohttp.ClientSession, group: List[str]):
+            async with semaphore:
+                started = time.perf_counter()
+                if len(group) == 1:
+                    cat_key = group[0]
+                    group_results = {
+                        cat_key: await self._generate_category_result(
+                            ctx,
+                            categories[cat_key]['name'],
+                            retrieved[cat_key],
+                            categories[cat_key]['prompt'],
+                            company_name,
+                            sme_objective,
+                            session=session,
+                            category_key=cat_key
+                        )
+                    }
+                else:
+                    group_results = await self._generate_packed_results(
+                        ctx, categories, group, retrieved, company_name, sme_objective, session=session
+                    )
+                llm_seconds = time.perf_counter() - started
+            return group_results, llm_seconds
+        
+        session = self._openai_session()
+        tasks = [asyncio.ensure_future(run_group(session, group)) for group in groups]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                group_results, llm_seconds = await next_done
+                for cat_key, result in group_results.items():
+                    results[cat_key] = result
+                    latencies[cat_key] = round(retrieval_seconds[cat_key] + llm_seconds, 3)
+                    
+                    if category_callback and 'error' not in result:
+                        try:
+                            # Checkpoint writes are blocking I/O (Redis/disk): keep them off the event loop
+                            await asyncio.to_thread(category_callback, cat_key, result)
+                        except Exception as e:
+                            logger.warning(f"Category callback failed: {e}")
+                    
+                    # Report progress as categories finish (out of order)
+                    report_progress(cat_key)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        
+        ordered_results = {cat_key: results[cat_key] for cat_key in categories}
+        ordered_latencies = {cat_key: latencies[cat_key] for cat_key in categories}
+        return ordered_results, ordered_latencies
+    
     def _get_category_configs(self, company_name: str, sme_objective: str) -> Dict[str, Dict[str, str]]:
         """Get configuration for all 10 categories"""
         return {
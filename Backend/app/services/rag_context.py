@@ -0,0 +1,66 @@
+"""
+Per-analysis state for the RAG pipeline
+
+RAGAnalysisService keeps the heavy, shareable pieces (embedding model, Milvus
+connection, caches). Everything that belongs to a single analysis - its key in
+the shared Milvus collection, the chunk matrix and hyperparameter overrides - lives in a
+RAGAnalysisContext, so one warm service can run several analyses at once
+without them overwriting each other.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.services.vector_index import ChunkTable, InMemoryVectorIndex
+from app.services.vector_planner import VectorBackendPlan
+
+
+@dataclass
+class RAGAnalysisContext:
+    """Retrieval state and settings for one RAG analysis"""
+
+    hyperparameters: Dict[str, Any]
+    use_milvus: bool = False
+    company_key: Optional[str] = None
+    vector_signature: Optional[str] = None
+    milvus_ready: bool = False
+    milvus_failed_over: bool = False
+    vector_plan: Optional[VectorBackendPlan] = None
+    # Chunks behind reused Milvus vectors, to build an in-memory index from if Milvus fails
+    failover_chunks: List[Dict[str, Any]] = field(default_factory=list)
+    failover_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    in_memory_chunks: Optional[ChunkTable] = None
+    in_memory_index: Optional[InMemoryVectorIndex] = None
+    # Chunk text -> embedding computed by the pipeline's embed stage
+    precomputed_embeddings: Dict[str, Any] = field(default_factory=dict, repr=False)
+    embedding_cache_hits: int = 0
+    embedding_cache_misses: int = 0
+    chunking_stats: Dict[str, Any] = field(default_factory=dict)
+    context_stats: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    llm_usage: Dict[str, int] = field(default_factory=lambda: {
+        'calls': 0,
+        'cached_calls': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+    })
+    extraction_groups: List[List[str]] = field(default_factory=list)
+    retrieval_state: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    reused_categories: List[str] = field(default_factory=list)
+    resumed_categories: List[str] = field(default_factory=list)
+
+    def disable_milvus(self) -> None:
+        """Fall back to in-memory storage for the rest of this analysis"""
+        self.use_milvus = False
+        self.milvus_ready = False
+
+    def has_memory_vectors(self) -> bool:
+        return self.in_memory_chunks is not None and len(self.in_memory_chunks) > 0 and self.in_memory_index is not None
+
+    def embedding_cache_stats(self) -> Dict[str, Any]:
+        lookups = self.embedding_cache_hits + self.embedding_cache_misses
+        return {
+            'hits': self.embedding_cache_hits,
+            'misses': self.embedding_cache_misses,
+            'hit_rate': round(self.embedding_cache_hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,216 @@
+"""
+Sentence-aware chunking and near-duplicate chunk removal for RAG
+
+Chunks are built from whole sentences up to a token budget measured with the
+embedding model's own tokenizer (plus a character cap for Milvus' VARCHAR
+field), with a few trailing sentences carried over as overlap. Nothing is
+split mid-sentence unless a single sentence is longer than the budget, and no
+chunk is ever longer than the character cap.
+
+Syndicated articles produce near-identical chunks; SimHash over word shingles
+finds them (Hamming distance <= 3 of 64 bits) so they can be dropped before
+embedding.
+"""
+
+import re
+import hashlib
+from typing import Callable, Dict, List
+
+# Part of the vector signature: bump when chunk boundaries change so stored vectors aren't reused
+CHUNKER_VERSION = "sent2"
+
+_SENTENCE_END = re.compile(r'(\S*[.!?…]["\'”’)\]]*)\s+(?=["\'“‘(\[]?[A-Z0-9])')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n+')
+_ABBREVIATIONS = {
+    'mr.', 'mrs.', 'ms.', 'dr.', 'prof.', 'st.', 'jr.', 'sr.', 'inc.', 'ltd.', 'co.', 'corp.',
+    'plc.', 'vs.', 'no.', 'u.s.', 'u.k.', 'e.g.', 'i.e.', 'approx.', 'est.',
+}
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences (paragraph breaks always end a sentence)"""
+    def mark_boundary(match):
+        word = match.group(1)
+        if word.lower().strip('"\'“‘(') in _ABBREVIATIONS or re.fullmatch(r'[A-Z]\.', word):
+            return match.group(0)  # "Mr. Smith", "J. Doe" - not a sentence end
+        return f"{word}\n\n"
+
+    sentences = []
+    for part in _PARAGRAPH_BREAK.split(_SENTENCE_END.sub(mark_boundary, text or '')):
+        part = ' '.join(part.split())
+        if part:
+            sentences.append(part)
+    return sentences
+
+
+def _split_long_sentence(sentence: str, tokens: int, max_tokens: int, max_chars: int) -> List[str]:
+    """
+    Word-level split for a single sentence that doesn't fit the budget on its own. Words
+    longer than a piece (urls, base64, text without spaces) are cut by characters, so
+    every piece is at most `max_chars` long.
+    """
+    pieces = max(-(-tokens // max_tokens), -(-len(sentence) // max_chars), 1)
+    piece_chars = max(1, min(max_chars, -(-len(sentence) // pieces)))
+
+    result: List[str] = []
+    current = ''
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) <= piece_chars:
+            current = f"{current} {word}"
+            continue
+        if current:
+            result.append(current)
+        while len(word) > piece_chars:
+            result.append(word[:piece_chars])
+            word = word[piece_chars:]
+        current = word
+    if current:
+        result.append(current)
+    return result
+
+
+def _fit_sentence(sentence: str, tokens: int, count_tokens: TokenCounter, max_tokens: int, max_chars: int):
+    """(piece, tokens) pairs of a sentence, split until each piece fits the token and character budget"""
+    fitted = []
+    pending = [(sentence, tokens)]
+    while pending:
+        piece, piece_tokens = pending.pop(0)
+        if piece_tokens <= max_tokens and len(piece) <= max_chars:
+            fitted.append((piece, piece_tokens))
+            continue
+        pieces = _split_long_sentence(piece, piece_tokens, max_tokens, max_chars)
+        if pieces == [piece]:
+            # A single character over the token budget; nothing left to split
+            fitted.append((piece, piece_tokens))
+            continue
+        pending[:0] = zip(pieces, count_tokens(pieces))
+    return fitted
+
+
+def chunk_text(
+    text: str,
+    count_tokens: TokenCounter,
+    max_tokens: int,
+    overlap_tokens: int = 0,
+    max_chars: int = 1800,
+    min_chars: int = 50
+) -> List[str]:
+    """Pack whole sentences into chunks of at most `max_tokens` tokens and `max_chars` characters"""
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+
+    units: List[str] = []
+    unit_tokens: List[int] = []
+    for sentence, tokens in zip(sentences, count_tokens(sentences)):
+        if tokens > max_tokens or len(sentence) > max_chars:
+            for piece, piece_tokens in _fit_sentence(sentence, tokens, count_tokens, max_tokens, max_chars):
+                units.append(piece)
+                unit_tokens.append(piece_tokens)
+        else:
+            units.append(sentence)
+            unit_tokens.append(tokens)
+
+    chunks: List[str] = []
+    current: List[int] = []  # indices into units
+    current_tokens = 0
+    current_chars = 0
+
+    def flush():
+        chunk = ' '.join(units[i] for i in current)
+        if len(chunk) >= min_chars:
+            chunks.append(chunk)
+
+    for i, (unit, tokens) in enumerate(zip(units, unit_tokens)):
+        if current and (current_tokens + tokens > max_tokens or current_chars + 1 + len(unit) > max_chars):
+            flush()
+            # Carry trailing sentences over as overlap, as long as they leave room for this one
+            carried: List[int] = []
+            carried_tokens = 0
+            for j in reversed(current):
+                if carried_tokens + unit_tokens[j] > overlap_tokens:
+                    break
+                carried.insert(0, j)
+                carried_tokens += unit_tokens[j]
+            while carried and (
+                carried_tokens + tokens > max_tokens
+                or sum(len(units[j]) + 1 for j in carried) + len(unit) > max_chars
+            ):
+                carried_tokens -= unit_tokens[carried.pop(0)]
+            current = carried
+            current_tokens = carried_tokens
+            current_chars = sum(len(units[j]) + 1 for j in current)
+
+        current.append(i)
+        current_tokens += tokens
+        current_chars += len(unit) + 1
+
+    if current:
+        flush()
+    return chunks
+
+
+def _shingles(text: str, size: int = 3) -> List[str]:
+    words = re.findall(r'\w+', text.lower())
+    if len(words) <= size:
+        return [' '.join(words)] if words else []
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the text's word 3-shingles"""
+    weights = [0] * 64
+    for shingle in _shingles(text):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class SimHashIndex:
+    """
+    Finds stored fingerprints within a Hamming distance of a query. Fingerprints are split
+    into max_distance + 1 bands; by pigeonhole, a fingerprint within max_distance bits
+    matches the query exactly on at least one band, so band lookups find every candidate.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self._band_count = max_distance + 1
+        self._band_bits = -(-64 // self._band_count)
+        self._bands: Dict[tuple, List[int]] = {}
+        self._fingerprints: Dict[int, int] = {}
+
+    def _keys(self, fingerprint: int) -> List[tuple]:
+        mask = (1 << self._band_bits) - 1
+        return [(band, fingerprint >> (self._band_bits * band) & mask) for band in range(self._band_count)]
+
+    def add(self, item_id: int, fingerprint: int) -> None:
+        self._fingerprints[item_id] = fingerprint
+        for key in self._keys(fingerprint):
+            self._bands.setdefault(key, []).append(item_id)
+
+    def near(self, fingerprint: int) -> List[int]:
+        """Ids of stored fingerprints within max_distance bits, in insertion order"""
+        candidates = {item_id for key in self._keys(fingerprint) for item_id in self._bands.get(key, ())}
+        return sorted(
+            item_id for item_id in candidates
+            if bin(fingerprint ^ self._fingerprints[item_id]).count('1') <= self.max_distance
+        )
+
+
+def find_near_duplicates(texts: List[str], max_distance: int = 3) -> List[int]:
+    """Indices of texts that are near-duplicates of an earlier text (SimHash Hamming distance <= max_distance)"""
+    index = SimHashIndex(max_distance)
+    duplicates: List[int] = []
+
+    for i, text in enumerate(texts):
+        fingerprint = simhash(text)
+        if index.near(fingerprint):
+            duplicates.append(i)
+        else:
+            index.add(i, fingerprint)
+
+    return duplicates
@@ -0,0 +1,189 @@
+"""
+In-memory vector index for RAG retrieval (the non-Milvus backend)
+
+Embeddings are L2-normalized once when the index is built and kept in one
+contiguous float32, float16 or int8 matrix (int8 is scalar-quantized with a
+float32 scale per row), so a query is a single dot product against the matrix
+followed by an argpartition top-k - no per-query re-normalization or copies.
+Large corpora can switch to an HNSW graph (hnswlib, optional) instead of the
+exact scan. Chunk text and titles sit next to the index in a ChunkTable
+(columns instead of one dict per chunk).
+"""
+
+import sys
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+# hnswlib (optional, exact search is used without it)
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    hnswlib = None  # type: ignore
+    HNSWLIB_AVAILABLE = False
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of `matrix` with unit-length rows (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class InMemoryVectorIndex:
+    """Cosine-similarity index over a fixed set of embeddings"""
+
+    # float16/int8 matrices are scored in float32 blocks of this many rows
+    SCORE_BLOCK_ROWS = 8192
+    DTYPES = ("float32", "float16", "int8")
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        dtype: str = "float32",
+        hnsw_min_size: Optional[int] = None,
+        hnsw_ef: int = 64
+    ):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unsupported index dtype '{dtype}' (expected one of {', '.join(self.DTYPES)})")
+        normalized = normalize_rows(embeddings)
+        self.size, self.dim = normalized.shape
+        self.scales: Optional[np.ndarray] = None
+        if dtype == "int8":
+            # Symmetric per-row quantization: row ~= int8 row * scale
+            scales = np.abs(normalized).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.matrix = np.ascontiguousarray(np.rint(normalized / scales[:, None]), dtype=np.int8)
+            self.scales = scales.astype(np.float32)
+        else:
+            self.matrix = np.ascontiguousarray(normalized, dtype=np.dtype(dtype))
+        self.hnsw_ef = hnsw_ef
+        self._hnsw = None
+
+        if hnsw_min_size is not None and self.size >= hnsw_min_size:
+            if HNSWLIB_AVAILABLE:
+                self._hnsw = self._build_hnsw(normalized)
+            else:
+                logger.warning(f"⚠️ hnswlib not installed; using exact search for {self.size} vectors")
+
+    def _build_hnsw(self, normalized: np.ndarray):
+        graph = hnswlib.Index(space='ip', dim=self.dim)
+        graph.init_index(max_elements=self.size, ef_construction=200, M=16)
+        graph.add_items(normalized, np.arange(self.size))
+        graph.set_ef(self.hnsw_ef)
+        logger.info(f"✅ Built HNSW graph over {self.size} vectors")
+        return graph
+
+    @property
+    def mode(self) -> str:
+        return "hnsw" if self._hnsw is not None else "exact"
+
+    @property
+    def nbytes(self) -> int:
+        scales = self.scales.nbytes if self.scales is not None else 0
+        return int(self.matrix.nbytes + scales)
+
+    def vectors(self, indices) -> np.ndarray:
+        """Normalized float32 embeddings of the given rows (dequantized for int8)"""
+        rows = self.matrix[indices].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[indices][..., None]
+        return rows
+
+    def _score(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every (normalized) query against every indexed vector"""
+        if self.matrix.dtype == np.float32:
+            return queries @ self.matrix.T
+        scores = np.empty((queries.shape[0], self.size), dtype=np.float32)
+        for start in range(0, self.size, self.SCORE_BLOCK_ROWS):
+            block = self.matrix[start:start + self.SCORE_BLOCK_ROWS].astype(np.float32)
+            block_scores = queries @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + len(block)]
+            scores[:, start:start + len(block)] = block_scores
+        return scores
+
+    def search(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int,
+        min_score: Optional[float] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k search for a batch of queries
+
+        Returns one (indices, scores) pair per query, best first. Hits scoring below
+        `min_score` are dropped. With an HNSW graph at most `hnsw_ef` hits are returned.
+        """
+        queries = normalize_rows(query_embeddings)
+        k = min(top_k, self.size)
+        if k <= 0:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty for _ in range(len(queries))]
+
+        if self._hnsw is not None:
+            # ef is fixed when the graph is built: the graph is shared by concurrent searches
+            # (vector cache), so it is never changed per query and k is capped at it instead
+            k = min(k, self.hnsw_ef)
+            labels, distances = self._hnsw.knn_query(queries, k=k)
+            # hnswlib 'ip' distance is 1 - dot product
+            top_indices = labels.astype(np.int64)
+            top_scores = (1.0 - distances).astype(np.float32)
+        else:
+            scores = self._score(queries)
+            if k < self.size:
+                candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.broadcast_to(np.arange(self.size), (len(queries), self.size))
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            order = np.argsort(-candidate_scores, axis=1)
+            top_indices = np.take_along_axis(candidates, order, axis=1)
+            top_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        if min_score is None:
+            return list(zip(top_indices, top_scores))
+
+        keep = top_scores >= min_score
+        return [(indices[mask], scores[mask]) for indices, scores, mask in zip(top_indices, top_scores, keep)]
+
+
+class ChunkTable:
+    """
+    Columnar chunk metadata for the in-memory index: one list of texts and, since
+    an article's chunks share its title, each title stored once plus an int32
+    title id per chunk. Row i describes row i of the matching InMemoryVectorIndex.
+    """
+
+    def __init__(self, texts: Iterable[str], titles: Iterable[str]):
+        self.texts: List[str] = list(texts)
+        self.titles: List[str] = []
+        title_ids: Dict[str, int] = {}
+        rows = []
+        for title in titles:
+            if title not in title_ids:
+                title_ids[title] = len(self.titles)
+                self.titles.append(title)
+            rows.append(title_ids[title])
+        self.title_ids = np.asarray(rows, dtype=np.int32)
+        if len(self.title_ids) != len(self.texts):
+            raise ValueError("ChunkTable needs one title per text")
+
+    @classmethod
+    def from_chunks(cls, chunks: List[Dict[str, Any]]) -> "ChunkTable":
+        return cls((c['text'] for c in chunks), (c['title'] for c in chunks))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, idx: int) -> Dict[str, str]:
+        return {'text': self.texts[idx], 'title': self.titles[self.title_ids[idx]]}
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the table (string objects included)"""
+        strings = sum(sys.getsizeof(text) for text in self.texts) + sum(sys.getsizeof(t) for t in self.titles)
+        return int(strings + self.title_ids.nbytes)
@@ -0,0 +1,69 @@
+"""
+Vector backend planner
+
+A unified analysis covers at most ~100 articles, a few hundred chunks. At that
+size an exact scan of the in-memory matrix answers all ten category queries in
+a few milliseconds, while Milvus adds a network round-trip per upsert and
+search. plan_vector_backend() therefore picks the cheapest backend that fits
+the article set:
+
+- memory-exact: the default
+- memory-hnsw:  from RAG_MEMORY_INDEX_HNSW_MIN_CHUNKS (needs hnswlib)
+- milvus:       from RAG_MILVUS_MIN_CHUNKS, or whenever the vectors must
+                outlive the process (RAG_PERSIST_VECTORS)
+
+benchmarks/vector_backend_benchmark.py measures store + ten queries per
+backend. An index serves one analysis, so building an HNSW graph never pays
+for itself (5000 chunks: ~2.6s build vs ~0.19s for store and ten exact scans).
+The HNSW tier is therefore off by default. Milvus is not faster per analysis
+either: it is for article sets whose float16 matrix (~100MB at 50000 chunks)
+should not sit in worker memory, and for persistence. Re-running an in-memory
+analysis does not re-encode anything, because the embedding store already
+keeps the chunk embeddings.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+from app.services.vector_index import HNSWLIB_AVAILABLE
+
+MEMORY_EXACT = "memory-exact"
+MEMORY_HNSW = "memory-hnsw"
+MILVUS = "milvus"
+
+
+@dataclass(frozen=True)
+class VectorBackendPlan:
+    backend: str
+    reason: str
+    chunk_count: int
+
+    @property
+    def uses_milvus(self) -> bool:
+        return self.backend == MILVUS
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def plan_vector_backend(
+    chunk_count: int,
+    milvus_available: bool,
+    persist: bool = False,
+    hnsw_min_chunks: Optional[int] = None,
+    milvus_min_chunks: Optional[int] = 50000
+) -> VectorBackendPlan:
+    """Pick the vector backend for an article set of `chunk_count` chunks (None thresholds disable a tier)"""
+    if milvus_available:
+        if persist:
+            return VectorBackendPlan(MILVUS, "vectors must persist", chunk_count)
+        if milvus_min_chunks is not None and chunk_count >= milvus_min_chunks:
+            return VectorBackendPlan(MILVUS, f"{chunk_count} chunks >= {milvus_min_chunks}", chunk_count)
+
+    if hnsw_min_chunks is not None and chunk_count >= hnsw_min_chunks:
+        if HNSWLIB_AVAILABLE:
+            return VectorBackendPlan(MEMORY_HNSW, f"{chunk_count} chunks >= {hnsw_min_chunks}", chunk_count)
+        return VectorBackendPlan(MEMORY_EXACT, "hnswlib not installed", chunk_count)
+
+    reason = "milvus unavailable" if (persist and not milvus_available) else f"{chunk_count} chunks, exact scan is cheapest"
+    return VectorBackendPlan(MEMORY_EXACT, reason, chunk_count)
@@ -1,15 +1,22 @@
 """
-Celery Task for Unified Analysis Pipeline
-Handles: scraping → classification → embeddings → RAG analysis → DB storage
-Models are initialized INSIDE the task to avoid memory leaks and PyTorch crashes
+Celery Tasks for Unified Analysis Pipeline
+Handles: scraping → classification → DB storage → embeddings → RAG analysis
+Each stage is a Celery task on the `io` or `cpu` queue, chained by start_unified_analysis()
+Models are loaded once per worker (app.services.model_registry) and shared by its tasks
+Async work runs on one long-lived event loop per worker thread (app.utils.event_loop)
 """
 
 import os
 import json
+import hashlib
+from uuid import uuid4
 import pandas as pd
 from typing import Optional, Dict, Any
 from datetime import datetime, date
 from loguru import logger
+from celery import chain
+from celery.result import AsyncResult
+from pymysql.err import DataError, IntegrityError
 
 # Force CPU-only mode for PyTorch to avoid SIGSEGV crashes
 os.environ["TORCH_DEVICE"] = "cpu"
@@ -20,8 +27,10 @@ os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
 from app.celery_app import celery_app
 from app.scrapers.serpapi_scraper import SerpApiScraper
 from app.models import Company
-from app.services.advanced_model_service import AdvancedModelService
-from app.services.rag_analysis_service import RAGAnalysisService
+from app.services.model_registry import worker_models
+from app.services.article_dedup import deduplicate_articles
+from app.services.pipeline_store import get_pipeline_store
+from app.utils.event_loop import run_sync
 from app.database_mysql_inspire import inspire_db
 from app.config import settings
 import redis
@@ -95,656 +104,776 @@ def finalize_progress(task_id: str, status: str, message: str):
     )
 
 
-@celery_app.task(bind=True, name="app.tasks.unified_analysis_task.run_unified_analysis", max_retries=2, autoretry_for=(Exception,), retry_backoff=True, retry_backoff_max=60, retry_jitter=True)
-def run_unified_analysis(
-    self,
-    company_name: str,
-    company_location: str,
-    sme_id: int,
-    sme_objective: str,
-    max_articles: int,
-    company_id: Optional[int],
-    job_identifier: str,
-) -> Dict[str, Any]:
+class PipelineAborted(Exception):
+    """A stage failed for good: the job is reported as failed and the rest of the chain is dropped"""
+
+
+def _abort(job_identifier: str, message: str, error: str):
+    finalize_progress(job_identifier, "failed", message)
+    raise PipelineAborted(error)
+
+
+def _placeholder_url(row) -> str:
     """
-    Celery task that runs the complete unified analysis pipeline.
-    
-    Fork-safe: Resets asyncio state and initializes models fresh in each worker process.
+    Stand-in url of an article that has none. Articles are upserted on (company_id, url), so
+    it is derived from the article itself: only the same article maps to the same row.
     """
-    # Reset asyncio state for fork safety (important for Celery fork pool)
-    # This prevents "Event loop is closed" errors when Celery forks worker processes
-    import asyncio
-    try:
-        # Try to get current event loop
-        try:
-            loop = asyncio.get_running_loop()
-            # If we get here, loop is running - don't close it
-        except RuntimeError:
-            # No running loop, try to get event loop
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_closed():
-                    # Loop is closed, create new one
-                    asyncio.set_event_loop(asyncio.new_event_loop())
-            except RuntimeError:
-                # No event loop exists, create new one
-                asyncio.set_event_loop(asyncio.new_event_loop())
-    except Exception as e:
-        # If anything fails, just create a new event loop
-        logger.debug(f"Resetting asyncio event loop: {e}")
-        try:
-            asyncio.set_event_loop(asyncio.new_event_loop())
-        except Exception:
-            pass  # Ignore if we can't set event loop
+    digest = hashlib.sha1(f"{row.get('title') or ''}\n{row.get('content') or ''}".encode('utf-8')).hexdigest()
+    return f'https://example.com/article/{digest}'
+
+
+def _articles_for_analysis(classified_articles):
+    """Title and content of each classified article, the input of the RAG stages"""
+    return [
+        {'title': article['title'], 'content': article['content']}
+        for article in classified_articles
+    ]
+
+
+# ============================================
+# Pipeline stages
+# ============================================
+# Each stage is its own Celery task, routed to the `io` queue (network / database bound)
+# or the `cpu` queue (models) - see task_routes in app.celery_app. Stages hand each other
+# a small job dict; bulky outputs go to the pipeline payload store and only their keys
+# travel in the broker message (job['payloads'][stage]).
+#
+# Every completed stage is checkpointed per run (job['run_id'], generated when the chain
+# is built - never the client-supplied job_identifier), and the stores and the RAG
+# extraction also checkpoint their partial results (stored article ids, extracted
+# categories). A failing stage is retried on its own (the earlier stages are not re-run),
+# and a retried or redelivered stage continues from its checkpoint.
+
+# Stage -> (progress stage name, percent at which the stage starts)
+STAGE_PROGRESS = {
+    "scrape": ("scraping", 10.0),
+    "classify": ("classification", 35.0),
+    "store": ("storage", 55.0),
+    "embed": ("embedding", 72.0),
+    "extract": ("rag_analysis", 75.0),
+}
+# Bulky payloads, dropped once the job completes (the small checkpoint record of the run expires on its own)
+PIPELINE_PAYLOADS = ("scraped", "classified", "stored_articles", "embeddings", "categories")
+
+STAGE_TASK_OPTIONS = dict(
+    bind=True,
+    max_retries=2,
+    autoretry_for=(Exception,),
+    dont_autoretry_for=(PipelineAborted,),
+    retry_backoff=True,
+    retry_backoff_max=60,
+    retry_jitter=True,
+)
+
+
+def _run_id(job: Dict[str, Any]) -> str:
     """
-    Celery task that runs the complete unified analysis pipeline.
+    Server-generated id of this pipeline run, the key of its payloads and checkpoint.
     
-    This task:
-    1. Initializes models INSIDE the task (not globally) to avoid memory leaks
-    2. Uses CPU-only mode for PyTorch to prevent SIGSEGV crashes
-    3. Handles: scraping → classification → embeddings → RAG analysis → DB storage
-    4. Updates progress in Redis throughout execution
+    The job_identifier may come from the client and be reused; a re-submission is a new run
+    and must never resume from (or return the result of) an earlier run's checkpoint.
+    Jobs queued before runs had their own id fall back to the job_identifier.
     """
+    return job.get('run_id') or job['job_identifier']
+
+
+def _completed_stage_job(task, job: Dict[str, Any], stage: str) -> Optional[Dict[str, Any]]:
+    """The checkpointed job if `stage` already completed for this job (redelivered or re-queued message)"""
+    job_identifier = job['job_identifier']
+    checkpoint = get_pipeline_store().load_checkpoint(_run_id(job))
+    if stage not in checkpoint['completed_stages'] or not checkpoint['job']:
+        return None
+    
+    progress_stage, percent = STAGE_PROGRESS[stage]
+    logger.info(f"[{task.request.id}] ⏭️ Stage '{stage}' of {job_identifier} already completed; resuming from checkpoint")
+    update_progress(
+        job_identifier,
+        percent,
+        f"Resuming from checkpoint ({stage} already completed)...",
+        status="running",
+        extra={
+            "stage": progress_stage,
+            "resumed_from_checkpoint": True,
+            "completed_stages": checkpoint['completed_stages'],
+        },
+    )
+    return checkpoint['job']
+
+
+def _report_stage_start(task, job_identifier: str, stage: str, message: str):
+    """Progress update at the start of a stage; retries say which attempt resumed the stage"""
+    progress_stage, percent = STAGE_PROGRESS[stage]
+    extra = {"stage": progress_stage}
+    attempt = task.request.retries + 1
+    if attempt > 1:
+        message = f"{message} (retry {attempt - 1}/{task.max_retries}, resuming from checkpoint)"
+        extra.update({"attempt": attempt, "resumed_from_checkpoint": True})
+    update_progress(job_identifier, percent, message, status="running", extra=extra)
+
+
+def _fail_stage(task, job_identifier: str, message: str, error: Exception):
+    """Let Celery retry the stage while attempts remain (autoretry_for), then fail the job"""
+    if task.request.retries < task.max_retries:
+        logger.warning(f"[{task.request.id}] {message}; retrying the stage ({task.request.retries + 1}/{task.max_retries})")
+        raise error
+    _abort(job_identifier, message, str(error))
+
+
+@celery_app.task(name="app.tasks.unified_analysis_task.scrape_articles", **STAGE_TASK_OPTIONS)
+def scrape_articles(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 1 (io): scrape the company's articles from Google via SerpAPI"""
+    completed = _completed_stage_job(self, job, "scrape")
+    if completed:
+        return completed
     task_id = self.request.id
+    job_identifier = job['job_identifier']
+    company_name = job['company_name']
+    max_articles = job['max_articles']
+    
+    logger.info(f"🚀 Starting unified analysis pipeline for: {company_name} (job {job_identifier})")
+    update_progress(
+        job_identifier,
+        5.0,
+        "Initializing unified analysis pipeline...",
+        status="running",
+        extra={"stage": "initializing"}
+    )
+    
+    # ============================================
+    # STEP 1: Google Scraping (NO LinkedIn)
+    # ============================================
+    logger.info(f"[{task_id}] 📰 Step 1/4: Scraping company data from Google...")
+    _report_stage_start(self, job_identifier, "scrape", "Scraping company articles...")
     
     try:
-        logger.info(f"🚀 Starting unified analysis task {task_id} for: {company_name}")
-        update_progress(
-            job_identifier,
-            5.0,
-            "Initializing unified analysis pipeline...",
-            status="running",
-            extra={"stage": "initializing"}
+        # Check if SerpAPI key is configured
+        if not settings.serpapi_key:
+            _abort(
+                job_identifier,
+                "SerpAPI key is not configured. Please add SERPAPI_API_KEY to your .env file.",
+                "SerpAPI key not configured"
+            )
+        
+        # Create a company object for scraping
+        company_obj = Company(
+            id=0,
+            name=company_name,
+            location=job['company_location'],
+            website=None,
+            industry=None,
+            description=None,
+            linkedin_url=None,
+            last_scraped=None,
+            scrape_count=0,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
         )
         
-        # ============================================
-        # STEP 1: Google Scraping (NO LinkedIn)
-        # ============================================
-        logger.info(f"[{task_id}] 📰 Step 1/4: Scraping company data from Google...")
+        # Use SerpAPI scraper directly, on this worker thread's long-lived event loop
+        # (its HTTP session stays open for the next scrape on the same thread)
+        serpapi_scraper = SerpApiScraper()
+        scrape_result = run_sync(serpapi_scraper.scrape_company(company_obj))
+        
+        # Get all scraped articles (up to max_articles)
+        articles_data = scrape_result.news_articles[:max_articles]
+        logger.info(f"[{task_id}] 📊 Retrieved {len(articles_data)} articles (max allowed: {max_articles})")
         update_progress(
             job_identifier,
-            10.0,
-            "Scraping company articles...",
+            25.0,
+            f"Scraped {len(articles_data)} articles.",
             status="running",
-            extra={"stage": "scraping"}
+            extra={"stage": "scraping", "articles_found": len(articles_data)},
         )
         
-        try:
-            # Check if SerpAPI key is configured
-            if not settings.serpapi_key:
-                finalize_progress(
-                    job_identifier,
-                    "failed",
-                    "SerpAPI key is not configured. Please add SERPAPI_API_KEY to your .env file."
-                )
-                return {"status": "failed", "error": "SerpAPI key not configured"}
-            
-            # Create a company object for scraping
-            company_obj = Company(
-                id=0,
-                name=company_name,
-                location=company_location,
-                website=None,
-                industry=None,
-                description=None,
-                linkedin_url=None,
-                last_scraped=None,
-                scrape_count=0,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
+        if not articles_data:
+            _abort(
+                job_identifier,
+                f"No articles found for {company_name}. Please check if the company name and location are correct.",
+                "No articles found"
+            )
+        
+        logger.info(f"[{task_id}] ✅ Found {len(articles_data)} articles from Google")
+        
+        articles_list = []
+        for article in articles_data:
+            articles_list.append({
+                'title': article.title,
+                'content': article.content if article.content else '',
+                'url': article.url,
+                'source': article.source,
+                'published_date': article.published_date.isoformat() if article.published_date else None
+            })
+        
+    except PipelineAborted:
+        raise
+    except Exception as e:
+        logger.error(f"[{task_id}] Scraping failed: {e}")
+        _fail_stage(self, job_identifier, f"Failed to scrape articles: {str(e)}", e)
+    
+    store = get_pipeline_store()
+    job['articles_found'] = len(articles_list)
+    job['payloads']['scraped'] = store.put(_run_id(job), "scraped", articles_list)
+    store.save_checkpoint(_run_id(job), "scrape", job)
+    return job
+
+
+@celery_app.task(name="app.tasks.unified_analysis_task.classify_articles", **STAGE_TASK_OPTIONS)
+def classify_articles(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 2 (cpu): collapse duplicate articles and classify them against the SME objective"""
+    completed = _completed_stage_job(self, job, "classify")
+    if completed:
+        return completed
+    task_id = self.request.id
+    job_identifier = job['job_identifier']
+    
+    # ============================================
+    # STEP 2: Classify Articles Based on SME Objectives
+    # ============================================
+    logger.info(f"[{task_id}] 🔍 Step 2/4: Classifying articles based on SME objectives...")
+    _report_stage_start(self, job_identifier, "classify", "Classifying articles against SME objectives...")
+    
+    try:
+        articles_list = get_pipeline_store().get(job['payloads']['scraped'])
+        
+        # Collapse republished copies of the same story so each is classified, stored and embedded once
+        dedup_stats = None
+        if settings.article_dedup_enabled:
+            articles_list, dedup_stats = deduplicate_articles(
+                articles_list,
+                max_distance=settings.article_dedup_max_distance
+            )
+            logger.info(
+                f"[{task_id}] 🧹 Deduplicated articles: {dedup_stats['articles_in']} → {dedup_stats['articles_out']} "
+                f"({dedup_stats['duplicates_removed']} duplicates in {dedup_stats['clusters_with_duplicates']} clusters)"
             )
-            
-            # Use SerpAPI scraper directly
-            serpapi_scraper = SerpApiScraper()
-            try:
-                # Note: scrape_company is async, but Celery tasks are sync
-                # We need to run it in an event loop
-                import asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                scrape_result = loop.run_until_complete(serpapi_scraper.scrape_company(company_obj))
-                loop.close()
-            finally:
-                # Ensure session is closed
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(serpapi_scraper.close())
-                    loop.close()
-                except:
-                    pass
-            
-            # Get all scraped articles (up to max_articles)
-            articles_data = scrape_result.news_articles[:max_articles]
-            logger.info(f"[{task_id}] 📊 Retrieved {len(articles_data)} articles (max allowed: {max_articles})")
             update_progress(
                 job_identifier,
-                25.0,
-                f"Scraped {len(articles_data)} articles.",
+                35.0,
+                f"Removed {dedup_stats['duplicates_removed']} duplicate articles.",
                 status="running",
-                extra={"stage": "scraping", "articles_found": len(articles_data)},
+                extra={"stage": "deduplication", "article_dedup": dedup_stats},
             )
-            
-            if not articles_data:
-                finalize_progress(
-                    job_identifier,
-                    "failed",
-                    f"No articles found for {company_name}. Please check if the company name and location are correct."
-                )
-                return {"status": "failed", "error": "No articles found"}
-            
-            logger.info(f"[{task_id}] ✅ Found {len(articles_data)} articles from Google")
-            
-        except Exception as e:
-            logger.error(f"[{task_id}] Scraping failed: {e}")
-            finalize_progress(
-                job_identifier,
-                "failed",
-                f"Failed to scrape articles: {str(e)}"
-            )
-            return {"status": "failed", "error": str(e)}
         
-        # ============================================
-        # STEP 2: Classify Articles Based on SME Objectives
-        # ============================================
-        logger.info(f"[{task_id}] 🔍 Step 2/4: Classifying articles based on SME objectives...")
+        # Convert articles to DataFrame for classification
+        df = pd.DataFrame(articles_list)
+        
+        # Classification model loaded once per worker (CPU-only) and shared by its tasks
+        model_service = worker_models.model_service()
+        
+        # Classify articles based on SME objectives
+        classification_results = model_service.classify_articles(
+            df=df,
+            company_objective=job['sme_objective'],
+            use_custom_objective=True
+        )
+        
+        # Get the classified DataFrame from classification results if available
+        if 'results' in classification_results:
+            df_classified = pd.DataFrame(classification_results['results'])
+            if 'url' in df.columns and 'source' in df.columns:
+                df_classified['url'] = df['url'].values
+                df_classified['source'] = df['source'].values
+            if 'sources' in df.columns:
+                df_classified['sources'] = df['sources'].values
+        else:
+            df_classified = df
+        
+        logger.info(f"[{task_id}] ✅ Classified {len(df_classified)} articles")
         update_progress(
             job_identifier,
-            35.0,
-            "Classifying articles against SME objectives...",
+            50.0,
+            f"Classified {len(df_classified)} articles.",
             status="running",
-            extra={"stage": "classification"}
+            extra={"stage": "classification", "articles_classified": len(df_classified)},
         )
         
-        try:
-            # Convert articles to DataFrame for classification
-            articles_list = []
-            for article in articles_data:
-                articles_list.append({
-                    'title': article.title,
-                    'content': article.content if article.content else '',
-                    'url': article.url,
-                    'source': article.source,
-                    'published_date': article.published_date.isoformat() if article.published_date else None
-                })
-            
-            df = pd.DataFrame(articles_list)
-            
-            # Initialize classification model INSIDE the task (not globally)
-            logger.info(f"[{task_id}] 📦 Initializing classification model (CPU-only)...")
-            
-            # Force CPU device BEFORE initializing any models
-            import torch
-            torch.set_default_device('cpu')
-            # Disable MPS explicitly
-            if hasattr(torch.backends, 'mps'):
-                torch.backends.mps.is_available = lambda: False
-            if hasattr(torch, 'mps'):
-                torch.mps.is_available = lambda: False
-            
-            # Set environment variables again (in case they weren't picked up)
-            os.environ["TORCH_DEVICE"] = "cpu"
-            os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
-            os.environ["PYTORCH_MPS_HIGH_WATERMARK_RATIO"] = "0.0"
-            
-            model_service = AdvancedModelService()
-            
-            # Classify articles based on SME objectives
-            classification_results = model_service.classify_articles(
-                df=df,
-                company_objective=sme_objective,
-                use_custom_objective=True
-            )
-            
-            # Get the classified DataFrame from classification results if available
-            if 'results' in classification_results:
-                df_classified = pd.DataFrame(classification_results['results'])
-                if 'url' in df.columns and 'source' in df.columns:
-                    df_classified['url'] = df['url'].values
-                    df_classified['source'] = df['source'].values
+    except Exception as e:
+        logger.error(f"[{task_id}] Classification failed: {e}")
+        _fail_stage(self, job_identifier, f"Failed to classify articles: {str(e)}", e)
+    
+    store = get_pipeline_store()
+    job['article_dedup'] = dedup_stats
+    job['payloads']['classified'] = store.put(_run_id(job), "classified", df_classified.to_dict(orient='records'))
+    store.save_checkpoint(_run_id(job), "classify", job)
+    return job
+
+
+@celery_app.task(name="app.tasks.unified_analysis_task.store_articles", **STAGE_TASK_OPTIONS)
+def store_articles(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 3 (io): resolve the company record and store the classified articles"""
+    completed = _completed_stage_job(self, job, "store")
+    if completed:
+        return completed
+    task_id = self.request.id
+    job_identifier = job['job_identifier']
+    company_name = job['company_name']
+    company_id = job['company_id']
+    sme_id = job['sme_id']
+    
+    # ============================================
+    # STEP 3: Store Classified Articles in Database
+    # ============================================
+    logger.info(f"[{task_id}] 💾 Step 3/4: Storing classified articles in database...")
+    _report_stage_start(self, job_identifier, "store", "Storing classified articles to database...")
+    
+    store = get_pipeline_store()
+    try:
+        classified_articles = store.get(job['payloads']['classified'])
+        # Checkpoint: row index -> article id of the rows an earlier attempt already stored
+        stored_articles = store.get_optional(_run_id(job), "stored_articles", {})
+        
+        # Get or create company (using async database calls in sync context)
+        if company_id:
+            company = run_sync(inspire_db.get_company(company_id))
+            if not company:
+                _abort(job_identifier, f"Company with ID {company_id} not found", "Company not found")
+            if company.get('sme_id') and company['sme_id'] != sme_id:
+                _abort(job_identifier, "Company does not belong to this SME", "Access denied")
+            logger.info(f"[{task_id}] 📝 Using provided company ID: {company_name} (ID: {company_id})")
+        else:
+            company = run_sync(inspire_db.get_company_by_name(company_name, sme_id=sme_id))
+            if not company:
+                company_id = run_sync(inspire_db.create_company(
+                    name=company_name,
+                    location=job['company_location'],
+                    sme_id=sme_id
+                ))
+                logger.info(f"[{task_id}] 📝 Created new company record: {company_name} (ID: {company_id})")
             else:
-                df_classified = df
-            
-            logger.info(f"[{task_id}] ✅ Classified {len(df_classified)} articles")
-            update_progress(
-                job_identifier,
-                50.0,
-                f"Classified {len(df_classified)} articles.",
-                status="running",
-                extra={"stage": "classification", "articles_classified": len(df_classified)},
-            )
-            
-            # Clean up model service to free memory
-            del model_service
-            
-        except Exception as e:
-            logger.error(f"[{task_id}] Classification failed: {e}")
-            finalize_progress(
-                job_identifier,
-                "failed",
-                f"Failed to classify articles: {str(e)}"
-            )
-            return {"status": "failed", "error": str(e)}
+                company_id = company['company_id']
+                if not company.get('sme_id'):
+                    run_sync(inspire_db.update_company(company_id, sme_id=sme_id))
+                logger.info(f"[{task_id}] 📝 Found existing company: {company_name} (ID: {company_id})")
+        
+        # Store classified articles in one transaction (rows stored by an earlier attempt are skipped);
+        # upserting on (company_id, url) keeps re-analyses of a company from duplicating its articles
+        total_classified_articles = len(classified_articles)
+        if stored_articles:
+            logger.info(f"[{task_id}] ⏯️ {len(stored_articles)} articles already stored by an earlier attempt")
+        pending_rows = [idx for idx in range(total_classified_articles) if idx not in stored_articles]
+        new_articles = []
+        for idx in pending_rows:
+            row = classified_articles[idx]
+            prediction_label = row.get('prediction_label', 'Not Relevant')
+            db_classification = prediction_label if prediction_label in ['Directly Relevant', 'Indirectly Useful', 'Not Relevant'] else 'Not Relevant'
+            new_articles.append({
+                'title': row.get('title') or 'Untitled',
+                'url': row.get('url') or _placeholder_url(row),
+                'content': row.get('content') or '',
+                'source': row.get('source') or 'Unknown',
+                'published_date': None,
+                'relevance_score': row.get('confidence_score', 0.0),
+                'classification': db_classification,
+                # Outlets of the republished copies collapsed into this article by the classify stage
+                'sources': row.get('sources'),
+            })
         
-        # ============================================
-        # STEP 3: Store Classified Articles in Database
-        # ============================================
-        logger.info(f"[{task_id}] 💾 Step 3/4: Storing classified articles in database...")
+        # (create_articles fits title, url and source to their column widths)
+        if new_articles:
+            try:
+                article_ids = run_sync(inspire_db.create_articles(company_id, new_articles, upsert=True))
+                stored_articles.update(zip(pending_rows, article_ids))
+            except (IntegrityError, DataError) as e:
+                # One bad row rolls back the whole batch; store the rows one by one and skip the bad ones
+                logger.warning(f"[{task_id}] ⚠️ Bulk article insert failed ({e}); storing {len(new_articles)} articles one by one")
+                for idx, article in zip(pending_rows, new_articles):
+                    try:
+                        stored_articles[idx] = run_sync(inspire_db.create_articles(company_id, [article], upsert=True))[0]
+                    except (IntegrityError, DataError) as row_error:
+                        logger.error(f"[{task_id}] ❌ Skipping article {idx} ({article['url']}): {row_error}")
+            store.put(_run_id(job), "stored_articles", stored_articles)
+        articles_stored = len(stored_articles)
+        
+        logger.info(f"[{task_id}] ✅ Stored {articles_stored} articles in database")
         update_progress(
             job_identifier,
-            55.0,
-            "Storing classified articles to database...",
+            70.0,
+            f"Stored {articles_stored} articles in database.",
             status="running",
-            extra={"stage": "storage"}
+            extra={
+                "stage": "storage",
+                "articles_stored": articles_stored,
+                "articles_total": total_classified_articles,
+            },
         )
         
-        try:
-            # Get or create company (using async database calls in sync context)
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            if company_id:
-                company = loop.run_until_complete(inspire_db.get_company(company_id))
-                if not company:
-                    finalize_progress(
-                        job_identifier,
-                        "failed",
-                        f"Company with ID {company_id} not found"
-                    )
-                    loop.close()
-                    return {"status": "failed", "error": "Company not found"}
-                if company.get('sme_id') and company['sme_id'] != sme_id:
-                    finalize_progress(
-                        job_identifier,
-                        "failed",
-                        "Company does not belong to this SME"
-                    )
-                    loop.close()
-                    return {"status": "failed", "error": "Access denied"}
-                logger.info(f"[{task_id}] 📝 Using provided company ID: {company_name} (ID: {company_id})")
-            else:
-                company = loop.run_until_complete(inspire_db.get_company_by_name(company_name, sme_id=sme_id))
-                if not company:
-                    company_id = loop.run_until_complete(inspire_db.create_company(
-                        name=company_name,
-                        location=company_location,
-                        sme_id=sme_id
-                    ))
-                    logger.info(f"[{task_id}] 📝 Created new company record: {company_name} (ID: {company_id})")
-                else:
-                    company_id = company['company_id']
-                    if not company.get('sme_id'):
-                        loop.run_until_complete(inspire_db.update_company(company_id, sme_id=sme_id))
-                    logger.info(f"[{task_id}] 📝 Found existing company: {company_name} (ID: {company_id})")
-            
-            # Store classified articles
-            total_classified_articles = len(df_classified)
-            articles_stored = 0
-            for idx, row in df_classified.iterrows():
-                try:
-                    prediction_label = row.get('prediction_label', 'Not Relevant')
-                    title = row.get('title', 'Untitled')
-                    content = row.get('content', 'No content available')
-                    url = row.get('url', f'https://example.com/article/{idx}')
-                    source = row.get('source', 'Unknown')
-                    
-                    db_classification = prediction_label if prediction_label in ['Directly Relevant', 'Indirectly Useful', 'Not Relevant'] else 'Not Relevant'
-                    
-                    article_id = loop.run_until_complete(inspire_db.create_article(
-                        company_id=company_id,
-                        title=title,
-                        url=url or 'https://example.com/article',
-                        content=content or '',
-                        source=source or 'Unknown',
-                        published_date=None,
-                        relevance_score=row.get('confidence_score', 0.0),
-                        classification=db_classification
-                    ))
-                    articles_stored += 1
-                except Exception as e:
-                    logger.warning(f"[{task_id}] Failed to store article: {e}")
-            
-            loop.close()
+    except PipelineAborted:
+        raise
+    except Exception as e:
+        logger.error(f"[{task_id}] Database storage failed: {e}")
+        _fail_stage(self, job_identifier, f"Failed to store articles: {str(e)}", e)
+    
+    job['company_id'] = company_id
+    job['articles_stored'] = articles_stored
+    store.save_checkpoint(_run_id(job), "store", job)
+    return job
+
+
+@celery_app.task(name="app.tasks.unified_analysis_task.embed_articles", **STAGE_TASK_OPTIONS)
+def embed_articles(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 4 (cpu): chunk and embed the classified articles for the RAG extraction"""
+    completed = _completed_stage_job(self, job, "embed")
+    if completed:
+        return completed
+    task_id = self.request.id
+    job_identifier = job['job_identifier']
+    
+    logger.info(f"[{task_id}] 🔢 Step 4/4: Embedding article chunks for RAG analysis...")
+    _report_stage_start(self, job_identifier, "embed", "Embedding article chunks...")
+    
+    store = get_pipeline_store()
+    try:
+        articles_for_analysis = _articles_for_analysis(store.get(job['payloads']['classified']))
+        
+        # RAG service of this worker (shares the classification embedding model)
+        rag_service = worker_models.rag_service()
+        embedded = rag_service.embed_articles(articles_for_analysis)
+        logger.info(
+            f"[{task_id}] ✅ Embedded {embedded['stats']['chunks']} chunks "
+            f"in {embedded['stats']['seconds']:.1f}s"
+        )
+        
+    except Exception as e:
+        logger.error(f"[{task_id}] Embedding failed: {e}")
+        _fail_stage(self, job_identifier, f"Embedding failed: {str(e)}", e)
+    
+    job['payloads']['embeddings'] = store.put(_run_id(job), "embeddings", {
+        'texts': embedded['texts'],
+        'embeddings': embedded['embeddings'],
+    })
+    store.save_checkpoint(_run_id(job), "embed", job)
+    return job
+
+
+@celery_app.task(name="app.tasks.unified_analysis_task.extract_analysis", **STAGE_TASK_OPTIONS)
+def extract_analysis(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 5 (cpu): extract the 10 RAG categories and store the analysis"""
+    completed = _completed_stage_job(self, job, "extract")
+    if completed:
+        finalize_progress(job['job_identifier'], "completed", f"Analysis completed for {job['company_name']}.")
+        return completed['result']
+    task_id = self.request.id
+    job_identifier = job['job_identifier']
+    company_name = job['company_name']
+    company_id = job['company_id']
+    store = get_pipeline_store()
+    
+    # ============================================
+    # STEP 4: RAG Analysis (10 Categories)
+    # ============================================
+    logger.info(f"[{task_id}] 🤖 Step 4/4: Running RAG analysis (10 categories)...")
+    _report_stage_start(self, job_identifier, "extract", "Running RAG analysis (10 categories)...")
+    
+    try:
+        articles_for_analysis = _articles_for_analysis(store.get(job['payloads']['classified']))
+        embedded = store.get(job['payloads']['embeddings'])
+        precomputed_embeddings = dict(zip(embedded['texts'], embedded['embeddings']))
+        
+        # Checkpoint: categories extracted by an earlier attempt are not sent to the LLM again
+        completed_categories = store.get_optional(_run_id(job), "categories", {})
+        if completed_categories:
+            logger.info(f"[{task_id}] ⏯️ {len(completed_categories)} categories already extracted by an earlier attempt")
+        
+        def checkpoint_category(category_key: str, result: Dict[str, Any]):
+            completed_categories[category_key] = result
+            store.put(_run_id(job), "categories", completed_categories)
+        
+        # RAG service of this worker (shares the classification embedding model)
+        rag_service = worker_models.rag_service()
+        
+        # Incremental re-analysis: load the stored results of the previous run for this company
+        previous_analysis = None
+        if settings.rag_incremental_analysis and company_id:
+            try:
+                previous_analysis = run_sync(inspire_db.get_previous_rag_analysis(company_id))
+                if previous_analysis:
+                    logger.info(f"[{task_id}] ♻️ Found previous RAG analysis; unchanged categories will be reused")
+            except Exception as e:
+                logger.warning(f"[{task_id}] Could not load previous RAG analysis, running full analysis: {e}")
+                previous_analysis = None
+        
+        # Define progress callback for RAG analysis (75% to 90% = 15% range, 10 categories = 1.5% each)
+        def rag_progress_callback(category_name: str, category_num: int, total_categories: int):
+            """Progress callback for RAG category extraction (called as each category completes)"""
+            # Progress ranges from 75% (start) to 90% (end)
+            # Each completed category adds 1.5% progress; categories run concurrently
+            # so category_num counts completions, not the category's position
+            base_progress = 75.0
+            progress_per_category = 15.0 / total_categories
+            current_progress = base_progress + (category_num * progress_per_category)
             
-            logger.info(f"[{task_id}] ✅ Stored {articles_stored} articles in database")
             update_progress(
                 job_identifier,
-                70.0,
-                f"Stored {articles_stored} articles in database.",
+                current_progress,
+                f"Extracted {category_name} ({category_num}/{total_categories})...",
                 status="running",
                 extra={
-                    "stage": "storage",
-                    "articles_stored": articles_stored,
-                    "articles_total": total_classified_articles,
+                    "stage": "rag_analysis",
+                    "category_name": category_name,
+                    "category_num": category_num,
+                    "total_categories": total_categories,
                 },
             )
-            
-        except Exception as e:
-            logger.error(f"[{task_id}] Database storage failed: {e}")
-            finalize_progress(
-                job_identifier,
-                "failed",
-                f"Failed to store articles: {str(e)}"
-            )
-            return {"status": "failed", "error": str(e)}
         
-        # ============================================
-        # STEP 4: RAG Analysis (10 Categories)
-        # ============================================
-        logger.info(f"[{task_id}] 🤖 Step 4/4: Running RAG analysis (10 categories)...")
+        # Run RAG analysis (comprehensive extraction of 10 categories)
+        logger.info(f"[{task_id}] 🔬 Analyzing {len(articles_for_analysis)} articles with RAG...")
         update_progress(
             job_identifier,
             75.0,
-            "Running RAG analysis (10 categories)...",
+            "Starting RAG analysis (10 categories)...",
             status="running",
-            extra={"stage": "rag_analysis"}
+            extra={"stage": "rag_analysis", "category_num": 0, "total_categories": 10},
         )
         
-        try:
-            # Convert DataFrame to list of dicts for RAG analysis
-            articles_for_analysis = []
-            for _, row in df_classified.iterrows():
-                articles_for_analysis.append({
-                    'title': row['title'],
-                    'content': row['content']
-                })
-            
-            # Initialize RAG service INSIDE the task (not globally) with CPU-only mode
-            logger.info(f"[{task_id}] 📦 Initializing RAG service (CPU-only, models loaded in task)...")
-            
-            # Force CPU device for SentenceTransformer (ensure it's set)
-            import torch
-            torch.set_default_device('cpu')
-            # Disable MPS explicitly
-            if hasattr(torch.backends, 'mps'):
-                torch.backends.mps.is_available = lambda: False
-            if hasattr(torch, 'mps'):
-                torch.mps.is_available = lambda: False
-            
-            rag_service = RAGAnalysisService(
-                milvus_host=settings.milvus_host,
-                milvus_port=settings.milvus_port,
-                ollama_host=None,  # Deprecated - using llama.cpp now
-                llm_model=None  # Deprecated - using llama.cpp now
-            )
-            
-            # Define progress callback for RAG analysis (75% to 90% = 15% range, 10 categories = 1.5% each)
-            def rag_progress_callback(category_name: str, category_num: int, total_categories: int):
-                """Progress callback for RAG category extraction"""
-                # Progress ranges from 75% (start) to 90% (end)
-                # Each category adds 1.5% progress
-                base_progress = 75.0
-                progress_per_category = 15.0 / total_categories
-                current_progress = base_progress + (category_num * progress_per_category)
-                
-                update_progress(
-                    job_identifier,
-                    current_progress,
-                    f"Extracting {category_name} ({category_num}/{total_categories})...",
-                    status="running",
-                    extra={
-                        "stage": "rag_analysis",
-                        "category_name": category_name,
-                        "category_num": category_num,
-                        "total_categories": total_categories,
-                    },
-                )
-            
-            # Run RAG analysis (comprehensive extraction of 10 categories)
-            logger.info(f"[{task_id}] 🔬 Analyzing {len(articles_for_analysis)} articles with RAG...")
-            update_progress(
-                job_identifier,
-                75.0,
-                "Starting RAG analysis (10 categories)...",
-                status="running",
-                extra={"stage": "rag_analysis", "category_num": 0, "total_categories": 10},
-            )
-            
-            try:
-                rag_results = rag_service.analyze_comprehensive(
-                    articles=articles_for_analysis,
-                    company_name=company_name,
-                    sme_objective=sme_objective,
-                    progress_callback=rag_progress_callback
-                )
-                
-                # Extract the analysis results
-                analysis_results = rag_results['analysis']
-                rag_metadata = rag_results['metadata']
-            except Exception as rag_exc:
-                # If RAG analysis fails due to Milvus or other issues, try to handle it gracefully
-                error_msg = str(rag_exc)
-                error_type = type(rag_exc).__name__
-                error_repr = repr(rag_exc)
-                
-                logger.error(f"[{task_id}] RAG analysis exception ({error_type}): {rag_exc}")
-                logger.error(f"[{task_id}] Error message: {error_msg}")
-                logger.error(f"[{task_id}] Error repr: {error_repr}")
-                
-                # Check if it's a Milvus error - check multiple ways to be sure
-                is_milvus_error = (
-                    "Milvus" in error_msg or 
-                    "Milvus" in error_repr or
-                    "collection" in error_msg.lower() or 
-                    "MilvusException" in error_type or
-                    "MilvusException" in error_repr or
-                    "can't find collection" in error_msg.lower()
-                )
-                
-                if is_milvus_error:
-                    logger.warning(f"[{task_id}] ⚠️ Milvus error detected. Attempting to disable Milvus and retry with in-memory storage...")
-                    
-                    # Try to disable Milvus and retry once with in-memory storage
-                    try:
-                        rag_service.milvus_available = False
-                        rag_service.collection = None
-                        # Also clear any vector cache that might reference Milvus
-                        if hasattr(rag_service, 'vector_cache'):
-                            # Clear any Milvus-related cache entries
-                            for key in list(rag_service.vector_cache.keys()):
-                                entry = rag_service.vector_cache.get(key)
-                                if entry and entry.get('vector_storage') == 'milvus':
-                                    del rag_service.vector_cache[key]
-                        
-                        logger.info(f"[{task_id}] Retrying RAG analysis with Milvus disabled (in-memory only)...")
-                        
-                        rag_results = rag_service.analyze_comprehensive(
-                            articles=articles_for_analysis,
-                            company_name=company_name,
-                            sme_objective=sme_objective,
-                            progress_callback=rag_progress_callback
-                        )
-                        
-                        # Extract the analysis results
-                        analysis_results = rag_results['analysis']
-                        rag_metadata = rag_results['metadata']
-                        logger.info(f"[{task_id}] ✅ RAG analysis succeeded with in-memory storage after Milvus failure")
-                    except Exception as retry_exc:
-                        # If retry also fails, re-raise the original exception
-                        logger.error(f"[{task_id}] ❌ RAG analysis retry with in-memory storage also failed: {retry_exc}")
-                        raise rag_exc  # Re-raise the original exception
-                else:
-                    # For non-Milvus errors, just re-raise
-                    logger.warning(f"[{task_id}] Non-Milvus error detected, re-raising: {error_type}")
-                    raise
-            
-            logger.info(f"[{task_id}] ✅ RAG analysis completed")
-            logger.info(f"[{task_id}]    Items extracted: {rag_metadata['total_items_extracted']}")
-            logger.info(f"[{task_id}]    Average confidence: {rag_metadata['average_confidence']:.2%}")
-            logger.info(f"[{task_id}]    Duration: {rag_metadata['duration_seconds']:.1f}s")
-            
-            update_progress(
-                job_identifier,
-                90.0,
-                "RAG analysis complete. Preparing results...",
-                status="running",
-                extra={
-                    "stage": "rag_analysis",
-                    "items_extracted": rag_metadata['total_items_extracted'],
-                    "average_confidence": rag_metadata['average_confidence'],
-                },
-            )
-            
-            # Clean up RAG service to free memory
-            del rag_service
-            
-        except Exception as e:
-            logger.error(f"[{task_id}] RAG analysis failed: {e}")
-            finalize_progress(
-                job_identifier,
-                "failed",
-                f"RAG analysis failed: {str(e)}"
-            )
-            return {"status": "failed", "error": str(e)}
+        # Milvus failures are handled inside the service (circuit breaker + in-memory failover),
+        # so a Milvus outage never requires re-running the analysis here
+        rag_results = rag_service.analyze_comprehensive(
+            articles=articles_for_analysis,
+            company_name=company_name,
+            sme_objective=job['sme_objective'],
+            progress_callback=rag_progress_callback,
+            company_id=company_id,
+            previous_analysis=previous_analysis,
+            precomputed_embeddings=precomputed_embeddings,
+            completed_categories=completed_categories,
+            category_callback=checkpoint_category
+        )
+        
+        # Extract the analysis results
+        analysis_results = rag_results['analysis']
+        rag_metadata = rag_results['metadata']
+        if rag_metadata.get('milvus', {}).get('failed_over_to_memory'):
+            logger.warning(f"[{task_id}] ⚠️ Milvus failed during the analysis; finished with in-memory vectors")
+        
+        logger.info(f"[{task_id}] ✅ RAG analysis completed")
+        logger.info(f"[{task_id}]    Items extracted: {rag_metadata['total_items_extracted']}")
+        logger.info(f"[{task_id}]    Average confidence: {rag_metadata['average_confidence']:.2%}")
+        logger.info(f"[{task_id}]    Duration: {rag_metadata['duration_seconds']:.1f}s")
         
-        # ============================================
-        # STEP 5: Store RAG Analysis in Database
-        # ============================================
-        logger.info(f"[{task_id}] 💾 Storing RAG analysis results in database...")
         update_progress(
             job_identifier,
-            95.0,
-            "Storing RAG analysis results...",
+            90.0,
+            "RAG analysis complete. Preparing results...",
             status="running",
-            extra={"stage": "finalizing"}
+            extra={
+                "stage": "rag_analysis",
+                "items_extracted": rag_metadata['total_items_extracted'],
+                "average_confidence": rag_metadata['average_confidence'],
+            },
         )
         
+    except Exception as e:
+        logger.error(f"[{task_id}] RAG analysis failed: {e}")
+        _fail_stage(self, job_identifier, f"RAG analysis failed: {str(e)}", e)
+    
+    # ============================================
+    # STEP 5: Store RAG Analysis in Database
+    # ============================================
+    logger.info(f"[{task_id}] 💾 Storing RAG analysis results in database...")
+    update_progress(
+        job_identifier,
+        95.0,
+        "Storing RAG analysis results...",
+        status="running",
+        extra={"stage": "finalizing"}
+    )
+    
+    try:
+        # Format RAG results for database storage
+        def format_category_for_db(category_result):
+            """Format a RAG category result for database storage, truncating if too large"""
+            if not category_result or 'data' not in category_result:
+                return ''
+            max_bytes = 50 * 1024  # 50KB per field
+            json_str = json.dumps(category_result['data'], indent=2)
+            
+            encoded = json_str.encode('utf-8')
+            if len(encoded) > max_bytes:
+                truncated = encoded[:max_bytes]
+                while truncated and truncated[-1] & 0x80 and not (truncated[-1] & 0x40):
+                    truncated = truncated[:-1]
+                json_str = truncated.decode('utf-8', errors='ignore')
+                open_braces = json_str.count('{') - json_str.count('}')
+                if open_braces > 0:
+                    json_str += '\n' + '  ' * (open_braces - 1) + '}' * open_braces
+                logger.warning(f"[{task_id}] Truncated category data from {len(encoded)} to {len(truncated)} bytes")
+            
+            return json_str
+        
+        # Use async database calls
+        # STEP 5A: Save Company Info, Strengths, Opportunities in COMPANY table
         try:
-            # Format RAG results for database storage
-            def format_category_for_db(category_result):
-                """Format a RAG category result for database storage, truncating if too large"""
-                if not category_result or 'data' not in category_result:
-                    return ''
-                max_bytes = 50 * 1024  # 50KB per field
-                json_str = json.dumps(category_result['data'], indent=2)
-                
-                encoded = json_str.encode('utf-8')
-                if len(encoded) > max_bytes:
-                    truncated = encoded[:max_bytes]
-                    while truncated and truncated[-1] & 0x80 and not (truncated[-1] & 0x40):
-                        truncated = truncated[:-1]
-                    json_str = truncated.decode('utf-8', errors='ignore')
-                    open_braces = json_str.count('{') - json_str.count('}')
-                    if open_braces > 0:
-                        json_str += '\n' + '  ' * (open_braces - 1) + '}' * open_braces
-                    logger.warning(f"[{task_id}] Truncated category data from {len(encoded)} to {len(truncated)} bytes")
-                
-                return json_str
+            logger.info(f"[{task_id}] 💾 Saving Company Info, Strengths, Opportunities to company table...")
             
-            # Use async database calls
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            company_info_data = analysis_results.get('company_info', {})
+            strengths_data = analysis_results.get('strengths', {})
+            opportunities_data = analysis_results.get('opportunities', {})
             
-            # STEP 5A: Save Company Info, Strengths, Opportunities in COMPANY table
-            try:
-                logger.info(f"[{task_id}] 💾 Saving Company Info, Strengths, Opportunities to company table...")
-                
-                company_info_data = analysis_results.get('company_info', {})
-                strengths_data = analysis_results.get('strengths', {})
-                opportunities_data = analysis_results.get('opportunities', {})
+            if isinstance(company_info_data, list):
+                company_info_data = {'data': company_info_data}
+            elif not isinstance(company_info_data, dict):
+                company_info_data = {}
                 
-                if isinstance(company_info_data, list):
-                    company_info_data = {'data': company_info_data}
-                elif not isinstance(company_info_data, dict):
-                    company_info_data = {}
-                    
-                if isinstance(strengths_data, list):
-                    strengths_data = {'data': strengths_data}
-                elif not isinstance(strengths_data, dict):
-                    strengths_data = {}
-                    
-                if isinstance(opportunities_data, list):
-                    opportunities_data = {'data': opportunities_data}
-                elif not isinstance(opportunities_data, dict):
-                    opportunities_data = {}
+            if isinstance(strengths_data, list):
+                strengths_data = {'data': strengths_data}
+            elif not isinstance(strengths_data, dict):
+                strengths_data = {}
                 
-                company_info_str = format_category_for_db(company_info_data)
-                strengths_str = format_category_for_db(strengths_data)
-                opportunities_str = format_category_for_db(opportunities_data)
-                
-                industry = None
-                if company_info_data and isinstance(company_info_data, dict) and 'data' in company_info_data:
-                    data = company_info_data['data']
-                    if isinstance(data, dict):
-                        industry = data.get('industry')
-                
-                loop.run_until_complete(inspire_db.update_company(
-                    company_id=company_id,
-                    company_info=company_info_str,
-                    strengths=strengths_str,
-                    opportunities=opportunities_str,
-                    industry=industry if industry else None
-                ))
-                
-                logger.info(f"[{task_id}] ✅ Saved Company Info, Strengths, Opportunities to company table")
-                
-            except Exception as e:
-                logger.error(f"[{task_id}] Failed to save company intelligence: {e}")
-            
-            # STEP 5B: Save remaining 7 categories in ANALYSIS table
-            try:
-                analysis_id = loop.run_until_complete(inspire_db.create_analysis(
-                    company_id=company_id,
-                    latest_updates=format_category_for_db(analysis_results.get('latest_updates')),
-                    challenges=format_category_for_db(analysis_results.get('challenges')),
-                    decision_makers=format_category_for_db(analysis_results.get('decision_makers')),
-                    market_position=format_category_for_db(analysis_results.get('market_position')),
-                    future_plans=format_category_for_db(analysis_results.get('future_plans')),
-                    action_plan=format_category_for_db(analysis_results.get('action_plan')),
-                    solutions=format_category_for_db(analysis_results.get('solution')),
-                    analysis_type='RAG',
-                    date_analyzed=date.today(),
-                    status='COMPLETED'
-                ))
-                
-                logger.info(f"[{task_id}] ✅ Stored RAG analysis in analysis table (ID: {analysis_id})")
-                
-            except Exception as e:
-                logger.error(f"[{task_id}] Failed to store analysis: {e}")
-            
-            loop.close()
+            if isinstance(opportunities_data, list):
+                opportunities_data = {'data': opportunities_data}
+            elif not isinstance(opportunities_data, dict):
+                opportunities_data = {}
+            
+            company_info_str = format_category_for_db(company_info_data)
+            strengths_str = format_category_for_db(strengths_data)
+            opportunities_str = format_category_for_db(opportunities_data)
+            
+            industry = None
+            if company_info_data and isinstance(company_info_data, dict) and 'data' in company_info_data:
+                data = company_info_data['data']
+                if isinstance(data, dict):
+                    industry = data.get('industry')
+            
+            run_sync(inspire_db.update_company(
+                company_id=company_id,
+                company_info=company_info_str,
+                strengths=strengths_str,
+                opportunities=opportunities_str,
+                industry=industry if industry else None
+            ))
+            
+            logger.info(f"[{task_id}] ✅ Saved Company Info, Strengths, Opportunities to company table")
             
         except Exception as e:
-            logger.error(f"[{task_id}] Database storage failed: {e}")
-            # Continue anyway, analysis is complete
+            logger.error(f"[{task_id}] Failed to save company intelligence: {e}")
         
-        logger.info(f"[{task_id}] ✅ Unified analysis with RAG completed successfully!")
-        finalize_progress(
-            job_identifier,
-            "completed",
-            f"Analysis completed for {company_name}.",
-        )
-        
-        # Store final result in Redis
-        result_data = {
-            "status": "completed",
-            "company_id": company_id,
-            "company_name": company_name,
-            "articles_found": len(articles_data),
-            "articles_stored": articles_stored,
-            "rag_metadata": rag_metadata
-        }
-        
-        if redis_client:
-            try:
-                redis_client.setex(
-                    f"analysis_result:{job_identifier}",
-                    3600,
-                    json.dumps(result_data)
-                )
-            except Exception as e:
-                logger.warning(f"[{task_id}] Failed to store result in Redis: {e}")
-        
-        return result_data
+        # STEP 5B: Save remaining 7 categories in ANALYSIS table
+        try:
+            analysis_id = run_sync(inspire_db.create_analysis(
+                company_id=company_id,
+                latest_updates=format_category_for_db(analysis_results.get('latest_updates')),
+                challenges=format_category_for_db(analysis_results.get('challenges')),
+                decision_makers=format_category_for_db(analysis_results.get('decision_makers')),
+                market_position=format_category_for_db(analysis_results.get('market_position')),
+                future_plans=format_category_for_db(analysis_results.get('future_plans')),
+                action_plan=format_category_for_db(analysis_results.get('action_plan')),
+                solutions=format_category_for_db(analysis_results.get('solution')),
+                analysis_type='RAG',
+                date_analyzed=date.today(),
+                status='COMPLETED',
+                retrieval_state=json.dumps(rag_metadata.get('retrieval_state')) if rag_metadata.get('retrieval_state') else None
+            ))
+            
+            logger.info(f"[{task_id}] ✅ Stored RAG analysis in analysis table (ID: {analysis_id})")
+            
+        except Exception as e:
+            logger.error(f"[{task_id}] Failed to store analysis: {e}")
         
     except Exception as e:
-        logger.error(f"[{task_id}] Unified analysis failed: {e}")
-        finalize_progress(
-            job_identifier,
-            "failed",
-            f"Unified analysis failed: {str(e)}",
-        )
-        return {"status": "failed", "error": str(e)}
+        logger.error(f"[{task_id}] Database storage failed: {e}")
+        # Continue anyway, analysis is complete
+    
+    
+    logger.info(f"[{task_id}] ✅ Unified analysis with RAG completed successfully!")
+    finalize_progress(
+        job_identifier,
+        "completed",
+        f"Analysis completed for {company_name}.",
+    )
+    
+    # Store final result in Redis
+    result_data = {
+        "status": "completed",
+        "company_id": company_id,
+        "company_name": company_name,
+        "articles_found": job['articles_found'],
+        "articles_stored": job['articles_stored'],
+        "article_dedup": job['article_dedup'],
+        "rag_metadata": rag_metadata
+    }
+    
+    if redis_client:
+        try:
+            redis_client.setex(
+                f"analysis_result:{job_identifier}",
+                3600,
+                json.dumps(result_data)
+            )
+        except Exception as e:
+            logger.warning(f"[{task_id}] Failed to store result in Redis: {e}")
+    
+    # The run is finished: its payloads go, and the checkpoint keeps only the result for
+    # redelivered messages of this chain (no payload keys pointing at deleted entries)
+    store.save_checkpoint(_run_id(job), "extract", {**job, "payloads": {}, "result": result_data})
+    store.delete_job(_run_id(job), PIPELINE_PAYLOADS)
+    return result_data
+
+
+def build_unified_analysis_pipeline(
+    company_name: str,
+    company_location: str,
+    sme_id: int,
+    sme_objective: str,
+    max_articles: int,
+    company_id: Optional[int],
+    job_identifier: str,
+):
+    """The unified analysis as a chain of stage tasks: scrape → classify → store → embed → extract"""
+    job = {
+        "job_identifier": job_identifier,
+        "run_id": uuid4().hex,
+        "company_name": company_name,
+        "company_location": company_location,
+        "sme_id": sme_id,
+        "sme_objective": sme_objective,
+        "max_articles": max_articles,
+        "company_id": company_id,
+        "payloads": {},
+    }
+    return chain(
+        scrape_articles.s(job),
+        classify_articles.s(),
+        store_articles.s(),
+        embed_articles.s(),
+        extract_analysis.s(),
+    )
+
+
+def start_unified_analysis(**kwargs) -> AsyncResult:
+    """
+    Queue the unified analysis pipeline (arguments as in build_unified_analysis_pipeline).
+    
+    Returns the result of the chain's last stage; progress and the final result are
+    published in Redis under the job identifier.
+    """
+    return build_unified_analysis_pipeline(**kwargs).apply_async()
+
 
+@celery_app.task(bind=True, name="app.tasks.unified_analysis_task.run_unified_analysis")
+def run_unified_analysis(
+    self,
+    company_name: str,
+    company_location: str,
+    sme_id: int,
+    sme_objective: str,
+    max_articles: int,
+    company_id: Optional[int],
+    job_identifier: str,
+) -> Dict[str, Any]:
+    """
+    Queue the staged pipeline for a unified analysis.
+    
+    Kept so that messages queued before the pipeline was split into stage tasks still run;
+    new jobs are started with start_unified_analysis().
+    """
+    result = start_unified_analysis(
+        company_name=company_name,
+        company_location=company_location,
+        sme_id=sme_id,
+        sme_objective=sme_objective,
+        max_articles=max_articles,
+        company_id=company_id,
+        job_identifier=job_identifier,
+    )
+    logger.info(f"[{self.request.id}] Queued unified analysis pipeline for {company_name} (job {job_identifier})")
+    return {"status": "queued", "job_identifier": job_identifier, "pipeline_task_id": result.id}
@@ -0,0 +1,182 @@
+"""
+Long-lived event loops for sync code
+
+Celery tasks (threads pool) and the sync RAG entry points used to create and
+close an event loop for every piece of async work (asyncio.run /
+new_event_loop), several times per job. Each new loop also threw away the
+aiohttp sessions bound to the previous one, so every stage opened fresh TCP/TLS
+connections to SerpAPI and OpenAI.
+
+run_sync() instead runs coroutines on one loop per thread that lives as long
+as the thread; run_coroutine_sync() also works in a thread that is already
+running a loop, by handing the coroutine to a runner thread with its own
+long-lived loop. Runners are checked out one call at a time - a call never
+waits for a busy runner, so nested or many concurrent calls cannot starve each
+other - and a few idle ones are kept for reuse. loop_session() hands out one
+ClientSession per loop and name. Successive stages and tasks on the same worker
+thread - and concurrent analyses on the API server's loop - reuse those
+sessions and their keep-alive connections. MySQL connections are not loop-bound (inspire_db keeps a pymysql
+pool) and were already reused.
+"""
+
+import atexit
+import asyncio
+import threading
+import itertools
+import weakref
+import concurrent.futures
+from typing import Awaitable, Callable, Coroutine, Dict, List, Optional, TypeVar
+from loguru import logger
+
+import aiohttp
+
+T = TypeVar("T")
+
+_thread_state = threading.local()
+
+# loop -> {name: ClientSession}; entries go away with their loop
+_loop_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, aiohttp.ClientSession]]" = weakref.WeakKeyDictionary()
+_loop_sessions_lock = threading.Lock()
+
+# Idle runner threads kept for run_coroutine_sync() calls made while a loop is running
+_IDLE_RUNNERS = 4
+_idle_runners: "List[_LoopRunner]" = []
+_idle_runners_lock = threading.Lock()
+_runner_ids = itertools.count(1)
+
+
+def get_thread_loop() -> asyncio.AbstractEventLoop:
+    """This thread's event loop (created on first use, replaced if it was closed)"""
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_state.loop = loop
+    asyncio.set_event_loop(loop)
+    return loop
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run `coro` to completion on this thread's loop (the thread must not be running a loop already)"""
+    return get_thread_loop().run_until_complete(coro)
+
+
+class _LoopRunner:
+    """A daemon thread running its own event loop until stop()"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=f"loop-runner-{next(_runner_ids)}", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+            self.loop.run_until_complete(close_loop_sessions())
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        finally:
+            self.loop.close()
+
+    def submit(self, coro: Coroutine[object, object, T]) -> "concurrent.futures.Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self) -> None:
+        """Stop the loop once its current callbacks ran (the thread then closes its sessions and exits)"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+
+def _release_runner(runner: _LoopRunner) -> None:
+    """Keep a runner whose call finished for reuse, or stop it if enough are idle already"""
+    with _idle_runners_lock:
+        if len(_idle_runners) < _IDLE_RUNNERS:
+            _idle_runners.append(runner)
+            return
+    runner.stop()
+
+
+def run_coroutine_sync(coro: Coroutine[object, object, T], timeout: Optional[float] = None) -> T:
+    """
+    Run `coro` to completion from sync code. Without a running loop in this thread it runs on
+    the thread's own loop; otherwise (sync code called from async code, including code already
+    on a runner) on an idle runner thread's loop - or a new runner when none is idle - blocking
+    this thread for at most `timeout` seconds (the coroutine is cancelled when it times out).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return run_sync(coro)
+
+    with _idle_runners_lock:
+        runner = _idle_runners.pop() if _idle_runners else None
+    if runner is None:
+        runner = _LoopRunner()
+    future = runner.submit(coro)
+    # The runner goes back to the pool only once the coroutine is really done
+    future.add_done_callback(lambda _: _release_runner(runner))
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+def loop_session(name: str, factory: Callable[[], aiohttp.ClientSession]) -> aiohttp.ClientSession:
+    """
+    The running loop's shared ClientSession called `name`, created by `factory` on first use.
+    Callers must not close it; close_loop_sessions() does when the loop shuts down.
+    """
+    loop = asyncio.get_running_loop()
+    with _loop_sessions_lock:
+        sessions = _loop_sessions.setdefault(loop, {})
+        session = sessions.get(name)
+        if session is None or session.closed:
+            session = sessions[name] = factory()
+    return session
+
+
+async def close_loop_sessions() -> None:
+    """Close the shared sessions of the running loop"""
+    with _loop_sessions_lock:
+        sessions = _loop_sessions.pop(asyncio.get_running_loop(), {})
+    for name, session in sessions.items():
+        try:
+            await session.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to close shared HTTP session '{name}': {e}")
+
+
+def close_thread_loop() -> None:
+    """Close this thread's shared sessions and loop (the next run_sync starts a new one)"""
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None or loop.is_closed():
+        return
+    try:
+        loop.run_until_complete(close_loop_sessions())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        loop.close()
+        _thread_state.loop = None
+
+
+@atexit.register
+def _close_idle_loop_sessions() -> None:
+    """At interpreter exit, stop the idle runners and close the shared sessions of loops that are not running (worker threads' loops)"""
+    with _idle_runners_lock:
+        runners = _idle_runners[:]
+        _idle_runners.clear()
+    for runner in runners:
+        runner.stop()
+    for runner in runners:
+        runner.join(timeout=5)
+    with _loop_sessions_lock:
+        loops = list(_loop_sessions)
+    for loop in loops:
+        if loop.is_closed() or loop.is_running():
+            continue
+        try:
+            loop.run_until_complete(close_loop_sessions())
+        except Exception as e:
+            logger.debug(f"Could not close shared HTTP sessions at exit: {e}")
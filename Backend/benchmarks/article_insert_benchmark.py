@@ -0,0 +1,81 @@
+"""
+Benchmark: per-row create_article vs bulk create_articles
+
+The unified pipeline used to store a job's articles with one create_article
+call per row: a pool checkout, connection pings and one autocommitted INSERT
+each. create_articles writes them in one transaction with multi-row INSERTs.
+For each row count this measures, against the configured MySQL database:
+
+- per-row:      create_article in a loop (the previous storage step)
+- bulk:         create_articles (one transaction, multi-row INSERT)
+- bulk upsert:  create_articles(upsert=True) over the same urls again
+                (lookup + UPDATE of every row, as on a re-analysis)
+
+The rows go to a scratch company that is deleted afterwards (articles cascade).
+
+Usage (from Backend/):
+    python -m benchmarks.article_insert_benchmark [--rows 100 1000 10000] [--content-bytes 2000]
+"""
+
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from app.database_mysql_inspire import inspire_db
+
+
+def _articles(count: int, content_bytes: int, run: str) -> list:
+    content = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (content_bytes // 57 + 1))[:content_bytes]
+    return [
+        {
+            'title': f"Benchmark article {i}",
+            'url': f"https://example.com/benchmark/{run}/{i}",
+            'content': content,
+            'source': "benchmark",
+            'published_date': None,
+            'relevance_score': 0.5,
+            'classification': 'Not Relevant',
+        }
+        for i in range(count)
+    ]
+
+
+async def _per_row(company_id: int, articles: list) -> float:
+    started = time.perf_counter()
+    for article in articles:
+        await inspire_db.create_article(company_id=company_id, **article)
+    return time.perf_counter() - started
+
+
+async def _bulk(company_id: int, articles: list, upsert: bool = False) -> float:
+    started = time.perf_counter()
+    ids = await inspire_db.create_articles(company_id, articles, upsert=upsert)
+    elapsed = time.perf_counter() - started
+    assert len(ids) == len(articles)
+    return elapsed
+
+
+async def main(args):
+    company_id = await inspire_db.create_company(name=f"benchmark-{uuid4().hex[:8]}")
+    print(f"scratch company {company_id}, content {args.content_bytes} bytes per article (seconds, rows/s)")
+    header = f"{'rows':>8} {'per-row':>20} {'bulk':>20} {'bulk upsert':>20} {'speedup':>8}"
+    print(header)
+    print("-" * len(header))
+    try:
+        for count in args.rows:
+            per_row = await _per_row(company_id, _articles(count, args.content_bytes, f"row-{count}"))
+            bulk_articles = _articles(count, args.content_bytes, f"bulk-{count}")
+            bulk = await _bulk(company_id, bulk_articles)
+            upsert = await _bulk(company_id, bulk_articles, upsert=True)
+            cells = [f"{seconds:.3f} ({count / seconds:,.0f}/s)" for seconds in (per_row, bulk, upsert)]
+            print(f"{count:>8}" + "".join(f" {cell:>20}" for cell in cells) + f" {per_row / bulk:>7.1f}x")
+    finally:
+        await inspire_db.delete_company(company_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--content-bytes", type=int, default=2000, help="Article content size (TEXT column)")
+    asyncio.run(main(parser.parse_args()))
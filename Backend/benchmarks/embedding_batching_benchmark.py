@@ -0,0 +1,128 @@
+"""
+Benchmark: bge-m3 encoding throughput, fixed batches vs length-bucketed batches
+
+Encodes an article corpus the way classification does (title + content) and
+as RAG chunks, once with the previous call (SentenceTransformer.encode,
+batch_size=32, model's full max_seq_length) and once with encode_texts()
+(truncated to the per-use-case max_seq_length, token-budgeted batches).
+For classification it also runs both sets of embeddings through the trained
+classifier (ml_models/classification/best_model) and reports how often the
+labels agree: CLASSIFICATION_MAX_SEQ_LENGTH (or --classification-max-seq-length,
+to try a value) should only be lowered below the model's max_seq_length while
+that agreement stays at 1.000.
+
+The corpus comes from the article table (--from-db N) or a JSON Lines file
+with "title" and "content" fields (--corpus path).
+
+Usage (from Backend/):
+    python -m benchmarks.embedding_batching_benchmark --from-db 500
+    python -m benchmarks.embedding_batching_benchmark --corpus articles.jsonl [--limit 300]
+    python -m benchmarks.embedding_batching_benchmark --from-db 500 --classification-max-seq-length 2048
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import time
+import numpy as np
+
+from app.config import settings
+from app.services.embedding_encoder import encode_texts, token_lengths
+
+MODEL_DIR = "ml_models/classification/best_model"
+
+
+def load_corpus(args) -> list:
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        from app.database_mysql_inspire import inspire_db
+        rows = asyncio.run(inspire_db.db.fetch_all(
+            "SELECT title, content FROM article ORDER BY article_id DESC LIMIT %s", (args.from_db,)
+        ))
+    texts = [f"{row.get('title') or ''} {row.get('content') or ''}".strip() for row in rows]
+    return [text for text in texts if text][:args.limit]
+
+
+def _chunk_corpus(model, articles: list, chunk_tokens: int) -> list:
+    from app.services.text_chunker import chunk_text
+
+    def count_tokens(texts):
+        return [len(ids) for ids in model.tokenizer(texts, add_special_tokens=False)['input_ids']]
+
+    chunks = []
+    for article in articles:
+        chunks.extend(chunk_text(article, count_tokens, max_tokens=chunk_tokens, overlap_tokens=80))
+    return chunks
+
+
+def classify(embeddings: np.ndarray) -> np.ndarray:
+    """Labels of the production classifier for (normalized) article embeddings"""
+    with open(os.path.join(MODEL_DIR, "best_classifier.pkl"), "rb") as f:
+        classifier = pickle.load(f)
+    with open(os.path.join(MODEL_DIR, "scaler.pkl"), "rb") as f:
+        scaler = pickle.load(f)
+    return classifier.predict(scaler.transform(embeddings))
+
+
+def _run(texts: list, baseline, bucketed) -> tuple:
+    results = []
+    for label, fn in (("fixed batch_size=32", baseline), ("length-bucketed", bucketed)):
+        started = time.perf_counter()
+        embeddings = fn()
+        seconds = time.perf_counter() - started
+        results.append(embeddings)
+        print(f"  {label:<22} {seconds:>8.2f}s  {len(texts) / seconds:>8.1f} texts/s")
+
+    # Same inputs (up to truncation) should give nearly the same vectors
+    a, b = (r / np.linalg.norm(r, axis=1, keepdims=True) for r in results)
+    print(f"  mean cosine(before, after) = {float(np.mean(np.sum(a * b, axis=1))):.4f}")
+    return a, b
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-db", type=int, metavar="N", help="Use the N most recent stored articles")
+    source.add_argument("--corpus", help="JSON Lines file with title/content per line")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--model", default="BAAI/bge-m3")
+    parser.add_argument("--classification-max-seq-length", type=int, default=settings.classification_max_seq_length,
+                        help="Token limit to evaluate for classification (default: CLASSIFICATION_MAX_SEQ_LENGTH)")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    articles = load_corpus(args)
+    model = SentenceTransformer(args.model, device='cpu')
+    chunks = _chunk_corpus(model, articles, settings.rag_embedding_max_seq_length - 2)
+
+    full_lengths = token_lengths(model, articles, model.max_seq_length)
+    print(
+        f"{len(articles)} articles (tokens: median {int(np.median(full_lengths))}, max {max(full_lengths)}), "
+        f"{len(chunks)} chunks; batch budget {settings.embedding_batch_max_tokens} tokens"
+    )
+
+    def fixed(texts):
+        return lambda: model.encode(texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True)
+
+    classification_length = args.classification_max_seq_length or model.max_seq_length
+    print(f"\nClassification (whole articles, max_seq_length {classification_length}):")
+    before, after = _run(articles, fixed(articles),
+                         lambda: encode_texts(model, articles, max_seq_length=classification_length))
+    if os.path.isdir(MODEL_DIR):
+        agreement = float(np.mean(classify(before) == classify(after)))
+        print(f"  classifier label agreement (full length vs {classification_length}) = {agreement:.3f}")
+    else:
+        print(f"  (no classifier at {MODEL_DIR}; label agreement not checked)")
+
+    print(f"\nRAG chunks (max_seq_length {settings.rag_embedding_max_seq_length}):")
+    _run(chunks, fixed(chunks),
+         lambda: encode_texts(model, chunks, max_seq_length=settings.rag_embedding_max_seq_length))
+
+
+if __name__ == "__main__":
+    main()
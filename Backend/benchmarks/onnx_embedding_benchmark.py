@@ -0,0 +1,144 @@
+"""
+Benchmark: PyTorch fp32 vs int8 ONNX bge-m3 (load time, throughput, latency, RSS, accuracy)
+
+Each backend runs in its own subprocess so resident memory is measured
+cleanly. Both embed the same article corpus (title + content, as
+classification does); the embeddings are then compared directly (cosine)
+and through the production classifier in ml_models/classification/best_model
+(label agreement, and accuracy when the corpus carries a "label" field).
+
+Usage (from Backend/):
+    python -m benchmarks.onnx_embedding_benchmark --from-db 300
+    python -m benchmarks.onnx_embedding_benchmark --corpus labelled_articles.jsonl
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from app.config import settings
+from benchmarks.embedding_batching_benchmark import MODEL_DIR, classify, load_corpus
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_backend(args) -> None:
+    """Subprocess side: load one backend, embed the corpus, save vectors and timings"""
+    from app.services.embedding_backend import load_embedding_model
+    from app.services.embedding_encoder import encode_texts
+
+    with open(args.texts_file) as f:
+        texts = [row['text'] for row in json.load(f)]
+
+    started = time.perf_counter()
+    model = load_embedding_model("BAAI/bge-m3", backend=args.backend)
+    load_seconds = time.perf_counter() - started
+    rss_after_load = _rss_mb()
+
+    # Single-text latency (query embedding path)
+    latencies = []
+    for text in texts[:args.latency_samples]:
+        started = time.perf_counter()
+        encode_texts(model, [text], max_seq_length=settings.classification_max_seq_length)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    embeddings = encode_texts(
+        model, texts, max_seq_length=settings.classification_max_seq_length, normalize_embeddings=True
+    )
+    batch_seconds = time.perf_counter() - started
+
+    np.save(args.output, embeddings)
+    print(json.dumps({
+        'backend': args.backend,
+        'model_class': type(model).__name__,
+        'load_seconds': round(load_seconds, 2),
+        'texts_per_second': round(len(texts) / batch_seconds, 2),
+        'latency_ms_p50': round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+        'latency_ms_p95': round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+        'rss_mb_after_load': round(rss_after_load, 1),
+        'rss_mb_peak': round(_rss_mb(), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--from-db", type=int, metavar="N", help="Use the N most recent stored articles")
+    source.add_argument("--corpus", help="JSON Lines file with title/content (and optional label) per line")
+    parser.add_argument("--limit", type=int, default=300)
+    parser.add_argument("--latency-samples", type=int, default=20)
+    # Subprocess mode
+    parser.add_argument("--backend", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    parser.add_argument("--texts-file", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        _run_backend(args)
+        return
+    if not (args.from_db or args.corpus):
+        parser.error("one of --from-db or --corpus is required")
+
+    labels = None
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()][:args.limit]
+        texts = [f"{row.get('title') or ''} {row.get('content') or ''}".strip() for row in rows]
+        if all('label' in row for row in rows):
+            labels = [row['label'] for row in rows]
+    else:
+        texts = load_corpus(args)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        texts_file = os.path.join(workdir, "texts.json")
+        with open(texts_file, "w") as f:
+            json.dump([{'text': text} for text in texts], f)
+
+        reports, vectors = {}, {}
+        for backend in ("torch", "onnx"):
+            output = os.path.join(workdir, f"{backend}.npy")
+            completed = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.onnx_embedding_benchmark",
+                    "--backend", backend, "--texts-file", texts_file, "--output", output,
+                    "--latency-samples", str(args.latency_samples),
+                ],
+                capture_output=True, text=True, check=True
+            )
+            reports[backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+            vectors[backend] = np.load(output)
+
+    print(f"{len(texts)} articles, max_seq_length {settings.classification_max_seq_length or 'model default'}\n")
+    keys = ['model_class', 'load_seconds', 'texts_per_second', 'latency_ms_p50', 'latency_ms_p95',
+            'rss_mb_after_load', 'rss_mb_peak']
+    print(f"{'':<20} {'torch':>16} {'onnx':>16}")
+    for key in keys:
+        print(f"{key:<20} {str(reports['torch'][key]):>16} {str(reports['onnx'][key]):>16}")
+    if reports['onnx']['model_class'] != 'OnnxEmbeddingModel':
+        print("\n⚠️ The ONNX run fell back to PyTorch (is onnxruntime installed?)")
+
+    cosine = np.sum(vectors['torch'] * vectors['onnx'], axis=1)
+    print(f"\ncosine(torch, onnx): mean {cosine.mean():.4f}, min {cosine.min():.4f}")
+
+    predictions = {backend: classify(vectors[backend]) for backend in vectors}
+    print(f"classifier label agreement: {np.mean(predictions['torch'] == predictions['onnx']):.3f}")
+    if labels is not None:
+        with open(os.path.join(MODEL_DIR, "model_config.json")) as f:
+            label_ids = {name: int(i) for i, name in json.load(f)['label_mapping'].items()}
+        truth = np.array([label_ids.get(label, label) for label in labels])
+        for backend in predictions:
+            print(f"classifier accuracy ({backend}): {np.mean(predictions[backend] == truth):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark: end-to-end vector backend cost per analysis vs corpus size
+
+One analysis stores its chunk vectors once and then runs one retrieval per
+category, so the relevant cost is store + queries, not query latency alone.
+For each corpus size this measures:
+
+- memory-exact: build the InMemoryVectorIndex + one top-k scan per category
+- memory-hnsw:  build the HNSW graph + one search per category (recall@k vs exact)
+- milvus:       upsert into a scratch collection + one search per category
+                (only with --milvus; the collection is dropped afterwards)
+
+and prints the corpus size from which each backend becomes the cheapest, next
+to the configured RAG_MEMORY_INDEX_HNSW_MIN_CHUNKS / RAG_MILVUS_MIN_CHUNKS
+thresholds used by app.services.vector_planner.
+
+Reference run (1 vCPU, dim 1024, float16 index, 10 categories, top_k 8; ms):
+
+      chunks   memory-exact (store+queries)   memory-hnsw (build+queries)   recall
+         300                 1.6+5.5=7.1                  28.7+0.8=29.5     1.000
+        1000               5.6+19.8=25.5                262.8+1.9=264.6     1.000
+        5000            46.9+138.8=185.7              2579.9+2.2=2582.1     1.000
+       20000           139.7+571.0=710.8            17637.1+4.3=17641.4     1.000
+       50000         521.8+1816.5=2338.3            65680.6+4.2=65684.8     1.000
+
+Usage (from Backend/):
+    python -m benchmarks.vector_backend_benchmark [--sizes 300 1000 5000 20000 50000]
+    python -m benchmarks.vector_backend_benchmark --milvus [--milvus-host localhost --milvus-port 19530]
+"""
+
+import argparse
+import time
+import numpy as np
+
+from app.config import settings
+from app.services.vector_index import HNSWLIB_AVAILABLE, InMemoryVectorIndex
+
+
+def _clustered_corpus(rng: np.random.Generator, size: int, dim: int) -> np.ndarray:
+    # Articles about one company: chunks cluster around a few topics rather than being uniform noise
+    centers = rng.standard_normal((max(4, size // 50), dim)).astype(np.float32)
+    assignment = rng.integers(0, len(centers), size)
+    return centers[assignment] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+
+
+def _run_memory(corpus: np.ndarray, queries: np.ndarray, top_k: int, approximate: bool):
+    started = time.perf_counter()
+    index = InMemoryVectorIndex(corpus, dtype=settings.rag_memory_index_dtype, hnsw_min_size=0 if approximate else None)
+    store_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    hits = [index.search(query[None, :], top_k)[0][0] for query in queries]
+    query_ms = (time.perf_counter() - started) * 1000
+    return store_ms, query_ms, hits
+
+
+def _run_milvus(store, corpus: np.ndarray, queries: np.ndarray, top_k: int, size: int):
+    chunks = [{'text': f"chunk {i}", 'title': "benchmark"} for i in range(size)]
+    company_key, signature = "benchmark", f"benchmark-{size}"
+
+    started = time.perf_counter()
+    for start in range(0, size, 2000):  # keep each upsert under the gRPC message limit
+        store.upsert_chunks(company_key, signature, chunks[start:start + 2000], corpus[start:start + 2000])
+    store_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for query in queries:
+        store.search(company_key, signature, [query.tolist()], top_k)
+    query_ms = (time.perf_counter() - started) * 1000
+    return store_ms, query_ms
+
+
+def _crossover(sizes, totals, backend: str, others):
+    """Smallest measured size from which `backend` stays the cheapest of `others`"""
+    others = [other for other in others if other in totals]
+    cheapest = [all(totals[backend][i] < totals[other][i] for other in others) for i in range(len(sizes))]
+    for i, size in enumerate(sizes):
+        if all(cheapest[i:]):
+            return size
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=1024, help="Embedding dimension (bge-m3: 1024)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 1000, 5000, 20000, 50000])
+    parser.add_argument("--categories", type=int, default=10, help="Retrievals per analysis (one per category)")
+    parser.add_argument("--top-k", type=int, default=max(settings.rag_top_k, settings.rag_mmr_fetch_k))
+    parser.add_argument("--milvus", action="store_true", help="Also measure Milvus (scratch collection)")
+    parser.add_argument("--milvus-host", default=settings.milvus_host)
+    parser.add_argument("--milvus-port", default=settings.milvus_port)
+    args = parser.parse_args()
+
+    store = None
+    if args.milvus:
+        from app.services.milvus_store import MILVUS_AVAILABLE, MilvusChunkStore, get_milvus_connection
+        if not MILVUS_AVAILABLE:
+            parser.error("pymilvus is not installed")
+        connection = get_milvus_connection(args.milvus_host, args.milvus_port)
+        if not connection.available:
+            parser.error(f"Milvus at {args.milvus_host}:{args.milvus_port} is unreachable: {connection.last_error}")
+        store = MilvusChunkStore(f"{settings.milvus_collection_name}_benchmark", args.dim, connection=connection)
+
+    rng = np.random.default_rng(0)
+    backends = ["memory-exact"] + (["memory-hnsw"] if HNSWLIB_AVAILABLE else []) + (["milvus"] if store else [])
+    totals = {backend: [] for backend in backends}
+
+    print(f"dim={args.dim} categories={args.categories} top_k={args.top_k} "
+          f"index dtype={settings.rag_memory_index_dtype} (ms per analysis: store + queries)")
+    header = f"{'chunks':>8}" + "".join(f" {backend:>22}" for backend in backends) + f" {'hnsw recall':>12}"
+    print(header)
+    print("-" * len(header))
+
+    try:
+        for size in args.sizes:
+            corpus = _clustered_corpus(rng, size, args.dim)
+            queries = corpus[rng.integers(0, size, args.categories)] + 0.3 * rng.standard_normal(
+                (args.categories, args.dim)).astype(np.float32)
+            cells, recall = [], None
+
+            store_ms, query_ms, exact_hits = _run_memory(corpus, queries, args.top_k, approximate=False)
+            totals["memory-exact"].append(store_ms + query_ms)
+            cells.append(f"{store_ms:.1f}+{query_ms:.1f}={store_ms + query_ms:.1f}")
+
+            if "memory-hnsw" in totals:
+                store_ms, query_ms, hnsw_hits = _run_memory(corpus, queries, args.top_k, approximate=True)
+                totals["memory-hnsw"].append(store_ms + query_ms)
+                cells.append(f"{store_ms:.1f}+{query_ms:.1f}={store_ms + query_ms:.1f}")
+                recall = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(exact_hits, hnsw_hits)])
+
+            if store:
+                store_ms, query_ms = _run_milvus(store, corpus, queries, args.top_k, size)
+                totals["milvus"].append(store_ms + query_ms)
+                cells.append(f"{store_ms:.1f}+{query_ms:.1f}={store_ms + query_ms:.1f}")
+
+            recall_cell = f"{recall:>12.3f}" if recall is not None else f"{'n/a':>12}"
+            print(f"{size:>8}" + "".join(f" {cell:>22}" for cell in cells) + recall_cell)
+    finally:
+        if store:
+            from app.services.milvus_store import utility
+            utility.drop_collection(store.collection_name, using=store.connection.alias)
+
+    print()
+    if "memory-hnsw" in totals:
+        size = _crossover(args.sizes, totals, "memory-hnsw", ["memory-exact"])
+        print(f"memory-hnsw cheapest from: {size or 'never (in the measured sizes)'}"
+              f"  [RAG_MEMORY_INDEX_HNSW_MIN_CHUNKS={settings.rag_memory_index_hnsw_min_chunks}]")
+    if "milvus" in totals:
+        size = _crossover(args.sizes, totals, "milvus", ["memory-exact", "memory-hnsw"])
+        print(f"milvus cheapest from: {size or 'never (in the measured sizes)'}"
+              f"  [RAG_MILVUS_MIN_CHUNKS={settings.rag_milvus_min_chunks}]")
+
+
+if __name__ == "__main__":
+    main()
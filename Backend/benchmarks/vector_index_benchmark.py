@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: in-memory retrieval latency vs corpus size
+
+Compares the previous retrieval path (sklearn cosine_similarity + full argsort,
+one query at a time) with InMemoryVectorIndex (exact float32/float16, and HNSW
+when hnswlib is installed) for a batch of 10 category queries.
+
+Usage (from Backend/):
+    python -m benchmarks.vector_index_benchmark [--dim 1024] [--sizes 500 2000 10000 50000]
+"""
+
+import argparse
+import time
+import numpy as np
+
+from app.services.vector_index import InMemoryVectorIndex, HNSWLIB_AVAILABLE
+
+
+def _time_ms(fn, repeats: int) -> float:
+    fn()  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=1024, help="Embedding dimension (bge-m3: 1024)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=10, help="Queries per batch (one per category)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    print(f"dim={args.dim} queries/batch={args.queries} top_k={args.top_k} (ms per batch)")
+    header = f"{'chunks':>8} {'sklearn':>10} {'exact f32':>10} {'exact f16':>10} {'hnsw':>10}"
+    print(header)
+    print("-" * len(header))
+
+    for size in args.sizes:
+        corpus = rng.standard_normal((size, args.dim)).astype(np.float32)
+
+        def sklearn_path():
+            for query in queries:
+                similarities = cosine_similarity(query.reshape(1, -1), corpus)[0]
+                np.argsort(similarities)[::-1][:args.top_k]
+
+        exact32 = InMemoryVectorIndex(corpus, dtype="float32")
+        exact16 = InMemoryVectorIndex(corpus, dtype="float16")
+        row = [
+            _time_ms(sklearn_path, args.repeats),
+            _time_ms(lambda: exact32.search(queries, args.top_k), args.repeats),
+            _time_ms(lambda: exact16.search(queries, args.top_k), args.repeats),
+        ]
+
+        if HNSWLIB_AVAILABLE:
+            hnsw = InMemoryVectorIndex(corpus, hnsw_min_size=0)
+            row.append(_time_ms(lambda: hnsw.search(queries, args.top_k), args.repeats))
+            hnsw_cell = f"{row[3]:>10.2f}"
+        else:
+            hnsw_cell = f"{'n/a':>10}"
+
+        print(f"{size:>8} {row[0]:>10.2f} {row[1]:>10.2f} {row[2]:>10.2f} {hnsw_cell}")
+
+
+if __name__ == "__main__":
+    main()
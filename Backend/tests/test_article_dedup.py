@@ -0,0 +1,81 @@
+from app.services.article_dedup import deduplicate_articles, normalize_title
+
+
+def make_story(topic: str, sentences: int = 10) -> str:
+    return " ".join(f"{topic} sentence {i} describes what happened to the company this quarter." for i in range(sentences))
+
+
+def article(title, content="", source="Outlet", url=None):
+    return {'title': title, 'content': content, 'source': source, 'url': url or f"https://{source.lower()}.example/{title}"}
+
+
+def test_normalize_title_strips_outlet_suffix():
+    assert normalize_title("Acme raises $10m in Series A - Reuters") == "acme raises 10m in series a"
+    assert normalize_title("Acme raises $10m in Series A | TechCrunch") == "acme raises 10m in series a"
+    # The suffix stays when stripping it would leave too little
+    assert normalize_title("Update - Acme Corp") == "update acme corp"
+
+
+def test_republished_articles_collapse_into_one_with_sources():
+    articles = [
+        article("Acme opens new plant in Kigali - Reuters", "Short copy.", source="Reuters"),
+        article("Unrelated story about the weather this week", make_story("Weather"), source="Blog"),
+        article("Acme opens new plant in Kigali | TechCrunch", make_story("Plant"), source="TechCrunch"),
+    ]
+
+    deduplicated, stats = deduplicate_articles(articles)
+
+    assert len(deduplicated) == 2
+    acme = deduplicated[0]
+    # The copy with the most content represents the cluster, in first-appearance order
+    assert acme['source'] == "TechCrunch"
+    assert acme['duplicate_count'] == 1
+    assert [s['source'] for s in acme['sources']] == ["Reuters", "TechCrunch"]
+    assert deduplicated[1]['sources'] == [{'source': "Blog", 'url': articles[1]['url']}]
+    assert stats['duplicates_removed'] == 1
+    assert stats['title_matches'] == 1
+    assert stats['content_matches'] == 0
+
+
+def test_near_identical_content_collapses_across_titles():
+    story = make_story("Expansion", 12)
+    articles = [
+        article("Acme expands to three new markets", story, source="A"),
+        article("Acme's regional push continues", story.replace("sentence 4", "sentence four"), source="B"),
+    ]
+
+    deduplicated, stats = deduplicate_articles(articles)
+
+    assert len(deduplicated) == 1
+    assert stats['content_matches'] == 1
+    assert stats['clusters_with_duplicates'] == 1
+
+
+def test_generic_titles_do_not_merge_unrelated_articles():
+    articles = [
+        article("Press Release", make_story("Funding"), source="A"),
+        article("Press Release", make_story("Lawsuit"), source="B"),
+        article("Untitled", "Too short for a fingerprint.", source="C"),
+        article("Untitled", "Another short unrelated text.", source="D"),
+        article("Company Update - News", "", source="E"),
+        article("Company Update - News", "", source="F"),
+    ]
+
+    deduplicated, stats = deduplicate_articles(articles)
+
+    assert len(deduplicated) == len(articles)
+    assert stats['duplicates_removed'] == 0
+
+
+def test_generic_titles_still_merge_on_content():
+    story = make_story("Partnership", 12)
+    articles = [
+        article("Press Release", story, source="A"),
+        article("Press Release", story, source="B"),
+    ]
+
+    deduplicated, stats = deduplicate_articles(articles)
+
+    assert len(deduplicated) == 1
+    assert stats['title_matches'] == 0
+    assert stats['content_matches'] == 1
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services import context_builder
+from app.services.context_builder import count_tokens, format_context_chunk, select_context_chunks
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Character-based token estimate: deterministic, and tiktoken needs its encoding files"""
+    monkeypatch.setattr(context_builder, "TIKTOKEN_AVAILABLE", False)
+
+
+def make_chunk(text, similarity, title="Article"):
+    return {'text': text, 'title': title, 'similarity': similarity}
+
+
+def context_tokens(selected):
+    return count_tokens("\n\n".join(format_context_chunk(chunk) for chunk in selected))
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_selection_never_exceeds_the_token_budget():
+    rng = np.random.default_rng(3)
+    chunks = [
+        make_chunk(" ".join(["evidence"] * int(rng.integers(5, 30))) + f" item {i}.", 1.0 - i / 100)
+        for i in range(30)
+    ]
+    embeddings = np.stack([unit(rng.normal(size=16)) for _ in chunks])
+
+    for budget in (100, 250, 600):
+        selected, stats = select_context_chunks(chunks, embeddings, token_budget=budget, max_chunks=20)
+        assert len(selected) > 1
+        assert stats['context_tokens'] <= budget
+        # The joined context, blank-line separators included, stays within the budget
+        assert context_tokens(selected) <= budget
+
+
+def test_best_chunk_is_kept_even_over_budget():
+    chunks = [make_chunk("long " * 200, 0.9), make_chunk("short", 0.8)]
+
+    selected, stats = select_context_chunks(chunks, None, token_budget=10, max_chunks=5)
+
+    assert selected == chunks[:1]
+    assert stats['selected'] == 1
+
+
+def test_near_duplicate_chunks_are_deprioritized():
+    story = unit([1.0, 0.0, 0.0])
+    chunks = [
+        make_chunk("Acme opens a plant in Kigali.", 0.95),
+        make_chunk("Acme opens a new plant in Kigali.", 0.94),
+        make_chunk("Acme hires a new chief executive.", 0.80),
+    ]
+    embeddings = np.stack([story, unit([0.99, 0.01, 0.0]), unit([0.2, 0.98, 0.0])])
+
+    selected, _ = select_context_chunks(chunks, embeddings, token_budget=1000, max_chunks=2, mmr_lambda=0.5)
+
+    assert selected == [chunks[0], chunks[2]]
+    # Without embeddings the retrieval order is kept
+    plain, _ = select_context_chunks(chunks, None, token_budget=1000, max_chunks=2)
+    assert plain == chunks[:2]
+
+
+def test_estimated_token_count_without_tiktoken():
+    assert count_tokens("") == 0
+    assert count_tokens("abcdefgh") == 2
+    assert count_tokens("abcdefghi") == 3
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.services import llm_cache as llm_cache_module
+from app.services.llm_cache import LLMResponseCache, _DiskBackend, make_llm_cache_key
+
+
+BASE = dict(model="gpt-4o", system_message="You are an analyst.", prompt="Summarize Acme.", temperature=0.0, max_tokens=500)
+
+
+def key(**overrides):
+    return make_llm_cache_key(**{**BASE, **overrides})
+
+
+def test_cache_key_is_stable():
+    assert key() == key()
+    # A missing system message is the same request as an empty one
+    assert key(system_message=None) == key(system_message="")
+
+
+@pytest.mark.parametrize("change", [
+    {'model': "llama3.1"},
+    {'system_message': "You are a lawyer."},
+    {'prompt': "Summarize Acme Corp."},
+    {'temperature': 0.2},
+    {'max_tokens': 1000},
+])
+def test_cache_key_changes_with_every_request_field(change):
+    assert key(**change) != key()
+
+
+def test_is_cacheable_applies_temperature_and_bypass_rules():
+    cache = LLMResponseCache(backend=object(), max_temperature=0.5)
+
+    assert cache.is_cacheable(0.0)
+    assert cache.is_cacheable(0.5)
+    assert not cache.is_cacheable(0.7)
+    assert not cache.is_cacheable(0.0, bypass=True)
+    assert cache.stats()['bypassed'] == 2
+
+
+def test_nothing_is_cacheable_without_a_backend():
+    assert not LLMResponseCache(backend=None).is_cacheable(0.0)
+
+
+def test_disk_backend_round_trip_and_expiry(tmp_path, monkeypatch):
+    backend = _DiskBackend(str(tmp_path))
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now[0])
+
+    backend.set("a", "first answer", ttl_seconds=60)
+    backend.set("a", "second answer", ttl_seconds=60)
+    assert backend.get("a") == "second answer"
+    assert backend.get("missing") is None
+
+    now[0] += 61
+    assert backend.get("a") is None
+
+
+def test_cache_counts_hits_and_misses(tmp_path):
+    cache = LLMResponseCache(_DiskBackend(str(tmp_path)))
+
+    async def run():
+        assert await cache.get("k") is None
+        await cache.set("k", "answer")
+        await cache.set("empty", "")
+        assert await cache.get("k") == "answer"
+        assert await cache.get("empty") is None
+
+    asyncio.run(run())
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['backend']) == (1, 2, "disk")
@@ -0,0 +1,108 @@
+import time
+import types
+
+import pytest
+
+from app.services import milvus_store
+from app.services.milvus_store import CircuitBreaker, MilvusConnectionManager, MilvusUnavailableError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manual monotonic clock for the breaker's reset timeout"""
+    fake = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(milvus_store, "time", types.SimpleNamespace(monotonic=lambda: fake.now, time=time.time))
+    return fake
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats == {'opened': 1, 'rejected': 1}
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_turns_half_open_and_allows_one_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+
+    clock.now += 29.0
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 1.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    assert breaker.allow_request()
+    # Only one trial call at a time
+    assert not breaker.allow_request()
+
+
+def test_successful_trial_closes_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 30.0
+    assert breaker.allow_request()
+
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+    breaker.trip()
+    clock.now += 30.0
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats['opened'] == 2
+    # The reset timeout starts again from the failed trial
+    clock.now += 29.0
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 1.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_connection_manager_fails_fast_while_open(clock, monkeypatch):
+    manager = MilvusConnectionManager("localhost", "19530", breaker=CircuitBreaker(failure_threshold=2))
+    manager._connected = True
+    monkeypatch.setattr(manager, "_connect", lambda: setattr(manager, "_connected", True))
+    monkeypatch.setattr(milvus_store, "connections", types.SimpleNamespace(disconnect=lambda alias: None))
+    calls = []
+
+    def failing():
+        calls.append("failing")
+        raise ConnectionError("server down")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            manager.call(failing)
+    assert not manager.available
+
+    with pytest.raises(MilvusUnavailableError):
+        manager.call(failing)
+    assert calls == ["failing", "failing"]
+
+    clock.now += manager.breaker.reset_timeout
+    assert manager.call(lambda: "ok") == "ok"
+    assert manager.available
+    assert manager.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.services.milvus_store import MilvusChunkStore, MilvusConnectionManager
+
+
+class FakeCollection:
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, rows):
+        self.upserts.append(rows)
+
+
+def make_store(monkeypatch):
+    connection = MilvusConnectionManager("localhost", "19530")
+    connection._connected = True
+    monkeypatch.setattr(connection, "submit_gc", lambda operation: None)
+    store = MilvusChunkStore("test_chunks", embedding_dim=4, connection=connection)
+    collection = FakeCollection()
+    monkeypatch.setattr(store, "get_collection", lambda: collection)
+    return store, collection
+
+
+def test_upsert_chunks_sends_rows_in_batches(monkeypatch):
+    store, collection = make_store(monkeypatch)
+    chunks = [{'text': f"chunk {i}", 'title': "Article"} for i in range(2500)]
+    embeddings = np.arange(2500 * 4, dtype=np.float32).reshape(2500, 4)
+
+    assert store.upsert_chunks("acme", "sig", chunks, embeddings, batch_size=1000) == 2500
+
+    assert [len(rows[0]) for rows in collection.upserts] == [1000, 1000, 500]
+    ids = [chunk_id for rows in collection.upserts for chunk_id in rows[0]]
+    assert ids[0].endswith(":0") and ids[-1].endswith(":2499")
+    assert len(set(ids)) == 2500
+    # Every column of a batch describes the same rows
+    last = collection.upserts[-1]
+    assert all(len(column) == 500 for column in last)
+    assert last[3][0] == "chunk 2000"
+    assert last[6][0] == embeddings[2000].tolist()
@@ -0,0 +1,113 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from app.services.pipeline_store import (
+    PipelinePayloadMissing,
+    PipelinePayloadStore,
+    _DiskBackend,
+    dumps_payload,
+    loads_payload,
+    make_payload_key,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PipelinePayloadStore(_DiskBackend(str(tmp_path)), ttl_seconds=60)
+
+
+def test_ndarray_round_trip_keeps_dtype_and_shape():
+    for array in (
+        np.random.default_rng(1).normal(size=(3, 4)).astype(np.float32),
+        np.arange(6, dtype=np.int8).reshape(2, 3),
+        np.empty((0, 1024), dtype=np.float32),
+    ):
+        restored = loads_payload(dumps_payload(array))
+        assert restored.dtype == array.dtype
+        assert restored.shape == array.shape
+        assert np.array_equal(restored, array)
+
+
+def test_nested_payload_round_trip():
+    payload = {
+        'texts': ["chunk one", "chunk two"],
+        'embeddings': np.ones((2, 3), dtype=np.float32),
+        'stats': {'chunks': np.int64(2), 'seconds': np.float32(0.5), 'ratio': float('nan')},
+        'rows': [{'title': "A", 'sources': [{'source': "Reuters", 'url': None}]}],
+        'flags': (True, False),
+    }
+
+    restored = loads_payload(dumps_payload(payload))
+
+    assert restored['texts'] == payload['texts']
+    assert np.array_equal(restored['embeddings'], payload['embeddings'])
+    assert restored['stats']['chunks'] == 2 and isinstance(restored['stats']['chunks'], int)
+    assert restored['stats']['seconds'] == 0.5
+    assert np.isnan(restored['stats']['ratio'])
+    assert restored['rows'] == payload['rows']
+    # Tuples come back as JSON lists
+    assert restored['flags'] == [True, False]
+
+
+def test_non_string_keys_survive():
+    payload = {0: 101, 7: 108, (1, "a"): "tuple key"}
+
+    assert loads_payload(dumps_payload(payload)) == payload
+
+
+def test_objects_without_a_json_form_are_rejected():
+    with pytest.raises(TypeError):
+        dumps_payload({'model': object()})
+
+
+def test_pickles_are_never_loaded(store):
+    key = make_payload_key("run-1", "scraped")
+    store.backend.set(key, pickle.dumps({'a': 1}), 60)
+
+    with pytest.raises(PipelinePayloadMissing):
+        store.get(key)
+
+
+def test_disk_backend_round_trip_and_delete(store, tmp_path):
+    key = store.put("run-1", "embeddings", {'embeddings': np.zeros((2, 2), dtype=np.float32)})
+
+    assert key == "pipeline:run-1:embeddings"
+    assert np.array_equal(store.get(key)['embeddings'], np.zeros((2, 2)))
+    # File names are hashes, never the (client-influenced) key itself
+    assert all("run-1" not in name for name in os.listdir(tmp_path))
+
+    store.delete_job("run-1", ["embeddings", "never-written"])
+    with pytest.raises(PipelinePayloadMissing):
+        store.get(key)
+
+
+def test_disk_backend_expires_entries(tmp_path):
+    store = PipelinePayloadStore(_DiskBackend(str(tmp_path)), ttl_seconds=-1)
+    key = store.put("run-1", "scraped", [1, 2, 3])
+
+    with pytest.raises(PipelinePayloadMissing):
+        store.get(key)
+    assert os.listdir(tmp_path) == []
+
+
+def test_checkpoint_resume(store):
+    assert store.load_checkpoint("run-1") == {'completed_stages': [], 'job': None}
+
+    job = {'job_identifier': "client-job", 'run_id': "run-1", 'payloads': {}}
+    job['payloads']['scraped'] = store.put("run-1", "scraped", [{'title': "A"}])
+    store.save_checkpoint("run-1", "scrape", job)
+    store.put("run-1", "stored_articles", {0: 11, 1: 12})
+    store.save_checkpoint("run-1", "classify", {**job, 'article_dedup': None})
+    # A redelivered stage checkpoints again without duplicating the stage
+    store.save_checkpoint("run-1", "classify", {**job, 'article_dedup': None})
+
+    checkpoint = store.load_checkpoint("run-1")
+    assert checkpoint['completed_stages'] == ["scrape", "classify"]
+    assert checkpoint['job']['article_dedup'] is None
+    assert store.get(checkpoint['job']['payloads']['scraped']) == [{'title': "A"}]
+    assert store.get_optional("run-1", "stored_articles", {}) == {0: 11, 1: 12}
+    # Other runs never see this run's checkpoint
+    assert store.load_checkpoint("run-2")['completed_stages'] == []
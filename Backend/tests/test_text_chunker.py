@@ -0,0 +1,76 @@
+from app.services.text_chunker import chunk_text, find_near_duplicates, simhash, split_sentences
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def test_split_sentences_keeps_abbreviations_and_initials():
+    text = "Mr. Smith met Dr. Jones in the U.S. office. J. Doe joined them. Then they left!\n\nNew paragraph"
+    assert split_sentences(text) == [
+        "Mr. Smith met Dr. Jones in the U.S. office.",
+        "J. Doe joined them.",
+        "Then they left!",
+        "New paragraph",
+    ]
+
+
+def test_chunks_respect_token_and_char_budget():
+    text = " ".join(f"Sentence number {i} talks about the company and its plans." for i in range(200))
+    chunks = chunk_text(text, count_words, max_tokens=40, overlap_tokens=10, max_chars=300)
+
+    assert len(chunks) > 1
+    assert all(tokens <= 40 for tokens in count_words(chunks))
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    # Whole sentences only
+    assert all(chunk.startswith("Sentence") and chunk.endswith(".") for chunk in chunks)
+
+
+def test_chunks_carry_trailing_sentences_as_overlap():
+    text = " ".join(f"Sentence {i} has five words." for i in range(20))
+    chunks = chunk_text(text, count_words, max_tokens=20, overlap_tokens=5, max_chars=1800, min_chars=1)
+
+    for previous, following in zip(chunks, chunks[1:]):
+        last_sentence = split_sentences(previous)[-1]
+        assert following.startswith(last_sentence)
+
+
+def test_long_sentence_is_split_within_budget():
+    text = " ".join(["word"] * 500) + "."
+    chunks = chunk_text(text, count_words, max_tokens=60, max_chars=1800)
+
+    assert all(tokens <= 60 for tokens in count_words(chunks))
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_word_without_spaces_is_hard_split_to_max_chars():
+    blob = "A" * 5000
+    text = f"Intro sentence about the company. See https://example.com/{blob} for details. Closing sentence here."
+    chunks = chunk_text(text, count_words, max_tokens=100, max_chars=600)
+
+    assert all(len(chunk) <= 600 for chunk in chunks)
+    # Nothing is lost by the split
+    assert "".join(chunks).count("A") == len(blob)
+
+
+def test_word_without_spaces_is_hard_split_to_token_budget():
+    def count_chars(texts):
+        return [len(text) // 4 + 1 for text in texts]
+
+    chunks = chunk_text("x" * 8000, count_chars, max_tokens=100, max_chars=1800)
+
+    assert all(tokens <= 100 for tokens in count_chars(chunks))
+    assert "".join(chunks) == "x" * 8000
+
+
+def test_short_chunks_are_dropped():
+    assert chunk_text("Too short.", count_words, max_tokens=100, min_chars=50) == []
+
+
+def test_near_duplicate_texts_are_found():
+    story = " ".join(f"The company reported quarterly revenue growth in region {i} and new hires." for i in range(12))
+    other = " ".join(f"An unrelated article about football match {i} and the weather forecast." for i in range(12))
+    republished = story.replace("region 3", "region three")
+
+    assert bin(simhash(story) ^ simhash(republished)).count("1") <= 3
+    assert find_near_duplicates([story, other, republished, story]) == [2, 3]
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from app.services.vector_index import ChunkTable, InMemoryVectorIndex, normalize_rows
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(7).normal(size=(200, 32)).astype(np.float32)
+
+
+def brute_force_top_k(embeddings, query, k):
+    scores = normalize_rows(embeddings) @ normalize_rows(query)[0]
+    order = np.argsort(-scores)[:k]
+    return order, scores[order]
+
+
+def test_normalize_rows_keeps_zero_rows():
+    normalized = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert np.allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_exact_search_matches_brute_force(embeddings):
+    index = InMemoryVectorIndex(embeddings)
+    queries = embeddings[[3, 50]] + 0.01
+
+    results = index.search(queries, top_k=5)
+
+    assert index.mode == "exact"
+    for query, (indices, scores) in zip(queries, results):
+        expected_indices, expected_scores = brute_force_top_k(embeddings, query[None, :], 5)
+        assert list(indices) == list(expected_indices)
+        assert np.allclose(scores, expected_scores, atol=1e-5)
+
+
+def test_search_drops_hits_below_min_score(embeddings):
+    index = InMemoryVectorIndex(embeddings)
+
+    indices, scores = index.search(embeddings[:1], top_k=10, min_score=0.5)[0]
+
+    assert indices[0] == 0
+    assert np.all(scores >= 0.5)
+
+
+def test_top_k_larger_than_index(embeddings):
+    index = InMemoryVectorIndex(embeddings[:3])
+
+    indices, scores = index.search(embeddings[:1], top_k=10)[0]
+
+    assert sorted(indices) == [0, 1, 2]
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compact_dtypes_keep_the_ranking(embeddings, dtype):
+    exact = InMemoryVectorIndex(embeddings)
+    compact = InMemoryVectorIndex(embeddings, dtype=dtype)
+
+    exact_indices, exact_scores = exact.search(embeddings[:1], top_k=5)[0]
+    compact_indices, compact_scores = compact.search(embeddings[:1], top_k=5)[0]
+
+    assert compact.nbytes < exact.nbytes
+    assert compact_indices[0] == exact_indices[0] == 0
+    assert np.allclose(compact_scores, exact_scores, atol=0.02)
+    assert np.allclose(compact.vectors([0, 1]), exact.vectors([0, 1]), atol=0.02)
+
+
+def test_unsupported_dtype_is_rejected(embeddings):
+    with pytest.raises(ValueError):
+        InMemoryVectorIndex(embeddings, dtype="bfloat16")
+
+
+def test_chunk_table_stores_each_title_once():
+    table = ChunkTable.from_chunks([
+        {'text': "first", 'title': "Article A"},
+        {'text': "second", 'title': "Article A"},
+        {'text': "third", 'title': "Article B"},
+    ])
+
+    assert len(table) == 3
+    assert table.titles == ["Article A", "Article B"]
+    assert table[1] == {'text': "second", 'title': "Article A"}
+    assert table[2] == {'text': "third", 'title': "Article B"}
+
+
+def test_chunk_table_needs_one_title_per_text():
+    with pytest.raises(ValueError):
+        ChunkTable(["a", "b"], ["only one"])
+
+
+def test_hnsw_search_caps_k_without_changing_ef(embeddings):
+    pytest.importorskip("hnswlib")
+    index = InMemoryVectorIndex(embeddings, hnsw_min_size=0, hnsw_ef=16)
+
+    indices, scores = index.search(embeddings[:1], top_k=50)[0]
+
+    assert index.mode == "hnsw"
+    assert len(indices) == 16
+    assert indices[0] == 0
+    assert index._hnsw.ef == 16